@@ -0,0 +1,303 @@
+"""
+Continuous sliding-window aggregates over the incoming readings.
+
+Clients subscribe to a query such as "rolling 60s mean/min/max of mode 1"
+or "1-minute buckets of mode 1" instead of recomputing it from raw
+data_update events. Every query is computed once, whatever the number of
+clients sharing it: ContinuousQueries keeps one operator per (mode, kind,
+seconds), fed from the live log (live_buffer.py) as readings are stored,
+and hands out the values of the queries that changed for the server to
+push on a timer.
+
+Operators do O(1) amortized work per sample: the rolling window keeps a
+running sum and monotonic deques for its minimum and maximum, buckets keep
+running count/sum/min/max. Time is the readings' own timestamps
+(see live_buffer.sample_time). Rolling windows also expire as time passes
+without samples, so a mode that stops reporting drains to an empty window
+instead of repeating its last values. The window end is the newest
+sample's timestamp plus the (monotonic) time since that sample arrived, so
+backfilled readings with old timestamps are not expired the moment they
+are read.
+"""
+
+import time
+from collections import deque
+
+from eventlet.patcher import original
+
+import live_buffer
+from database import format_timestamp
+
+KINDS = ('rolling', 'buckets')
+
+
+class RollingWindow:
+    """Count, mean, min and max of the samples of the last `seconds` seconds."""
+
+    kind = 'rolling'
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.samples = deque()
+        # (time, value) with increasing values / decreasing values
+        self.minima = deque()
+        self.maxima = deque()
+        self.total = 0.0
+        self.latest = None
+        # time.monotonic() when the newest sample arrived
+        self.arrived = None
+
+    def add(self, t, value, arrived=None):
+        """
+        Add a sample; late samples count as arriving at the window's end.
+
+        Args:
+            t: Timestamp of the sample
+            value: Value of the sample
+            arrived: time.monotonic() when it arrived (default now)
+        """
+        if self.latest is not None and t < self.latest:
+            t = self.latest
+        self.latest = t
+        self.arrived = time.monotonic() if arrived is None else arrived
+        self.samples.append((t, value))
+        self.total += value
+        while self.minima and self.minima[-1][1] >= value:
+            self.minima.pop()
+        self.minima.append((t, value))
+        while self.maxima and self.maxima[-1][1] <= value:
+            self.maxima.pop()
+        self.maxima.append((t, value))
+        self.expire(t - self.seconds)
+
+    def advance(self, now):
+        """
+        Expire the samples that fell out of the window while no samples arrived.
+
+        Args:
+            now: Current time.monotonic()
+
+        Returns:
+            True if any samples were expired
+        """
+        if self.latest is None:
+            return False
+        return self.expire(self.latest + max(now - self.arrived, 0.0) - self.seconds)
+
+    def expire(self, cutoff):
+        """Drop the samples taken at or before `cutoff`; True if any were."""
+        samples = self.samples
+        count = len(samples)
+        while samples and samples[0][0] <= cutoff:
+            self.total -= samples.popleft()[1]
+        if not samples:
+            self.total = 0.0
+        while self.minima and self.minima[0][0] <= cutoff:
+            self.minima.popleft()
+        while self.maxima and self.maxima[0][0] <= cutoff:
+            self.maxima.popleft()
+        return len(samples) < count
+
+    def snapshot(self, flush=False):
+        """Current aggregate of the window."""
+        count = len(self.samples)
+        return {
+            'count': count,
+            'mean': self.total / count if count else None,
+            'min': self.minima[0][1] if count else None,
+            'max': self.maxima[0][1] if count else None,
+            'start': format_timestamp(self.samples[0][0]) if count else None,
+            'end': format_timestamp(self.latest) if count else None
+        }
+
+
+class TumblingBuckets:
+    """Count, mean, min and max per aligned bucket of `seconds` seconds."""
+
+    kind = 'buckets'
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        # [start, count, total, min, max] of the open bucket
+        self.current = None
+        self.closed = []
+        self.late = 0
+
+    def advance(self, now):
+        """Buckets only close on a later sample, so time alone changes nothing."""
+        return False
+
+    def add(self, t, value, arrived=None):
+        """Add a sample; samples of an already closed bucket are counted as late."""
+        start = t - t % self.seconds
+        current = self.current
+        if current is None or start > current[0]:
+            if current is not None:
+                self.closed.append(self.bucket(current))
+            self.current = [start, 1, value, value, value]
+        elif start < current[0]:
+            self.late += 1
+        else:
+            current[1] += 1
+            current[2] += value
+            current[3] = min(current[3], value)
+            current[4] = max(current[4], value)
+
+    def bucket(self, state):
+        """Describe a bucket's [start, count, total, min, max] state."""
+        start, count, total, minimum, maximum = state
+        return {
+            'start': format_timestamp(start),
+            'count': count,
+            'mean': total / count,
+            'min': minimum,
+            'max': maximum
+        }
+
+    def snapshot(self, flush=False):
+        """Buckets closed since the last flush and the open bucket so far."""
+        closed = self.closed
+        if flush:
+            self.closed = []
+        return {
+            'closed': closed,
+            'current': self.bucket(self.current) if self.current else None,
+            'late': self.late
+        }
+
+
+class Query:
+    """One shared operator and the clients subscribed to it."""
+
+    def __init__(self, key, mode_id, operator):
+        self.key = key
+        self.mode_id = mode_id
+        self.operator = operator
+        self.subscribers = set()
+        self.last_id = 0
+        self.dirty = False
+
+    def payload(self, flush=False):
+        """The query's identity and current value (flush: mark it as published)."""
+        return dict(self.operator.snapshot(flush), query=self.key, mode_id=self.mode_id,
+                    kind=self.operator.kind, seconds=self.operator.seconds)
+
+
+class ContinuousQueries:
+    """Registry of the shared queries, fed with every logged reading."""
+
+    def __init__(self, max_seconds=3600):
+        self.max_seconds = max_seconds
+        # Fed on database worker threads, read on the hub
+        self.lock = original('threading').Lock()
+        self.queries = {}
+        self.by_mode = {}
+        self.samples = 0
+
+    @staticmethod
+    def query_key(mode_id, kind, seconds):
+        """Name of a query, also used for its Socket.IO room."""
+        return f'{kind}:{seconds:g}:{mode_id}'
+
+    def subscribe(self, sid, mode_id, kind, seconds):
+        """
+        Subscribe a client to a query, creating its operator on first use.
+
+        A new operator is seeded with the mode's readings still in the live
+        log, so it starts with (up to live_buffer.HISTORY_SECONDS of) data.
+
+        Returns:
+            The query's payload with its current value
+
+        Raises:
+            ValueError: For an unknown kind or a window out of range
+        """
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        if isinstance(seconds, bool) or not isinstance(seconds, (int, float)) \
+                or not 1 <= seconds <= self.max_seconds:
+            raise ValueError(f"seconds must be between 1 and {self.max_seconds}")
+
+        key = self.query_key(mode_id, kind, seconds)
+        with self.lock:
+            query = self.queries.get(key)
+            if query is None:
+                operator = RollingWindow(seconds) if kind == 'rolling' else TumblingBuckets(seconds)
+                query = Query(key, mode_id, operator)
+                history = live_buffer.history(mode_id, seconds)
+                wall, monotonic = time.time(), time.monotonic()
+                for reading_id, timestamp, value in zip(history['ids'], history['timestamps'],
+                                                        history['values']):
+                    t = live_buffer.sample_time(timestamp)
+                    # Logged readings arrived about when they were taken
+                    operator.add(t, value, arrived=monotonic - max(wall - t, 0.0))
+                    query.last_id = max(query.last_id, reading_id)
+                if kind == 'buckets':
+                    operator.closed.clear()
+                self.queries[key] = query
+                self.by_mode.setdefault(mode_id, []).append(query)
+            query.operator.advance(time.monotonic())
+            query.subscribers.add(sid)
+            return query.payload()
+
+    def unsubscribe(self, sid, key):
+        """Unsubscribe a client; the operator goes away with its last subscriber."""
+        with self.lock:
+            query = self.queries.get(key)
+            if query is None:
+                return False
+            query.subscribers.discard(sid)
+            if not query.subscribers:
+                del self.queries[key]
+                remaining = [other for other in self.by_mode[query.mode_id] if other is not query]
+                if remaining:
+                    self.by_mode[query.mode_id] = remaining
+                else:
+                    del self.by_mode[query.mode_id]
+            return True
+
+    def disconnect(self, sid):
+        """Unsubscribe a client from every query; returns their keys."""
+        with self.lock:
+            keys = [key for key, query in self.queries.items() if sid in query.subscribers]
+        for key in keys:
+            self.unsubscribe(sid, key)
+        return keys
+
+    def feed(self, readings):
+        """Add stored (id, mode_id, timestamp, value) readings to the queries of their modes."""
+        if not self.by_mode:
+            return
+        with self.lock:
+            for reading_id, mode_id, timestamp, value in readings:
+                queries = self.by_mode.get(mode_id)
+                if not queries:
+                    continue
+                t = live_buffer.sample_time(timestamp)
+                for query in queries:
+                    if reading_id > query.last_id:
+                        query.operator.add(t, value)
+                        query.last_id = reading_id
+                        query.dirty = True
+                self.samples += 1
+
+    def collect(self, now=None):
+        """Take the payloads of the queries that changed since the last call (now: time.monotonic())."""
+        now = time.monotonic() if now is None else now
+        with self.lock:
+            for query in self.queries.values():
+                if query.operator.advance(now):
+                    query.dirty = True
+            changed = [query for query in self.queries.values() if query.dirty]
+            for query in changed:
+                query.dirty = False
+            return [(query.key, query.payload(flush=True)) for query in changed]
+
+    def get_stats(self):
+        """Number of shared queries, their subscribers and samples processed."""
+        with self.lock:
+            return {
+                'queries': len(self.queries),
+                'subscriptions': sum(len(query.subscribers) for query in self.queries.values()),
+                'samples': self.samples
+            }
@@ -0,0 +1,55 @@
+"""
+Asyncio access to database.py for the asyncio serving mode.
+
+sqlite3 calls block, so each coroutine here runs the matching database
+function on a bounded thread pool and awaits the result. The caller's query
+budget is carried over to the worker thread.
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+import database
+
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='db')
+
+
+def run_with_budget(budget, fn, args, kwargs):
+    """Worker-side wrapper restoring the caller's query budget."""
+    with database.query_budget(budget):
+        return fn(*args, **kwargs)
+
+
+def asyncify(fn):
+    """Wrap a blocking database function as a coroutine function."""
+    @wraps(fn)
+    async def wrapper(*args, **kwargs):
+        budget = getattr(database.query_context, 'budget', None)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            executor, run_with_budget, budget, fn, args, kwargs
+        )
+    return wrapper
+
+
+init_db = asyncify(database.init_db)
+use_memory_database = asyncify(database.use_memory_database)
+use_readings_backend = asyncify(database.use_readings_backend)
+refresh_snapshot = asyncify(database.refresh_snapshot)
+get_all_modes = asyncify(database.get_all_modes)
+get_modes_page = asyncify(database.get_modes_page)
+register_modes = asyncify(database.register_modes)
+get_mode_by_id = asyncify(database.get_mode_by_id)
+update_mode_status = asyncify(database.update_mode_status)
+add_reading = asyncify(database.add_reading)
+get_recent_readings = asyncify(database.get_recent_readings)
+get_all_readings = asyncify(database.get_all_readings)
+get_current_reading = asyncify(database.get_current_reading)
+set_mode_voltage = asyncify(database.set_mode_voltage)
+set_mode_voltages = asyncify(database.set_mode_voltages)
+add_alerts = asyncify(database.add_alerts)
+get_mode_voltage = asyncify(database.get_mode_voltage)
+get_active_modes = asyncify(database.get_active_modes)
+get_filtered_records = asyncify(database.get_filtered_records)
+get_statistics = asyncify(database.get_statistics)
@@ -1,61 +1,458 @@
-from flask import Flask, render_template, jsonify, request, session
-from flask_socketio import SocketIO, emit, join_room, leave_room
+import os
 import eventlet
+
+# 'eventlet' (default) or 'asyncio' (see asgi_app.py)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'eventlet')
+if SERVER_MODE == 'eventlet':
+    eventlet.monkey_patch()
+
+from flask import Flask, Response, render_template, jsonify, request, session, stream_with_context
+from flask_socketio import SocketIO, emit, join_room, leave_room
+from fnmatch import fnmatch
+from functools import wraps
+from datetime import datetime, timedelta, timezone
+import hashlib
 from database import (
     init_db, get_all_modes, get_mode_by_id, 
     update_mode_status, add_reading, get_recent_readings,
-    get_all_readings, get_current_reading, set_mode_voltage,
-    get_mode_voltage, get_filtered_records, get_statistics
+    get_all_readings, get_current_reading, get_readings_after, set_mode_voltages,
+    get_mode_voltage, get_filtered_records, get_statistics,
+    get_data_version, get_filtered_records_columnar, get_chart_series,
+    get_interpolated_series, set_mode_compression, compact_readings,
+    get_archive_summary, use_memory_database, use_readings_backend, refresh_snapshot, snapshot_ready,
+    get_snapshot_status, get_mode_ids, get_mode_registry, query_budget, QueryTimeoutError,
+    add_alert_rule, delete_alert_rule, get_alert_rules, add_alerts, get_alerts, apply_mode_changes,
+    register_modes, get_modes_page, count_active_modes
 )
+import change_feed
+from aggregates import ContinuousQueries
+from compression import get_settings as get_compression_settings
+from control import VoltageCoalescer
 from data_simulator import DataSimulator
-
-eventlet.monkey_patch()
+from emit_queue import OutboundQueues
+from subscriptions import SubscriptionIndex
+from ingest import add_listener, ingest_readings, parse_binary, parse_ndjson, IngestError
+from db_pool import enable as enable_db_pool, get_pool_stats, DatabaseBusyError
+from hub_monitor import HubLagMonitor
+import line_listener
+import live_buffer
+import rules
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'dev-secret-key-change-in-production'
+# Query time budgets (seconds) for analytics endpoints
+app.config['QUERY_BUDGET_INTERACTIVE'] = 2.0
+app.config['QUERY_BUDGET_EXPORT'] = 30.0
+# Run sqlite calls on a native thread pool so they do not block the hub
+app.config['DB_THREADPOOL'] = True
+app.config['DB_THREADPOOL_SIZE'] = 4
+app.config['DB_MAX_PENDING'] = 64
+# Largest batch accepted by POST /api/ingest
+app.config['INGEST_MAX_ROWS'] = 50000
+# Most readings replayed to a resubscribing client
+app.config['REPLAY_MAX_READINGS'] = 5000
+# Change feed (/api/feed): batching window of the event stream (seconds),
+# largest batch, longest long-poll and seconds between keepalive comments
+# on an idle event stream
+app.config['FEED_POLL_INTERVAL'] = 0.25
+app.config['FEED_MAX_BATCH'] = 1000
+app.config['FEED_MAX_TIMEOUT'] = 30.0
+app.config['FEED_KEEPALIVE'] = 15.0
+# Per-client outbound queue for broadcasts: events held for a slow client,
+# what to do when they overflow ('drop_oldest', 'latest' or 'disconnect';
+# clients may choose per subscription) and the Engine.IO packets allowed to
+# pile up before a client counts as slow
+app.config['EMIT_QUEUE_DEPTH'] = 256
+app.config['EMIT_QUEUE_POLICY'] = 'drop_oldest'
+app.config['EMIT_TRANSPORT_BACKLOG'] = 16
+# Seconds between pushes of changed continuous aggregates, and the longest
+# window (or bucket) a client may ask for
+app.config['AGGREGATE_INTERVAL'] = 1.0
+app.config['AGGREGATE_MAX_SECONDS'] = 3600
+# Seconds between stores and pushes of fired alerts
+app.config['ALERT_INTERVAL'] = 0.5
+# Seconds over which voltage requests are coalesced into one write and
+# one voltage_changed broadcast per mode
+app.config['VOLTAGE_FLUSH_INTERVAL'] = 0.1
+# Most modes changed by one POST /api/modes/bulk request
+app.config['BULK_MAX_MODES'] = 10000
+# Modes rendered with a page (more are loaded as the user scrolls or
+# searches) and the most one GET /api/modes page may hold
+app.config['MODES_PAGE_SIZE'] = 48
+app.config['MODES_MAX_PAGE_SIZE'] = 1000
+# Threads serving Flask requests in the asyncio serving mode; long-polls and
+# event streams each hold one while they are open
+app.config['ASGI_HTTP_THREADS'] = 32
+# Line-protocol TCP/UDP listener ports for the asyncio serving mode (unset = off)
+app.config['LINE_INGEST_TCP_PORT'] = int(os.environ.get('LINE_INGEST_TCP_PORT', 0)) or None
+app.config['LINE_INGEST_UDP_PORT'] = int(os.environ.get('LINE_INGEST_UDP_PORT', 0)) or None
+# Readings storage engine: 'sqlite' (readings table), 'segment_log', 'sharded_sqlite'
+# or 'memory' (nothing on disk: the other tables move to an in-memory database too)
+app.config['READINGS_BACKEND'] = os.environ.get('READINGS_BACKEND', 'sqlite')
+# Shard files for 'sharded_sqlite': readings of mode_id % N share a file (0 = one per mode)
+app.config['READINGS_SHARDS'] = int(os.environ.get('READINGS_SHARDS', 0))
+# Seconds between analytics snapshot refreshes; while set, records, statistics
+# and interpolation read the snapshot instead of the live database (0 = off)
+app.config['ANALYTICS_SNAPSHOT_INTERVAL'] = float(os.environ.get('ANALYTICS_SNAPSHOT_INTERVAL', 0))
+
+# In asyncio mode Socket.IO is served by asgi_app.py; this server is only
+# used as the emit() facade for the Flask routes.
+socketio = SocketIO(app, cors_allowed_origins="*",
+                    async_mode='eventlet' if SERVER_MODE == 'eventlet' else 'threading',
+                    manage_session=False)
 
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', manage_session=False)
+client_subscriptions = SubscriptionIndex()
 
-simulator = DataSimulator(socketio=socketio)
+outbound = OutboundQueues(socketio, subscriptions=client_subscriptions,
+                          max_depth=app.config['EMIT_QUEUE_DEPTH'],
+                          policy=app.config['EMIT_QUEUE_POLICY'],
+                          transport_backlog=app.config['EMIT_TRANSPORT_BACKLOG'],
+                          enabled=SERVER_MODE == 'eventlet')
+
+voltage_writes = VoltageCoalescer()
+
+simulator = DataSimulator(socketio=outbound, voltages=voltage_writes)
+
+continuous_queries = ContinuousQueries(max_seconds=app.config['AGGREGATE_MAX_SECONDS'])
+live_buffer.add_listener(continuous_queries.feed)
+live_buffer.add_listener(rules.evaluate)
 simulator_thread = None
 
-client_subscriptions = {}
+hub_monitor = HubLagMonitor()
+
+
+def broadcast_ingested(readings):
+    """Fan an ingested batch out to subscribers, one event per mode room."""
+    batches = {}
+    for reading_id, mode_id, timestamp, value in readings:
+        batch = batches.setdefault(mode_id, {'mode_id': mode_id, 'ids': [], 'timestamps': [], 'values': []})
+        batch['ids'].append(reading_id)
+        batch['timestamps'].append(timestamp)
+        batch['values'].append(value)
+    
+    for mode_id, batch in batches.items():
+        count = batch['count'] = len(batch['ids'])
+        # A batch's readings of one mode are logged together, so their
+        # sequence numbers are consecutive up to that of the last one
+        last_seq = live_buffer.sequence(mode_id, batch['ids'][-1])
+        batch['seqs'] = (list(range(last_seq - count + 1, last_seq + 1))
+                         if last_seq is not None else [None] * count)
+        outbound.emit('readings_batch', batch, room=f'mode_{mode_id}')
+
+
+add_listener(broadcast_ingested)
 
 
 def init_app():
     """Initialize the application."""
+    if SERVER_MODE == 'eventlet' and app.config['DB_THREADPOOL']:
+        enable_db_pool(
+            threads=app.config['DB_THREADPOOL_SIZE'],
+            max_pending=app.config['DB_MAX_PENDING']
+        )
+    if app.config['READINGS_BACKEND'] == 'memory':
+        use_memory_database()
     init_db()
+    use_readings_backend(app.config['READINGS_BACKEND'], shards=app.config['READINGS_SHARDS'])
+    if app.config['ANALYTICS_SNAPSHOT_INTERVAL'] > 0:
+        refresh_snapshot()
+        socketio.start_background_task(run_snapshot_refresher)
+    if SERVER_MODE == 'eventlet':
+        hub_monitor.start()
+        socketio.start_background_task(run_aggregate_publisher)
+        socketio.start_background_task(run_alert_publisher)
+        socketio.start_background_task(run_voltage_flusher)
+
+
+def publish_aggregates():
+    """Push the continuous aggregates that changed to their subscribers."""
+    for key, payload in continuous_queries.collect():
+        outbound.emit('aggregate_update', payload, room=f'aggregate_{key}')
+
+
+def run_aggregate_publisher():
+    """Publish changed aggregates every AGGREGATE_INTERVAL seconds."""
+    while True:
+        socketio.sleep(app.config['AGGREGATE_INTERVAL'])
+        try:
+            publish_aggregates()
+        except Exception as e:
+            print(f"Aggregate publishing failed: {e}")
+
+
+def publish_alerts():
+    """Store the alerts fired since the last call and push them to every client."""
+    alerts = rules.take_alerts()
+    if not alerts:
+        return []
+    try:
+        stored = add_alerts(alerts)
+    except Exception:
+        # Stored and pushed with the next call
+        rules.requeue_alerts(alerts)
+        raise
+    for alert in stored:
+        outbound.emit('alert', alert)
+    return stored
+
+
+def run_alert_publisher():
+    """Publish fired alerts every ALERT_INTERVAL seconds."""
+    while True:
+        socketio.sleep(app.config['ALERT_INTERVAL'])
+        try:
+            publish_alerts()
+        except Exception as e:
+            print(f"Alert publishing failed: {e}")
+
+
+def flush_voltages():
+    """Store the voltages requested since the last call and broadcast each changed mode once."""
+    voltages = voltage_writes.take()
+    if not voltages:
+        return []
+    try:
+        updated = set_mode_voltages(voltages)
+    except Exception:
+        # Retried with the next flush; newer requests for a mode still win
+        voltage_writes.requeue(voltages)
+        raise
+    for mode_id in updated:
+        outbound.emit('voltage_changed', {'mode_id': mode_id, 'voltage': voltages[mode_id]})
+    return updated
+
+
+def run_voltage_flusher():
+    """Flush requested voltages every VOLTAGE_FLUSH_INTERVAL seconds."""
+    while True:
+        socketio.sleep(app.config['VOLTAGE_FLUSH_INTERVAL'])
+        try:
+            flush_voltages()
+        except Exception as e:
+            print(f"Voltage flush failed: {e}")
+
+
+def run_snapshot_refresher():
+    """Background task refreshing the analytics snapshot periodically."""
+    while True:
+        socketio.sleep(app.config['ANALYTICS_SNAPSHOT_INTERVAL'])
+        try:
+            refresh_snapshot()
+        except Exception as e:
+            print(f"Analytics snapshot refresh failed: {e}")
+
+
+@app.errorhandler(DatabaseBusyError)
+def handle_database_busy(error):
+    """Answer with 503 when the database call queue is full."""
+    return jsonify({'error': str(error), 'code': 'database_busy'}), 503
+
+
+def conditional_on(version_func):
+    """
+    Decorator adding version-based ETags to a read endpoint.
+    
+    The ETag is derived from the in-memory data version and the full request
+    path, so a matching If-None-Match is answered with 304 before the view
+    (and the database) is touched.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            version = version_func(**kwargs)
+            etag = hashlib.sha1(f'{version}|{request.full_path}'.encode()).hexdigest()
+            
+            if request.if_none_match.contains(etag):
+                response = app.response_class(status=304)
+                response.set_etag(etag)
+                return response
+            
+            response = app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag)
+                response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def with_query_budget(view):
+    """
+    Decorator running a view under the configured query time budget.
+    
+    Interactive requests get QUERY_BUDGET_INTERACTIVE; requests made with
+    export=1 get the larger QUERY_BUDGET_EXPORT.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.args.get('export', type=int):
+            budget = app.config['QUERY_BUDGET_EXPORT']
+        else:
+            budget = app.config['QUERY_BUDGET_INTERACTIVE']
+        with query_budget(budget):
+            return view(*args, **kwargs)
+    return wrapper
+
+
+def query_timeout_response(error):
+    """Structured response for a query that exceeded its time budget."""
+    return jsonify({
+        'error': str(error),
+        'code': 'query_timeout',
+        'budget_seconds': error.budget
+    }), 503
+
+
+def modes_version(**kwargs):
+    """Data version for mode listings."""
+    return get_data_version(include_readings=False, include_status=True)
+
+
+def readings_version(mode_id=None, **kwargs):
+    """Data version for readings, scoped by the path or query mode_id."""
+    if mode_id is None:
+        mode_id = request.args.get('mode_id', type=int)
+    return get_data_version(mode_id)
+
+
+def use_snapshot():
+    """Whether analytics endpoints read from the analytics snapshot."""
+    return app.config['ANALYTICS_SNAPSHOT_INTERVAL'] > 0 and snapshot_ready()
+
+
+def analytics_version(mode_id=None, **kwargs):
+    """Data version for analytics endpoints: the snapshot's when routed to it."""
+    if mode_id is None:
+        mode_id = request.args.get('mode_id', type=int)
+    return get_data_version(mode_id, snapshot=use_snapshot())
+
+
+def snapshot_headers(view):
+    """Decorator reporting the snapshot an analytics response was read from."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        response = app.make_response(view(*args, **kwargs))
+        if use_snapshot():
+            status = get_snapshot_status()
+            response.headers['X-Snapshot-Created'] = status['created']
+            response.headers['X-Snapshot-Age'] = str(status['age_seconds'])
+        return response
+    return wrapper
+
+
+def first_modes_page():
+    """The first page of modes rendered with a page; the rest load lazily."""
+    return get_modes_page(limit=app.config['MODES_PAGE_SIZE'])
 
 
 @app.route('/')
 def home():
     """Home page route."""
-    modes = get_all_modes()
-    return render_template('home.html', modes=modes)
+    page = first_modes_page()
+    return render_template('home.html', modes=page['modes'], page=page)
 
 
 @app.route('/dashboard')
 def dashboard():
     """Dashboard page route."""
-    modes = get_all_modes()
-    return render_template('dashboard.html', modes=modes)
+    page = first_modes_page()
+    return render_template('dashboard.html', modes=page['modes'], page=page)
 
 
 @app.route('/records')
 def records():
     """Records page route."""
-    modes = get_all_modes()
-    return render_template('records.html', modes=modes)
+    page = first_modes_page()
+    return render_template('records.html', modes=page['modes'], page=page)
+
+
+def parse_modes_page_args(args):
+    """
+    Read the paging and filter query parameters of a mode listing.
+    
+    Returns:
+        Keyword arguments for get_modes_page
+    
+    Raises:
+        ValueError: For a malformed parameter
+    """
+    after = args.get('after', '0')
+    limit = args.get('limit', str(app.config['MODES_PAGE_SIZE']))
+    if not after.isdigit() or not limit.isdigit() or int(limit) < 1:
+        raise ValueError("after and limit must be non-negative integers (limit at least 1)")
+    
+    active = args.get('active')
+    if active is not None:
+        if active.lower() not in ('true', 'false', '1', '0'):
+            raise ValueError("active must be true or false")
+        active = active.lower() in ('true', '1')
+    
+    return {
+        'after_id': int(after),
+        'limit': min(int(limit), app.config['MODES_MAX_PAGE_SIZE']),
+        'active': active,
+        'prefix': args.get('q') or None
+    }
 
 
 @app.route('/api/modes')
+@conditional_on(modes_version)
 def api_get_modes():
-    """API endpoint to get all modes."""
-    modes = get_all_modes()
-    return jsonify(modes)
+    """
+    API endpoint to list modes.
+    
+    Without parameters every mode is listed. With any of `after`, `limit`,
+    `active` or `q` (case-insensitive name prefix) one page is returned in
+    id order, {"modes": [...], "next_after": ..., "total": ...,
+    "active_total": ...}; pass next_after back as `after` for the next page.
+    """
+    if not any(name in request.args for name in ('after', 'limit', 'active', 'q')):
+        return jsonify(get_all_modes())
+    
+    try:
+        return jsonify(get_modes_page(**parse_modes_page_args(request.args)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/api/modes', methods=['POST'])
+def api_register_modes():
+    """
+    API endpoint to register many modes in one transaction.
+    
+    Body: {"modes": [{"name": ..., "description": ..., "icon": ...}, ...]};
+    names already registered are skipped.
+    """
+    data = request.get_json(silent=True)
+    modes = data.get('modes') if isinstance(data, dict) else None
+    if not isinstance(modes, list) or not modes:
+        return jsonify({'error': 'modes must be a non-empty list'}), 400
+    if len(modes) > app.config['BULK_MAX_MODES']:
+        return jsonify({'error': f"At most {app.config['BULK_MAX_MODES']} modes can be registered at once"}), 400
+    
+    rows = []
+    for mode in modes:
+        if not isinstance(mode, dict) or not isinstance(mode.get('name'), str) or not mode['name'].strip():
+            return jsonify({'error': 'each mode needs a non-empty name'}), 400
+        rows.append((mode['name'].strip(), str(mode.get('description') or ''), str(mode.get('icon') or '')))
+    if len({row[0] for row in rows}) < len(rows):
+        return jsonify({'error': 'mode names must be unique'}), 400
+    
+    try:
+        mode_ids = register_modes(rows)
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    
+    return jsonify({
+        'success': True,
+        'mode_ids': mode_ids,
+        'created': len(mode_ids),
+        'skipped': len(rows) - len(mode_ids)
+    }), 201
 
 
 @app.route('/api/modes/<int:mode_id>')
+@conditional_on(modes_version)
 def api_get_mode(mode_id):
     """API endpoint to get a specific mode."""
     mode = get_mode_by_id(mode_id)
@@ -64,6 +461,102 @@ def api_get_mode(mode_id):
     return jsonify({'error': 'Mode not found'}), 404
 
 
+@app.route('/api/modes/<int:mode_id>/compression', methods=['GET', 'POST'])
+def api_mode_compression(mode_id):
+    """
+    API endpoint to read or configure ingest compression for a mode.
+    
+    POST body: {"method": "none" | "deadband" | "swinging_door",
+                "tolerance": float, "max_interval": seconds}
+    """
+    mode = get_mode_by_id(mode_id)
+    if not mode:
+        return jsonify({'error': 'Mode not found'}), 404
+    
+    if request.method == 'GET':
+        return jsonify(dict(get_compression_settings(mode_id), mode_id=mode_id))
+    
+    data = request.get_json()
+    if not data or 'method' not in data:
+        return jsonify({'error': 'method is required'}), 400
+    
+    try:
+        settings = set_mode_compression(
+            mode_id,
+            data['method'],
+            tolerance=float(data.get('tolerance', 0.0)),
+            max_interval=float(data.get('max_interval', 60.0))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(dict(settings, mode_id=mode_id))
+
+
+@app.route('/api/modes/<int:mode_id>/rules', methods=['GET', 'POST'])
+def api_mode_rules(mode_id):
+    """
+    API endpoint to list or add alert rules of a mode.
+    
+    POST body: {"kind": "threshold", "minimum": float, "maximum": float}
+               {"kind": "rate", "max_delta": float, "max_rate": per second}
+               {"kind": "zscore", "window": readings, "threshold": deviations,
+                "min_samples": readings}
+    """
+    mode = get_mode_by_id(mode_id)
+    if not mode:
+        return jsonify({'error': 'Mode not found'}), 404
+    
+    if request.method == 'GET':
+        return jsonify(get_alert_rules(mode_id))
+    
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or 'kind' not in data:
+        return jsonify({'error': 'kind is required'}), 400
+    
+    params = {name: value for name, value in data.items() if name != 'kind'}
+    try:
+        rule = add_alert_rule(mode_id, data['kind'], params)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(rule), 201
+
+
+@app.route('/api/rules')
+def api_get_rules():
+    """API endpoint listing the alert rules of all modes."""
+    return jsonify(get_alert_rules())
+
+
+@app.route('/api/rules/<int:rule_id>', methods=['DELETE'])
+def api_delete_rule(rule_id):
+    """API endpoint to delete an alert rule (its past alerts are kept)."""
+    if not delete_alert_rule(rule_id):
+        return jsonify({'error': 'Rule not found'}), 404
+    return jsonify({'success': True, 'id': rule_id})
+
+
+@app.route('/api/alerts')
+def api_get_alerts():
+    """
+    API endpoint for the most recent alerts, newest first.
+    
+    Query parameters:
+        mode_id: Only alerts of this mode
+        limit: Maximum number of alerts (default 100, at most 1000)
+    """
+    try:
+        mode_id = request.args.get('mode_id', type=int)
+        limit = min(max(int(request.args.get('limit', 100)), 1), 1000)
+        return jsonify(get_alerts(mode_id, limit))
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
 @app.route('/api/modes/<int:mode_id>/toggle', methods=['POST'])
 def api_toggle_mode(mode_id):
     """API endpoint to toggle mode status."""
@@ -75,19 +568,20 @@ def api_toggle_mode(mode_id):
     enforce_single = data.get('enforce_single_active', False)
     new_status = not mode['is_active']
     
-    update_mode_status(mode_id, new_status, enforce_single_active=enforce_single)
+    changed = update_mode_status(mode_id, new_status, enforce_single_active=enforce_single)
     
-    updated_modes = get_all_modes()
-    socketio.emit('mode_status_changed', {
+    outbound.emit('mode_status_changed', {
         'mode_id': mode_id,
         'is_active': new_status,
-        'all_modes': updated_modes
+        'modes': changed,
+        'active_total': count_active_modes()
     })
     
-    return jsonify({'mode_id': mode_id, 'is_active': new_status, 'all_modes': updated_modes})
+    return jsonify({'mode_id': mode_id, 'is_active': new_status, 'modes': changed})
 
 
 @app.route('/api/readings/<int:mode_id>')
+@conditional_on(readings_version)
 def api_get_readings(mode_id):
     """API endpoint to get readings for a mode."""
     limit = request.args.get('limit', 100, type=int)
@@ -102,8 +596,7 @@ def dashboard_mode(mode_id):
     if not mode:
         return render_template('error.html', message='Mode not found'), 404
     
-    modes = get_all_modes()
-    return render_template('mode-dashboard.html', modes=modes, selected_mode=mode)
+    return render_template('mode-dashboard.html', selected_mode=mode)
 
 
 @app.route('/api/mode/toggle', methods=['POST'])
@@ -124,61 +617,136 @@ def api_toggle_mode_simple():
     new_status = not mode['is_active']
     
     try:
-        update_mode_status(mode_id, new_status, enforce_single_active=enforce_single)
+        changed = update_mode_status(mode_id, new_status, enforce_single_active=enforce_single)
         
-        updated_modes = get_all_modes()
-        socketio.emit('mode_changed', {
+        outbound.emit('mode_changed', {
             'mode_id': mode_id,
             'is_active': new_status,
-            'all_modes': updated_modes
+            'modes': changed
         })
         
-        socketio.emit('mode_status_changed', {
+        outbound.emit('mode_status_changed', {
             'mode_id': mode_id,
             'is_active': new_status,
-            'all_modes': updated_modes
+            'modes': changed,
+            'active_total': count_active_modes()
         })
         
         return jsonify({
             'success': True,
             'mode_id': mode_id,
             'is_active': new_status,
-            'all_modes': updated_modes
+            'modes': changed
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def parse_mode_changes(data):
+    """
+    Read the changes of a bulk mode request.
+    
+    Either a list of per-mode changes, {"changes": [{"mode_id": 1,
+    "is_active": true, "voltage": 6.5}, ...]}, or one change for a set of
+    modes named like a subscription ("mode_id", "mode_ids" or "pattern",
+    see resolve_modes), e.g. {"mode_ids": "*", "is_active": false}.
+    
+    Returns:
+        List of {'mode_id', 'is_active', 'voltage'} dicts
+    
+    Raises:
+        ValueError: For a malformed request or unknown modes
+    """
+    if 'changes' in data:
+        changes = data['changes']
+        if not isinstance(changes, list) or not changes:
+            raise ValueError("changes must be a non-empty list")
+        if not all(isinstance(change, dict) for change in changes):
+            raise ValueError("each change must be an object")
+        registry = get_mode_registry()
+        unknown = [change.get('mode_id') for change in changes
+                   if parse_mode_id(change.get('mode_id')) not in registry]
+        if unknown:
+            raise ValueError(f"Modes not found: {', '.join(str(value) for value in unknown)}")
+        requested = [(parse_mode_id(change['mode_id']), change) for change in changes]
+        if len({mode_id for mode_id, _ in requested}) < len(requested):
+            raise ValueError("each mode may appear in changes only once")
+    else:
+        requested = [(mode['id'], data) for mode in resolve_modes(data)]
+    
+    if len(requested) > app.config['BULK_MAX_MODES']:
+        raise ValueError(f"At most {app.config['BULK_MAX_MODES']} modes can be changed at once")
+    
+    parsed = []
+    for mode_id, change in requested:
+        is_active = change.get('is_active')
+        voltage = change.get('voltage')
+        if is_active is None and voltage is None:
+            raise ValueError(f"Mode {mode_id}: is_active or voltage is required")
+        if is_active is not None and not isinstance(is_active, bool):
+            raise ValueError(f"Mode {mode_id}: is_active must be true or false")
+        if voltage is not None and (isinstance(voltage, bool) or not isinstance(voltage, (int, float))):
+            raise ValueError(f"Mode {mode_id}: voltage must be a number")
+        parsed.append({'mode_id': mode_id, 'is_active': is_active, 'voltage': voltage})
+    return parsed
+
+
+@app.route('/api/modes/bulk', methods=['POST'])
+def api_bulk_modes():
+    """
+    API endpoint to change the active state and voltage of many modes at once.
+    
+    All changes are applied in one transaction (or none, on any error) and
+    announced with a single modes_changed event listing each changed mode's
+    state. See parse_mode_changes for the body.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'JSON object body is required'}), 400
+    
+    try:
+        changes = parse_mode_changes(data)
+        states = apply_mode_changes(changes)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+    
+    voltage_writes.stored({change['mode_id']: float(change['voltage'])
+                           for change in changes if change['voltage'] is not None})
+    outbound.emit('modes_changed', {'modes': states, 'count': len(states),
+                                    'active_total': count_active_modes()})
+    
+    return jsonify({'success': True, 'modes': states, 'count': len(states)})
+
+
 @app.route('/api/voltage/set', methods=['POST'])
 def api_set_voltage():
-    """API endpoint to set voltage for a mode."""
+    """
+    API endpoint to set voltage for a mode.
+    
+    The voltage takes effect for the simulator at once; it is stored and
+    broadcast as voltage_changed within VOLTAGE_FLUSH_INTERVAL, together
+    with any later request for the same mode (the latest one wins).
+    """
     data = request.get_json()
     
     if not data or 'mode_id' not in data or 'voltage' not in data:
         return jsonify({'error': 'mode_id and voltage are required'}), 400
     
-    mode_id = data['mode_id']
-    voltage = data['voltage']
-    
-    mode = get_mode_by_id(mode_id)
-    if not mode:
+    mode_id = parse_mode_id(data['mode_id'])
+    if mode_id is None or mode_id not in get_mode_registry():
         return jsonify({'error': 'Mode not found'}), 404
     
     try:
-        voltage_value = float(voltage)
-        set_mode_voltage(mode_id, voltage_value)
-        
-        socketio.emit('voltage_changed', {
-            'mode_id': mode_id,
-            'voltage': voltage_value
-        })
+        voltage_value = voltage_writes.set(mode_id, data['voltage'])
         
         return jsonify({
             'success': True,
             'mode_id': mode_id,
             'voltage': voltage_value
         })
-    except ValueError as e:
+    except (TypeError, ValueError) as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -203,6 +771,9 @@ def api_get_current_reading(mode_id):
 
 
 @app.route('/api/records')
+@conditional_on(analytics_version)
+@snapshot_headers
+@with_query_budget
 def api_get_records():
     """API endpoint to get filtered and paginated records."""
     try:
@@ -214,6 +785,10 @@ def api_get_records():
         limit = request.args.get('limit', 100, type=int)
         offset = request.args.get('offset', 0, type=int)
         aggregation = request.args.get('aggregation', 'raw')
+        response_format = request.args.get('format', 'rows')
+        
+        if response_format not in ['rows', 'columnar']:
+            return jsonify({'error': 'Invalid format. Must be one of: rows, columnar'}), 400
         
         if limit < 1 or limit > 10000:
             return jsonify({'error': 'Limit must be between 1 and 10000'}), 400
@@ -235,7 +810,7 @@ def api_get_records():
         if min_value is not None and max_value is not None and min_value > max_value:
             return jsonify({'error': 'min_value must be less than or equal to max_value'}), 400
         
-        records = get_filtered_records(
+        query_args = dict(
             mode_id=mode_id,
             start_time=start_time,
             end_time=end_time,
@@ -243,24 +818,42 @@ def api_get_records():
             max_value=max_value,
             limit=limit,
             offset=offset,
-            aggregation=aggregation
+            aggregation=aggregation,
+            snapshot=use_snapshot()
         )
+        filters = {
+            'mode_id': mode_id,
+            'start_time': start_time,
+            'end_time': end_time,
+            'min_value': min_value,
+            'max_value': max_value,
+            'aggregation': aggregation
+        }
+        
+        if response_format == 'columnar':
+            result = get_filtered_records_columnar(**query_args)
+            return jsonify({
+                'format': 'columnar',
+                'columns': result['columns'],
+                'modes': result['modes'],
+                'count': result['count'],
+                'limit': limit,
+                'offset': offset,
+                'filters': filters
+            })
+        
+        records = get_filtered_records(**query_args)
         
         return jsonify({
             'records': records,
             'count': len(records),
             'limit': limit,
             'offset': offset,
-            'filters': {
-                'mode_id': mode_id,
-                'start_time': start_time,
-                'end_time': end_time,
-                'min_value': min_value,
-                'max_value': max_value,
-                'aggregation': aggregation
-            }
+            'filters': filters
         })
     
+    except QueryTimeoutError as e:
+        return query_timeout_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
@@ -268,6 +861,9 @@ def api_get_records():
 
 
 @app.route('/api/statistics')
+@conditional_on(analytics_version)
+@snapshot_headers
+@with_query_budget
 def api_get_statistics():
     """API endpoint to get statistics for readings."""
     try:
@@ -293,7 +889,8 @@ def api_get_statistics():
             start_time=start_time,
             end_time=end_time,
             min_value=min_value,
-            max_value=max_value
+            max_value=max_value,
+            snapshot=use_snapshot()
         )
         
         return jsonify({
@@ -307,18 +904,274 @@ def api_get_statistics():
             }
         })
     
+    except QueryTimeoutError as e:
+        return query_timeout_response(e)
     except ValueError as e:
         return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': f'Internal server error: {str(e)}'}), 500
 
 
+@app.route('/api/chart-series')
+@conditional_on(readings_version)
+@with_query_budget
+def api_get_chart_series():
+    """API endpoint to get a chart series downsampled to a pixel width."""
+    try:
+        mode_id = request.args.get('mode_id', type=int)
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        width = request.args.get('width', 800, type=int)
+        method = request.args.get('method', 'm4')
+        
+        if width < 1 or width > 10000:
+            return jsonify({'error': 'Width must be between 1 and 10000'}), 400
+        
+        if method not in ['m4', 'lttb']:
+            return jsonify({'error': 'Invalid method. Must be one of: m4, lttb'}), 400
+        
+        if mode_id is not None:
+            mode = get_mode_by_id(mode_id)
+            if not mode:
+                return jsonify({'error': f'Mode {mode_id} not found'}), 404
+        
+        if start_time and end_time and start_time > end_time:
+            return jsonify({'error': 'start_time must be before end_time'}), 400
+        
+        result = get_chart_series(
+            mode_id=mode_id,
+            start_time=start_time,
+            end_time=end_time,
+            width=width,
+            method=method
+        )
+        
+        return jsonify({
+            'series': result['series'],
+            'bucket_seconds': result['bucket_seconds'],
+            'width': width,
+            'method': method,
+            'filters': {
+                'mode_id': mode_id,
+                'start_time': start_time,
+                'end_time': end_time
+            }
+        })
+    
+    except QueryTimeoutError as e:
+        return query_timeout_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """
+    API endpoint for bulk ingest of device readings.
+    
+    Accepts application/x-ndjson (one [mode_id, timestamp, value] array or
+    object per line) or application/octet-stream (packed little-endian
+    uint32 mode_id, float64 epoch seconds, float64 value records). The batch
+    is validated as a whole and stored in a single transaction.
+    """
+    content_type = request.mimetype
+    
+    try:
+        if content_type == 'application/octet-stream':
+            rows = parse_binary(request.get_data())
+        elif content_type in ('application/x-ndjson', 'application/json', 'text/plain'):
+            rows = parse_ndjson(request.get_data(as_text=True))
+        else:
+            return jsonify({'error': 'Content-Type must be application/x-ndjson or application/octet-stream'}), 415
+        
+        if not rows:
+            return jsonify({'error': 'No readings in request body'}), 400
+        if len(rows) > app.config['INGEST_MAX_ROWS']:
+            return jsonify({'error': f"Batch exceeds {app.config['INGEST_MAX_ROWS']} readings"}), 413
+        
+        stored = ingest_readings(rows)
+        
+        return jsonify({
+            'ingested': len(rows),
+            'stored': len(stored),
+            'first_id': stored[0][0] if stored else None,
+            'last_id': stored[-1][0] if stored else None
+        }), 201
+    
+    except IngestError as e:
+        return jsonify({'error': str(e), 'rows': e.errors}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
+def parse_feed_args(after_id=None):
+    """
+    Read the cursor, mode filter and batch size of a change feed request.
+    
+    'mode_id' may be repeated or comma-separated; without 'after' the feed
+    starts at the newest stored reading.
+    
+    Raises:
+        ValueError: For malformed arguments or unknown modes
+    """
+    if after_id is None:
+        after_id = request.args.get('after')
+    after_id = change_feed.start_position(int(after_id) if after_id is not None else None)
+    
+    mode_ids = None
+    requested = [part for arg in request.args.getlist('mode_id')
+                 for part in arg.split(',') if part.strip()]
+    if requested:
+        mode_ids = sorted({int(part) for part in requested})
+        unknown = set(mode_ids) - get_mode_ids()
+        if unknown:
+            raise ValueError(f"Unknown mode_id {min(unknown)}")
+    
+    limit = request.args.get('limit', app.config['FEED_MAX_BATCH'], type=int)
+    if limit < 1:
+        raise ValueError("limit must be positive")
+    return after_id, mode_ids, min(limit, app.config['FEED_MAX_BATCH'])
+
+
+@app.route('/api/feed')
+def api_feed():
+    """
+    Long-poll change feed of stored readings.
+    
+    Returns the readings stored after reading id 'after' as soon as there
+    are any, or an empty batch after 'timeout' seconds. Clients pass the
+    returned 'last_id' as 'after' of their next request.
+    """
+    try:
+        after_id, mode_ids, limit = parse_feed_args()
+        timeout = min(max(request.args.get('timeout', 25.0, type=float), 0),
+                      app.config['FEED_MAX_TIMEOUT'])
+        
+        readings = change_feed.wait_for_changes(after_id, mode_ids, limit, timeout=timeout)
+        
+        return jsonify({
+            'readings': change_feed.columns(readings),
+            'last_id': readings[-1][0] if readings else after_id
+        })
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
+@app.route('/api/feed/stream')
+def api_feed_stream():
+    """
+    Server-Sent Events change feed of stored readings.
+    
+    Streams 'readings' events after reading id 'after', or after the
+    Last-Event-ID an EventSource sends when it reconnects.
+    """
+    try:
+        after_id, mode_ids, limit = parse_feed_args(request.headers.get('Last-Event-ID'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    events = change_feed.stream_events(
+        after_id, mode_ids, limit,
+        interval=app.config['FEED_POLL_INTERVAL'],
+        keepalive=app.config['FEED_KEEPALIVE']
+    )
+    return Response(stream_with_context(events), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/interpolated')
+@conditional_on(analytics_version)
+@snapshot_headers
+@with_query_budget
+def api_get_interpolated():
+    """API endpoint to get an evenly spaced, interpolated series for a mode."""
+    try:
+        mode_id = request.args.get('mode_id', type=int)
+        start_time = request.args.get('start_time')
+        end_time = request.args.get('end_time')
+        step = request.args.get('step', 60, type=float)
+        
+        if mode_id is None:
+            return jsonify({'error': 'mode_id is required'}), 400
+        
+        if not get_mode_by_id(mode_id):
+            return jsonify({'error': f'Mode {mode_id} not found'}), 404
+        
+        if start_time and end_time and start_time > end_time:
+            return jsonify({'error': 'start_time must be before end_time'}), 400
+        
+        result = get_interpolated_series(mode_id, start_time=start_time,
+                                         end_time=end_time, step=step,
+                                         snapshot=use_snapshot())
+        
+        return jsonify(dict(result, mode_id=mode_id))
+    
+    except QueryTimeoutError as e:
+        return query_timeout_response(e)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
+@app.route('/api/archive')
+def api_get_archive():
+    """API endpoint summarizing the compressed archive tier per mode."""
+    return jsonify({'modes': get_archive_summary()})
+
+
+@app.route('/api/archive/compact', methods=['POST'])
+def api_compact_archive():
+    """
+    API endpoint moving closed days of readings into the archive tier.
+    
+    Body: {"before": "YYYY-MM-DD"} or {"older_than_days": N} (default 7).
+    """
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        before = data.get('before')
+        if before is None:
+            older_than_days = int(data.get('older_than_days', 7))
+            if older_than_days < 1:
+                return jsonify({'error': 'older_than_days must be at least 1'}), 400
+            before = (datetime.now(timezone.utc) - timedelta(days=older_than_days)).strftime('%Y-%m-%d')
+        
+        summary = compact_readings(before)
+        return jsonify(dict(summary, before=before))
+    
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': f'Internal server error: {str(e)}'}), 500
+
+
+@app.route('/api/diagnostics/event-loop')
+def api_event_loop_diagnostics():
+    """API endpoint reporting event loop lag, database pool, ingest, snapshot, emit queue, aggregate, rule and voltage write state."""
+    return jsonify({
+        'hub_lag': hub_monitor.get_stats(),
+        'db_pool': get_pool_stats(),
+        'line_ingest': line_listener.get_stats(),
+        'analytics_snapshot': dict(get_snapshot_status(), enabled=use_snapshot()),
+        'emit_queues': outbound.get_stats(),
+        'continuous_queries': continuous_queries.get_stats(),
+        'alert_rules': rules.get_stats(),
+        'voltage_writes': voltage_writes.get_stats()
+    })
+
+
 @socketio.on('connect')
 def handle_connect():
     """Handle client connection with session initialization."""
-    from flask_socketio import request as socketio_request
-    client_id = socketio_request.sid
-    client_subscriptions[client_id] = set()
+    client_id = request.sid
+    client_subscriptions.connect(client_id)
+    outbound.register(client_id)
     print(f'Client connected: {client_id}')
     emit('connection_response', {
         'status': 'connected',
@@ -330,69 +1183,275 @@ def handle_connect():
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection and cleanup subscriptions."""
-    from flask_socketio import request as socketio_request
-    client_id = socketio_request.sid
+    client_id = request.sid
     
-    if client_id in client_subscriptions:
-        for mode_id in client_subscriptions[client_id]:
-            leave_room(f'mode_{mode_id}')
-        del client_subscriptions[client_id]
+    for mode_id in client_subscriptions.disconnect(client_id):
+        leave_room(f'mode_{mode_id}')
+    continuous_queries.disconnect(client_id)
+    outbound.unregister(client_id)
     
     print(f'Client disconnected: {client_id}')
 
 
+def is_number(value):
+    """Whether a Socket.IO argument is a JSON number."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def replay_readings(mode_id, data):
+    """
+    Collect the readings a resubscribing client missed.
+    
+    Readings after the client's 'since' sequence number are replayed from
+    the in-process log when it is from the current 'stream' and still
+    reaches back that far. Otherwise readings after the client's 'since_id'
+    reading id are read from the database; those no longer logged have a
+    None sequence number.
+    
+    Returns:
+        Columnar readings with the replay 'source' ('log', 'database' or
+        None when nothing could be replayed) and whether it is 'complete'
+    """
+    if data.get('stream') == live_buffer.epoch:
+        replay = live_buffer.replay(mode_id, int(data['since']))
+        if replay is not None:
+            return dict(replay, source='log', complete=True)
+    
+    since_id = data.get('since_id')
+    if not is_number(since_id):
+        return dict(live_buffer.columns([]), source=None, complete=False)
+    
+    limit = app.config['REPLAY_MAX_READINGS']
+    rows = get_readings_after(mode_id, int(since_id), limit=limit + 1)
+    complete = len(rows) <= limit
+    rows = rows[-limit:]
+    seqs = live_buffer.sequence_map(mode_id, [row[0] for row in rows])
+    return dict(
+        live_buffer.columns([(seqs.get(reading_id), reading_id, timestamp, value)
+                             for reading_id, timestamp, value in rows]),
+        source='database',
+        complete=complete
+    )
+
+
+def subscription_payload(mode_id, mode, data):
+    """
+    Build the subscription_confirmed payload.
+    
+    The payload names the sequence 'stream' and the mode's latest 'seq'.
+    When the client sends 'history_seconds', it also carries that much
+    recent history of the mode (up to live_buffer.HISTORY_SECONDS) from the
+    in-process log, so a new dashboard is populated in the same round-trip
+    without a query. A reconnecting client sends 'since' instead and gets
+    the readings it missed as 'replay' (see replay_readings).
+    """
+    payload = {
+        'mode_id': mode_id,
+        'mode_name': mode['name'],
+        'room': f'mode_{mode_id}',
+        'stream': live_buffer.epoch,
+        'seq': live_buffer.last_sequence(mode_id)
+    }
+    
+    if is_number(data.get('since')):
+        payload['replay'] = replay_readings(mode_id, data)
+    
+    seconds = data.get('history_seconds')
+    if is_number(seconds) and seconds > 0:
+        payload['history'] = live_buffer.history(mode_id, seconds)
+    
+    return payload
+
+
+def parse_mode_id(value):
+    """Mode id from a Socket.IO argument (a number or digit string), else None."""
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isdigit():
+        return int(value)
+    return None
+
+
+def resolve_modes(data):
+    """
+    Resolve the modes named by a subscribe or unsubscribe request.
+    
+    'mode_id' names one mode, 'mode_ids' a list of mode ids or '*' for
+    every mode, and 'pattern' matches mode names with shell-style wildcards
+    (case-insensitive). All of them are checked against the cached mode
+    registry in one pass, without a query per mode.
+    
+    Returns:
+        List of mode dicts in id order
+    
+    Raises:
+        ValueError: For a malformed request or unknown modes
+    """
+    registry = get_mode_registry()
+    
+    if 'mode_id' in data:
+        mode = registry.get(parse_mode_id(data['mode_id']))
+        if mode is None:
+            raise ValueError(f"Mode {data['mode_id']} not found")
+        return [mode]
+    
+    requested = data.get('mode_ids')
+    if requested == '*':
+        return [registry[mode_id] for mode_id in sorted(registry)]
+    if requested is not None:
+        if not isinstance(requested, list) or not requested:
+            raise ValueError("mode_ids must be a non-empty list of mode ids or '*'")
+        unknown = [value for value in requested if parse_mode_id(value) not in registry]
+        if unknown:
+            raise ValueError(f"Modes not found: {', '.join(str(value) for value in unknown)}")
+        return [registry[mode_id] for mode_id in sorted({parse_mode_id(value) for value in requested})]
+    
+    pattern = data.get('pattern')
+    if isinstance(pattern, str) and pattern:
+        modes = [registry[mode_id] for mode_id in sorted(registry)
+                 if fnmatch(registry[mode_id]['name'].lower(), pattern.lower())]
+        if not modes:
+            raise ValueError(f"No modes match {pattern!r}")
+        return modes
+    
+    raise ValueError("mode_id, mode_ids or pattern is required")
+
+
+def mode_options(data, mode_id):
+    """
+    Subscribe options of one mode of a multi-mode request.
+    
+    'since' and 'since_id' may map mode ids (as strings) to the position
+    of each mode; other options apply to every mode.
+    """
+    options = dict(data)
+    for key in ('since', 'since_id'):
+        if isinstance(data.get(key), dict):
+            options[key] = data[key].get(str(mode_id))
+    return options
+
+
+def subscription_confirmation(modes, data):
+    """
+    Build the confirmation of a subscribe request as (event, payload).
+    
+    A single 'mode_id' is confirmed with subscription_confirmed; lists and
+    patterns with one subscriptions_confirmed event carrying a payload per
+    mode.
+    """
+    if 'mode_id' in data:
+        mode = modes[0]
+        return 'subscription_confirmed', subscription_payload(mode['id'], mode, data)
+    return 'subscriptions_confirmed', {
+        'mode_ids': [mode['id'] for mode in modes],
+        'subscriptions': [subscription_payload(mode['id'], mode, mode_options(data, mode['id']))
+                          for mode in modes]
+    }
+
+
 @socketio.on('subscribe_mode')
 def handle_subscribe_mode(data):
-    """Handle client subscription to a specific mode."""
-    from flask_socketio import request as socketio_request
-    client_id = socketio_request.sid
+    """Handle client subscription to one mode, a list of modes or a pattern."""
+    client_id = request.sid
     
-    if not data or 'mode_id' not in data:
+    if not data:
         emit('error', {'error': 'mode_id is required for subscription'})
         return
     
-    mode_id = data['mode_id']
-    mode = get_mode_by_id(mode_id)
-    
-    if not mode:
-        emit('error', {'error': f'Mode {mode_id} not found'})
+    try:
+        modes = resolve_modes(data)
+        for mode in modes:
+            outbound.set_policy(client_id, mode['id'], data.get('policy'))
+    except ValueError as e:
+        emit('error', {'error': str(e)})
         return
     
-    room = f'mode_{mode_id}'
-    join_room(room)
-    
-    if client_id not in client_subscriptions:
-        client_subscriptions[client_id] = set()
-    client_subscriptions[client_id].add(mode_id)
+    # Join before collecting any replay, so no reading falls between the
+    # two; clients drop the duplicates by sequence number
+    for mode in modes:
+        join_room(f"mode_{mode['id']}")
+        client_subscriptions.add(client_id, mode['id'])
     
-    emit('subscription_confirmed', {
-        'mode_id': mode_id,
-        'mode_name': mode['name'],
-        'room': room
-    })
+    emit(*subscription_confirmation(modes, data))
     
-    print(f'Client {client_id} subscribed to mode {mode_id}')
+    print(f"Client {client_id} subscribed to mode(s) {', '.join(str(mode['id']) for mode in modes)}")
 
 
 @socketio.on('unsubscribe_mode')
 def handle_unsubscribe_mode(data):
-    """Handle client unsubscription from a specific mode."""
-    from flask_socketio import request as socketio_request
-    client_id = socketio_request.sid
+    """Handle client unsubscription from one mode, a list of modes or a pattern."""
+    client_id = request.sid
     
-    if not data or 'mode_id' not in data:
+    if not data:
         emit('error', {'error': 'mode_id is required for unsubscription'})
         return
     
-    mode_id = data['mode_id']
-    room = f'mode_{mode_id}'
-    leave_room(room)
+    try:
+        mode_ids = [mode['id'] for mode in resolve_modes(data)]
+    except ValueError as e:
+        emit('error', {'error': str(e)})
+        return
+    
+    for mode_id in mode_ids:
+        leave_room(f'mode_{mode_id}')
+        client_subscriptions.discard(client_id, mode_id)
+        outbound.clear_policy(client_id, mode_id)
+    
+    if 'mode_id' in data:
+        emit('unsubscription_confirmed', {'mode_id': mode_ids[0]})
+    else:
+        emit('unsubscription_confirmed', {'mode_ids': mode_ids})
+    print(f"Client {client_id} unsubscribed from mode(s) {', '.join(map(str, mode_ids))}")
+
+
+def aggregate_subscription(client_id, data):
+    """
+    Subscribe a client to a continuous aggregate query.
+    
+    The request names the 'mode_id', the 'kind' ('rolling' for a sliding
+    window, 'buckets' for aligned tumbling buckets; default 'rolling') and
+    the window or bucket length in 'seconds' (default 60).
+    
+    Returns:
+        The aggregate_subscribed payload: the query's name and current value
+    
+    Raises:
+        ValueError: For an unknown mode or an invalid query
+    """
+    mode_id = parse_mode_id(data.get('mode_id'))
+    if mode_id not in get_mode_registry():
+        raise ValueError(f"Mode {data.get('mode_id')} not found")
+    return continuous_queries.subscribe(client_id, mode_id, data.get('kind', 'rolling'),
+                                        data.get('seconds', 60))
+
+
+@socketio.on('subscribe_aggregate')
+def handle_subscribe_aggregate(data):
+    """Handle client subscription to a rolling window or bucketed aggregate."""
+    client_id = request.sid
+    
+    try:
+        payload = aggregate_subscription(client_id, data or {})
+    except ValueError as e:
+        emit('error', {'error': str(e)})
+        return
     
-    if client_id in client_subscriptions:
-        client_subscriptions[client_id].discard(mode_id)
+    join_room(f"aggregate_{payload['query']}")
+    emit('aggregate_subscribed', payload)
+
+
+@socketio.on('unsubscribe_aggregate')
+def handle_unsubscribe_aggregate(data):
+    """Handle client unsubscription from an aggregate query."""
+    client_id = request.sid
+    query = (data or {}).get('query')
+    
+    if not isinstance(query, str) or not continuous_queries.unsubscribe(client_id, query):
+        emit('error', {'error': f'Unknown aggregate query {query!r}'})
+        return
     
-    emit('unsubscription_confirmed', {'mode_id': mode_id})
-    print(f'Client {client_id} unsubscribed from mode {mode_id}')
+    leave_room(f'aggregate_{query}')
+    emit('aggregate_unsubscribed', {'query': query})
 
 
 @socketio.on('start_simulator')
@@ -412,6 +1471,10 @@ def handle_stop_simulator():
 
 
 if __name__ == '__main__':
-    init_app()
-    print("Starting Flask-SocketIO server...")
-    socketio.run(app, debug=True, host='0.0.0.0', port=5000)
+    if SERVER_MODE == 'asyncio':
+        import asgi_app
+        asgi_app.main()
+    else:
+        init_app()
+        print("Starting Flask-SocketIO server...")
+        socketio.run(app, debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,253 @@
+"""
+Compressed columnar archive tier for cold readings.
+
+Closed time ranges of the readings table (one UTC day per mode) are compacted
+into chunk files holding three compressed columns:
+
+- ids and timestamps (epoch milliseconds): delta-of-delta encoding with
+  variable-width buckets, so regularly sampled series cost about one bit
+  per reading
+- values: Gorilla XOR encoding of the IEEE-754 bits against the previous
+  value, storing only the meaningful bits that changed
+
+Chunk file layout (little-endian header, then the three bit streams):
+
+    magic 'RDA1' | mode_id u32 | count u32 | first_ms i64 | last_ms i64 |
+    min f64 | max f64 | sum f64 | ids_len u32 | timestamps_len u32 |
+    values_len u32 | ids | timestamps | values
+
+Chunks are written to a temporary file, fsynced and renamed into place, and
+read back through mmap. The chunk index lives in the archive_chunks table;
+database.py decodes the chunks a query needs and serves them together with
+the hot readings table.
+"""
+
+import mmap
+import os
+import struct
+
+MAGIC = b'RDA1'
+HEADER = struct.Struct('<4sIIqqdddIII')
+FLOAT_BITS = struct.Struct('<d')
+INT_BITS = struct.Struct('<q')
+
+# Delta-of-delta buckets: (prefix, prefix length, payload bits)
+DOD_BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 32),
+)
+DOD_FALLBACK = (0b11111, 5, 64)
+
+
+class BitWriter:
+    """Appends bit fields to a bytearray."""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.acc = 0
+        self.bits = 0
+
+    def write(self, value, width):
+        """Append the low `width` bits of value."""
+        self.acc = (self.acc << width) | (value & ((1 << width) - 1))
+        self.bits += width
+        while self.bits >= 8:
+            self.bits -= 8
+            self.data.append((self.acc >> self.bits) & 0xFF)
+        self.acc &= (1 << self.bits) - 1
+
+    def getvalue(self):
+        """Return the stream padded to a whole byte."""
+        if self.bits:
+            return bytes(self.data) + bytes([(self.acc << (8 - self.bits)) & 0xFF])
+        return bytes(self.data)
+
+
+class BitReader:
+    """Reads bit fields from a bytes-like buffer (for example an mmap)."""
+
+    def __init__(self, data, start=0):
+        self.data = data
+        self.pos = start * 8
+
+    def read(self, width):
+        """Read the next `width` bits as an unsigned integer."""
+        pos = self.pos
+        first = pos >> 3
+        last = (pos + width + 7) >> 3
+        chunk = int.from_bytes(self.data[first:last], 'big')
+        self.pos = pos + width
+        return (chunk >> ((last - first) * 8 - (pos & 7) - width)) & ((1 << width) - 1)
+
+    def read_signed(self, width):
+        """Read a two's complement integer of `width` bits."""
+        value = self.read(width)
+        if value >> (width - 1):
+            value -= 1 << width
+        return value
+
+
+def encode_integers(values):
+    """Delta-of-delta encode a sequence of integers."""
+    writer = BitWriter()
+    if not values:
+        return b''
+    writer.write(values[0], 64)
+    previous, previous_delta = values[0], 0
+    for value in values[1:]:
+        delta = value - previous
+        dod = delta - previous_delta
+        if dod == 0:
+            writer.write(0, 1)
+        else:
+            for prefix, prefix_bits, payload_bits in DOD_BUCKETS + (DOD_FALLBACK,):
+                limit = 1 << (payload_bits - 1)
+                if -limit <= dod < limit:
+                    writer.write(prefix, prefix_bits)
+                    writer.write(dod, payload_bits)
+                    break
+        previous, previous_delta = value, delta
+    return writer.getvalue()
+
+
+def decode_integers(data, start, count):
+    """Decode `count` delta-of-delta encoded integers."""
+    if not count:
+        return []
+    reader = BitReader(data, start)
+    value = reader.read_signed(64)
+    values = [value]
+    delta = 0
+    for _ in range(count - 1):
+        if reader.read(1):
+            payload_bits = 64
+            for prefix, prefix_bits, bits in DOD_BUCKETS:
+                if not reader.read(1):
+                    payload_bits = bits
+                    break
+            delta += reader.read_signed(payload_bits)
+        value += delta
+        values.append(value)
+    return values
+
+
+def float_to_bits(value):
+    return INT_BITS.unpack(FLOAT_BITS.pack(value))[0] & 0xFFFFFFFFFFFFFFFF
+
+
+def bits_to_float(bits):
+    return FLOAT_BITS.unpack(INT_BITS.pack(bits - (1 << 64) if bits >> 63 else bits))[0]
+
+
+def leading_zeros(bits):
+    return 64 - bits.bit_length()
+
+
+def trailing_zeros(bits):
+    return (bits & -bits).bit_length() - 1
+
+
+def encode_floats(values):
+    """Gorilla XOR encode a sequence of floats."""
+    if not values:
+        return b''
+    writer = BitWriter()
+    previous = float_to_bits(values[0])
+    writer.write(previous, 64)
+    window_leading, window_trailing = -1, -1
+    for value in values[1:]:
+        bits = float_to_bits(value)
+        xor = bits ^ previous
+        previous = bits
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+        leading = min(leading_zeros(xor), 31)
+        trailing = trailing_zeros(xor)
+        if window_leading >= 0 and leading >= window_leading and trailing >= window_trailing:
+            # Meaningful bits fit in the previous window
+            writer.write(0b10, 2)
+            writer.write(xor >> window_trailing, 64 - window_leading - window_trailing)
+        else:
+            meaningful = 64 - leading - trailing
+            writer.write(0b11, 2)
+            writer.write(leading, 5)
+            writer.write(meaningful & 0x3F, 6)
+            writer.write(xor >> trailing, meaningful)
+            window_leading, window_trailing = leading, trailing
+    return writer.getvalue()
+
+
+def decode_floats(data, start, count):
+    """Decode `count` Gorilla XOR encoded floats."""
+    if not count:
+        return []
+    reader = BitReader(data, start)
+    bits = reader.read(64)
+    values = [bits_to_float(bits)]
+    leading = trailing = 0
+    for _ in range(count - 1):
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                meaningful = reader.read(6) or 64
+                trailing = 64 - leading - meaningful
+            bits ^= reader.read(64 - leading - trailing) << trailing
+        values.append(bits_to_float(bits))
+    return values
+
+
+def write_chunk(directory, name, mode_id, rows):
+    """
+    Write one compressed chunk file.
+
+    Args:
+        directory: Archive directory (created if missing)
+        name: File name of the chunk
+        mode_id: Mode ID of all rows
+        rows: List of (id, epoch_ms, value) tuples sorted by epoch_ms
+
+    Returns:
+        Tuple of (path, size in bytes)
+    """
+    ids, timestamps, values = zip(*rows)
+    streams = [encode_integers(ids), encode_integers(timestamps), encode_floats(values)]
+    header = HEADER.pack(
+        MAGIC, mode_id, len(rows), timestamps[0], timestamps[-1],
+        min(values), max(values), sum(values), *(len(stream) for stream in streams)
+    )
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        for stream in streams:
+            f.write(stream)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+    return path, HEADER.size + sum(len(stream) for stream in streams)
+
+
+def read_chunk(path):
+    """
+    Read a chunk file through mmap.
+
+    Returns:
+        Tuple of (mode_id, ids, epoch_ms timestamps, values)
+    """
+    with open(path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        (magic, mode_id, count, _, _, _, _, _,
+         ids_length, timestamps_length, _) = HEADER.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError(f"Not an archive chunk: {path}")
+        offset = HEADER.size
+        ids = decode_integers(data, offset, count)
+        offset += ids_length
+        timestamps = decode_integers(data, offset, count)
+        offset += timestamps_length
+        values = decode_floats(data, offset, count)
+    return mode_id, ids, timestamps, values
@@ -0,0 +1,355 @@
+"""
+Asyncio/ASGI serving mode.
+
+Serves Socket.IO with python-socketio's AsyncServer on an ASGI server
+(uvicorn) instead of eventlet. The HTTP pages and API are the Flask app from
+app.py, mounted through asgiref's WSGI adapter with each request on a thread
+pool of ASGI_HTTP_THREADS threads; emits issued by the Flask routes are
+forwarded to the AsyncServer on the event loop. Database access
+from coroutines goes through aio_database and the simulator runs as an
+asyncio task.
+
+Run with `python asgi_app.py` (or `SERVER_MODE=asyncio python app.py`).
+Requires the optional `uvicorn` and `asgiref` packages.
+"""
+
+import os
+
+os.environ.setdefault('SERVER_MODE', 'asyncio')
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import socketio
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import aio_database
+import line_listener
+import rules
+from app import (app as flask_app, socketio as flask_socketio, client_subscriptions,
+                 continuous_queries, resolve_modes, subscription_confirmation,
+                 aggregate_subscription, voltage_writes)
+from data_simulator import DataSimulator
+from emit_queue import POLICIES
+
+sio = socketio.AsyncServer(async_mode='asgi', cors_allowed_origins='*')
+simulator = DataSimulator(socketio=sio, voltages=voltage_writes)
+# Resolving modes may reload the mode registry and the replay of a
+# reconnecting client may need a database read
+resolve_subscription_modes = aio_database.asyncify(resolve_modes)
+build_subscription_confirmation = aio_database.asyncify(subscription_confirmation)
+subscribe_aggregate_query = aio_database.asyncify(aggregate_subscription)
+simulator_task = None
+snapshot_task = None
+aggregate_task = None
+alert_task = None
+voltage_task = None
+
+
+class LoopEmitter:
+    """Thread-safe emit() facade that schedules AsyncServer emits on the loop.
+
+    Installed as the Flask-SocketIO server so socketio.emit() calls made by
+    Flask routes (which run on worker threads) reach the asyncio clients.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.loop = None
+
+    def emit(self, event, *args, **kwargs):
+        """Schedule an emit on the event loop from any thread."""
+        coroutine = self.server.emit(event, *args, **kwargs)
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+        if running_loop is self.loop:
+            return running_loop.create_task(coroutine)
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+
+emitter = LoopEmitter(sio)
+flask_socketio.server = emitter
+
+
+class ClientDisconnected(OSError):
+    """Raised into a streamed response once its client has gone away."""
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WSGI adapter running each request on a thread of its own pool.
+
+    asgiref's adapter runs every request on one shared thread, so a slow
+    query or an open long-poll would hold up all other HTTP requests.
+    uvicorn silently drops what is sent to a closed connection, so sends
+    fail once the client has disconnected; otherwise an event stream would
+    keep its thread for good.
+    """
+
+    def __init__(self, wsgi_application, threads):
+        super().__init__(wsgi_application)
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='http')
+
+    async def __call__(self, scope, receive, send):
+        instance = WsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)
+        # The undecorated request handler, run without thread sensitivity
+        run = WsgiToAsgiInstance.__dict__['run_wsgi_app'].func
+        instance.run_wsgi_app = sync_to_async(
+            run.__get__(instance), thread_sensitive=False, executor=self.executor
+        )
+        state = {'disconnected': False, 'watcher': None}
+
+        async def wait_for_disconnect():
+            while (await receive())['type'] != 'http.disconnect':
+                pass
+            state['disconnected'] = True
+
+        async def receive_body():
+            message = await receive()
+            if not message.get('more_body'):
+                state['watcher'] = asyncio.create_task(wait_for_disconnect())
+            return message
+
+        async def send_while_connected(message):
+            if state['disconnected']:
+                raise ClientDisconnected("Client disconnected")
+            await send(message)
+
+        try:
+            await instance(scope, receive_body, send_while_connected)
+        except ClientDisconnected:
+            pass
+        finally:
+            if state['watcher'] is not None:
+                state['watcher'].cancel()
+
+
+async def refresh_snapshot_periodically(interval):
+    """Refresh the analytics snapshot every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await aio_database.refresh_snapshot()
+        except Exception as e:
+            print(f"Analytics snapshot refresh failed: {e}")
+
+
+async def publish_aggregates_periodically(interval):
+    """Push the continuous aggregates that changed every `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            for key, payload in continuous_queries.collect():
+                await sio.emit('aggregate_update', payload, room=f'aggregate_{key}')
+        except Exception as e:
+            print(f"Aggregate publishing failed: {e}")
+
+
+async def publish_alerts_periodically(interval):
+    """Store and push the alerts fired in the last `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        alerts = rules.take_alerts()
+        if not alerts:
+            continue
+        try:
+            stored = await aio_database.add_alerts(alerts)
+        except Exception as e:
+            # Stored and pushed with the next call
+            rules.requeue_alerts(alerts)
+            print(f"Alert publishing failed: {e}")
+            continue
+        try:
+            for alert in stored:
+                await sio.emit('alert', alert)
+        except Exception as e:
+            print(f"Alert broadcast failed: {e}")
+
+
+async def flush_voltages_periodically(interval):
+    """Store and broadcast the voltages requested in the last `interval` seconds."""
+    while True:
+        await asyncio.sleep(interval)
+        voltages = voltage_writes.take()
+        if not voltages:
+            continue
+        try:
+            updated = await aio_database.set_mode_voltages(voltages)
+        except Exception as e:
+            # Retried with the next flush; newer requests for a mode still win
+            voltage_writes.requeue(voltages)
+            print(f"Voltage flush failed: {e}")
+            continue
+        try:
+            for mode_id in updated:
+                await sio.emit('voltage_changed', {'mode_id': mode_id, 'voltage': voltages[mode_id]})
+        except Exception as e:
+            print(f"Voltage broadcast failed: {e}")
+
+
+async def on_startup():
+    """Bind the emitter to the loop, initialize the database and start listeners."""
+    global snapshot_task, aggregate_task, alert_task, voltage_task
+    emitter.loop = asyncio.get_running_loop()
+    if flask_app.config['READINGS_BACKEND'] == 'memory':
+        await aio_database.use_memory_database()
+    await aio_database.init_db()
+    await aio_database.use_readings_backend(
+        flask_app.config['READINGS_BACKEND'], shards=flask_app.config['READINGS_SHARDS']
+    )
+    
+    interval = flask_app.config['ANALYTICS_SNAPSHOT_INTERVAL']
+    if interval > 0:
+        await aio_database.refresh_snapshot()
+        snapshot_task = asyncio.create_task(refresh_snapshot_periodically(interval))
+    
+    aggregate_task = asyncio.create_task(
+        publish_aggregates_periodically(flask_app.config['AGGREGATE_INTERVAL'])
+    )
+    alert_task = asyncio.create_task(
+        publish_alerts_periodically(flask_app.config['ALERT_INTERVAL'])
+    )
+    voltage_task = asyncio.create_task(
+        flush_voltages_periodically(flask_app.config['VOLTAGE_FLUSH_INTERVAL'])
+    )
+    
+    tcp_port = flask_app.config['LINE_INGEST_TCP_PORT']
+    udp_port = flask_app.config['LINE_INGEST_UDP_PORT']
+    if tcp_port or udp_port:
+        line_listener.server = line_listener.LineIngestServer()
+        await line_listener.server.start(tcp_port=tcp_port, udp_port=udp_port)
+
+
+@sio.event
+async def connect(sid, environ):
+    """Handle client connection with session initialization."""
+    client_subscriptions.connect(sid)
+    print(f'Client connected: {sid}')
+    await sio.emit('connection_response', {
+        'status': 'connected',
+        'message': 'Connected to server',
+        'client_id': sid
+    }, to=sid)
+
+
+@sio.event
+async def disconnect(sid):
+    """Handle client disconnection and cleanup subscriptions."""
+    for mode_id in client_subscriptions.disconnect(sid):
+        await sio.leave_room(sid, f'mode_{mode_id}')
+    continuous_queries.disconnect(sid)
+
+    print(f'Client disconnected: {sid}')
+
+
+@sio.on('subscribe_mode')
+async def subscribe_mode(sid, data):
+    """Handle client subscription to one mode, a list of modes or a pattern."""
+    if not data:
+        await sio.emit('error', {'error': 'mode_id is required for subscription'}, to=sid)
+        return
+
+    try:
+        modes = await resolve_subscription_modes(data)
+        if data.get('policy') is not None and data['policy'] not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+    except ValueError as e:
+        await sio.emit('error', {'error': str(e)}, to=sid)
+        return
+
+    for mode in modes:
+        await sio.enter_room(sid, f"mode_{mode['id']}")
+        client_subscriptions.add(sid, mode['id'])
+
+    event, payload = await build_subscription_confirmation(modes, data)
+    if 'policy' in data:
+        # There are no per-client emit queues in this mode, so no slow-client
+        # policy applies; say so rather than silently ignoring it
+        payload['policy'] = None
+    await sio.emit(event, payload, to=sid)
+
+    print(f"Client {sid} subscribed to mode(s) {', '.join(str(mode['id']) for mode in modes)}")
+
+
+@sio.on('unsubscribe_mode')
+async def unsubscribe_mode(sid, data):
+    """Handle client unsubscription from one mode, a list of modes or a pattern."""
+    if not data:
+        await sio.emit('error', {'error': 'mode_id is required for unsubscription'}, to=sid)
+        return
+
+    try:
+        mode_ids = [mode['id'] for mode in await resolve_subscription_modes(data)]
+    except ValueError as e:
+        await sio.emit('error', {'error': str(e)}, to=sid)
+        return
+
+    for mode_id in mode_ids:
+        await sio.leave_room(sid, f'mode_{mode_id}')
+        client_subscriptions.discard(sid, mode_id)
+
+    confirmation = {'mode_id': mode_ids[0]} if 'mode_id' in data else {'mode_ids': mode_ids}
+    await sio.emit('unsubscription_confirmed', confirmation, to=sid)
+    print(f"Client {sid} unsubscribed from mode(s) {', '.join(map(str, mode_ids))}")
+
+
+@sio.on('subscribe_aggregate')
+async def subscribe_aggregate(sid, data):
+    """Handle client subscription to a rolling window or bucketed aggregate."""
+    try:
+        payload = await subscribe_aggregate_query(sid, data or {})
+    except ValueError as e:
+        await sio.emit('error', {'error': str(e)}, to=sid)
+        return
+
+    await sio.enter_room(sid, f"aggregate_{payload['query']}")
+    await sio.emit('aggregate_subscribed', payload, to=sid)
+
+
+@sio.on('unsubscribe_aggregate')
+async def unsubscribe_aggregate(sid, data):
+    """Handle client unsubscription from an aggregate query."""
+    query = (data or {}).get('query')
+    if not isinstance(query, str) or not continuous_queries.unsubscribe(sid, query):
+        await sio.emit('error', {'error': f'Unknown aggregate query {query!r}'}, to=sid)
+        return
+
+    await sio.leave_room(sid, f'aggregate_{query}')
+    await sio.emit('aggregate_unsubscribed', {'query': query}, to=sid)
+
+
+@sio.on('start_simulator')
+async def start_simulator(sid):
+    """Start the data simulator."""
+    global simulator_task
+    if simulator_task is None or simulator_task.done():
+        simulator_task = asyncio.create_task(simulator.run_async())
+        await sio.emit('simulator_status', {'running': True})
+
+
+@sio.on('stop_simulator')
+async def stop_simulator(sid):
+    """Stop the data simulator."""
+    simulator.stop()
+    await sio.emit('simulator_status', {'running': False})
+
+
+asgi_app = socketio.ASGIApp(
+    sio,
+    other_asgi_app=PooledWsgiToAsgi(flask_app, flask_app.config['ASGI_HTTP_THREADS']),
+    on_startup=on_startup
+)
+
+
+def main(host='0.0.0.0', port=5000):
+    """Serve the ASGI application with uvicorn."""
+    import uvicorn
+
+    print("Starting asyncio Socket.IO server...")
+    uvicorn.run(asgi_app, host=host, port=port)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Traffic generator for the line-protocol ingest listener.
+
+Sends `mode_id,timestamp,value` lines over TCP or UDP at a target rate and
+reports the achieved throughput. Start a listener first:
+
+    python line_listener.py --tcp-port 5100 --udp-port 5101
+    python bench_line_ingest.py --protocol tcp --port 5100 --count 100000
+
+With --rate 0 lines are sent as fast as the socket accepts them.
+"""
+
+import argparse
+import asyncio
+import random
+import sys
+import time
+
+
+def generate_lines(count, mode_ids, bad_every=0):
+    """Yield encoded reading lines, with a malformed line every `bad_every` lines."""
+    now = time.time()
+    for i in range(count):
+        if bad_every and i % bad_every == bad_every - 1:
+            yield b'not,a-reading\n'
+            continue
+        mode_id = mode_ids[i % len(mode_ids)]
+        yield f'{mode_id},{now + i * 0.001:.3f},{random.uniform(0, 100):.3f}\n'.encode()
+
+
+def chunks(lines, lines_per_write):
+    """Group lines into write-sized byte strings."""
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) == lines_per_write:
+            yield b''.join(chunk)
+            chunk = []
+    if chunk:
+        yield b''.join(chunk)
+
+
+async def pace(sent, started, rate):
+    """Sleep as needed to keep `sent` lines at or below `rate` lines/second."""
+    if rate:
+        ahead = sent / rate - (time.monotonic() - started)
+        if ahead > 0:
+            await asyncio.sleep(ahead)
+
+
+async def send_tcp(host, port, lines, lines_per_write=100, rate=0):
+    """Stream lines over one TCP connection; returns the number sent."""
+    reader, writer = await asyncio.open_connection(host, port)
+    sent = 0
+    started = time.monotonic()
+    for chunk in chunks(lines, lines_per_write):
+        writer.write(chunk)
+        await writer.drain()
+        sent += chunk.count(b'\n')
+        await pace(sent, started, rate)
+    writer.close()
+    await writer.wait_closed()
+    return sent
+
+
+async def send_udp(host, port, lines, lines_per_write=20, rate=0):
+    """Send lines as UDP datagrams; returns the number sent."""
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(
+        asyncio.DatagramProtocol, remote_addr=(host, port)
+    )
+    sent = 0
+    started = time.monotonic()
+    try:
+        for chunk in chunks(lines, lines_per_write):
+            transport.sendto(chunk)
+            sent += chunk.count(b'\n')
+            await pace(sent, started, rate)
+            if not rate:
+                await asyncio.sleep(0)
+    finally:
+        transport.close()
+    return sent
+
+
+async def main_async(args):
+    """Run the generator."""
+    mode_ids = [int(mode_id) for mode_id in args.modes.split(',')]
+    lines = generate_lines(args.count, mode_ids, args.bad_every)
+    send = send_tcp if args.protocol == 'tcp' else send_udp
+
+    started = time.monotonic()
+    sent = await send(args.host, args.port, lines, args.lines_per_write, args.rate)
+    elapsed = time.monotonic() - started
+
+    print(f"Sent {sent} lines over {args.protocol} in {elapsed:.2f}s "
+          f"({sent / elapsed:.0f} lines/s)")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5100)
+    parser.add_argument('--protocol', choices=['tcp', 'udp'], default='tcp')
+    parser.add_argument('--count', type=int, default=10000)
+    parser.add_argument('--rate', type=float, default=0,
+                        help='target lines per second (0 = unthrottled)')
+    parser.add_argument('--modes', default='1,2,3,4', help='comma-separated mode ids')
+    parser.add_argument('--lines-per-write', type=int, default=100)
+    parser.add_argument('--bad-every', type=int, default=0,
+                        help='send a malformed line every N lines')
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the real-time Socket.IO path.
+
+Opens many concurrent Socket.IO clients against a running server, subscribes
+each to a mode and measures connect time, subscribe round-trip latency and
+data_update delivery latency. Runs unchanged against either serving mode:
+
+    python app.py                     # eventlet mode
+    python asgi_app.py                # asyncio mode
+    python bench_realtime.py --url http://localhost:5000 --clients 200
+
+Requires the python-socketio asyncio client dependencies (aiohttp).
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from datetime import datetime
+
+import socketio
+
+
+def percentile(values, fraction):
+    """Return the given percentile of a list of numbers."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name, values):
+    """Print count, median and tail latency in milliseconds."""
+    if not values:
+        print(f"  {name}: no samples")
+        return
+    ms = [v * 1000 for v in values]
+    print(f"  {name}: n={len(ms)} p50={statistics.median(ms):.1f}ms "
+          f"p95={percentile(ms, 0.95):.1f}ms max={max(ms):.1f}ms")
+
+
+async def run_client(url, mode_id, results, duration):
+    """Connect one client, subscribe, and record latencies for `duration` seconds."""
+    client = socketio.AsyncClient(reconnection=False)
+    subscribed = asyncio.Event()
+    subscribe_sent = 0.0
+
+    @client.on('subscription_confirmed')
+    async def on_subscription_confirmed(data):
+        results['subscribe'].append(time.monotonic() - subscribe_sent)
+        subscribed.set()
+
+    @client.on('data_update')
+    async def on_data_update(data):
+        if data.get('mode_id') == mode_id and data.get('timestamp'):
+            sent = datetime.fromisoformat(data['timestamp'])
+            results['delivery'].append((datetime.now() - sent).total_seconds())
+
+    started = time.monotonic()
+    try:
+        await client.connect(url, transports=['websocket'])
+    except Exception as e:
+        results['failed'] += 1
+        print(f"  connect failed: {e}")
+        return
+    results['connect'].append(time.monotonic() - started)
+
+    subscribe_sent = time.monotonic()
+    await client.emit('subscribe_mode', {'mode_id': mode_id})
+    try:
+        await asyncio.wait_for(subscribed.wait(), timeout=10)
+    except asyncio.TimeoutError:
+        results['failed'] += 1
+
+    await asyncio.sleep(duration)
+    await client.disconnect()
+
+
+async def main_async(args):
+    """Run the benchmark."""
+    results = {'connect': [], 'subscribe': [], 'delivery': [], 'failed': 0}
+
+    control = socketio.AsyncClient(reconnection=False)
+    if args.simulate:
+        await control.connect(args.url, transports=['websocket'])
+        await control.emit('start_simulator')
+
+    started = time.monotonic()
+    tasks = []
+    for _ in range(args.clients):
+        tasks.append(asyncio.create_task(run_client(args.url, args.mode_id, results, args.duration)))
+        if args.ramp:
+            await asyncio.sleep(args.ramp)
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - started
+
+    if args.simulate:
+        await control.emit('stop_simulator')
+        await control.disconnect()
+
+    print(f"Clients: {args.clients} ({results['failed']} failed) in {elapsed:.1f}s")
+    summarize('connect', results['connect'])
+    summarize('subscribe round-trip', results['subscribe'])
+    summarize('data_update delivery', results['delivery'])
+    return 0 if results['failed'] == 0 else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--mode-id', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds each client stays subscribed')
+    parser.add_argument('--ramp', type=float, default=0.0,
+                        help='delay between client connects in seconds')
+    parser.add_argument('--simulate', action='store_true',
+                        help='start the simulator for delivery latency samples')
+    args = parser.parse_args()
+    return asyncio.run(main_async(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the alert rule engine.
+
+Registers thousands of rules spread over many modes, runs a stream of
+readings through rules.evaluate() in ingest-sized batches (the way the live
+log hands them over) and reports how many readings per second the engine
+keeps up with, against a target ingest rate:
+
+    python bench_rules.py --rules 5000 --modes 500 --readings 200000
+    python bench_rules.py --target 50000
+
+Runs in-process; no server or database is needed.
+"""
+
+import argparse
+import random
+import sys
+import time
+
+from database import format_timestamp
+import rules
+
+
+def register_rules(count, mode_ids):
+    """Register `count` rules, cycling through the rule kinds and modes."""
+    for rule_id in range(1, count + 1):
+        mode_id = mode_ids[rule_id % len(mode_ids)]
+        kind = rules.KINDS[rule_id % len(rules.KINDS)]
+        if kind == 'threshold':
+            params = {'minimum': 10.0, 'maximum': 90.0}
+        elif kind == 'rate':
+            params = {'max_delta': 20.0, 'max_rate': 5000.0}
+        else:
+            params = {'window': 120, 'threshold': 4.0}
+        rules.register(rule_id, mode_id, rules.create_rule(kind, params))
+
+
+def generate_batches(count, mode_ids, batch_size, interval=0.001):
+    """Build (id, mode_id, timestamp, value) batches of random-walk readings with rare spikes."""
+    start = time.time()
+    values = {mode_id: 50.0 for mode_id in mode_ids}
+    batches = []
+    batch = []
+    for i in range(count):
+        mode_id = mode_ids[i % len(mode_ids)]
+        value = min(max(values[mode_id] + random.gauss(0, 1), 0.0), 100.0)
+        values[mode_id] = value
+        if random.random() < 0.001:
+            value = random.choice((0.0, 100.0))
+        batch.append((i + 1, mode_id, format_timestamp(start + i * interval), value))
+        if len(batch) == batch_size:
+            batches.append(batch)
+            batch = []
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rules', type=int, default=5000)
+    parser.add_argument('--modes', type=int, default=500)
+    parser.add_argument('--readings', type=int, default=200000)
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--target', type=float, default=20000,
+                        help='ingest rate to sustain, in readings per second')
+    args = parser.parse_args()
+
+    mode_ids = list(range(1, args.modes + 1))
+    register_rules(args.rules, mode_ids)
+    batches = generate_batches(args.readings, mode_ids, args.batch_size)
+
+    started = time.perf_counter()
+    for batch in batches:
+        rules.evaluate(batch)
+    elapsed = time.perf_counter() - started
+
+    stats = rules.get_stats()
+    rate = args.readings / elapsed
+    print(f"{stats['rules']} rules on {stats['modes']} modes: "
+          f"{args.readings} readings in {elapsed:.2f}s")
+    print(f"  {rate:.0f} readings/s, {stats['evaluated'] / elapsed:.0f} rule evaluations/s, "
+          f"{elapsed / args.readings * 1e6:.1f} us per reading")
+    print(f"  {stats['alerts']} alerts fired ({stats['dropped']} dropped)")
+    sustained = rate >= args.target
+    print(f"  {'Sustains' if sustained else 'Does not sustain'} {args.target:.0f} readings/s "
+          f"({rate / args.target:.1f}x)")
+    return 0 if sustained else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Change feed of stored readings for read-only consumers.
+
+Loggers, scripts and other services follow new readings over plain HTTP:
+GET /api/feed long-polls and GET /api/feed/stream streams Server-Sent
+Events. A consumer is just a cursor (the last reading id it has seen) and
+an optional set of modes. Nothing is queued per consumer: every stored
+reading goes through the live log (live_buffer.py), each waiting connection
+is woken when the log moves and reads what is newer than its cursor from
+the log, or from the database when the log does not reach back that far.
+"""
+
+import json
+import time
+
+import eventlet
+from eventlet import patcher
+from eventlet.event import Event
+from eventlet.green import socket as green_socket
+from eventlet.patcher import original
+
+from database import get_latest_reading_id, get_readings_since
+import live_buffer
+
+
+class ChangeSignal:
+    """Wakes the connections waiting for new readings.
+
+    Readings are logged on whichever thread stored them, a database pool
+    thread or the eventlet hub. Native waiters (request threads in the
+    asyncio serving mode) wait on a native condition. Green primitives
+    cannot be touched from other threads, so green waiters wait on a green
+    event that a dispatcher on the hub sets once a byte arrives on a socket
+    pair.
+    """
+
+    def __init__(self):
+        self.condition = original('threading').Condition()
+        self.version = 0
+        self.green_event = None
+        self.poked = False
+        self.sender = None
+
+    def notify(self, readings=None):
+        """Wake every waiter; safe to call from any thread."""
+        with self.condition:
+            self.version += 1
+            self.condition.notify_all()
+            poke = self.sender is not None and not self.poked
+            self.poked = self.poked or poke
+        if poke:
+            try:
+                self.sender.send(b'x')
+            except BlockingIOError:
+                pass
+
+    def wait(self, check, timeout):
+        """
+        Call check() until it returns something truthy or `timeout` expires.
+
+        Returns:
+            The last result of check()
+        """
+        deadline = time.monotonic() + timeout
+        green = patcher.is_monkey_patched('thread') and \
+            original('threading').current_thread() is original('threading').main_thread()
+        while True:
+            # Take the wakeup before checking, so a change in between is not missed
+            if green:
+                event = self.green_wakeup()
+            else:
+                with self.condition:
+                    seen = self.version
+            result = check()
+            remaining = deadline - time.monotonic()
+            if result or remaining <= 0:
+                return result
+            if green:
+                with eventlet.Timeout(remaining, False):
+                    event.wait()
+            else:
+                with self.condition:
+                    self.condition.wait_for(lambda: self.version != seen, remaining)
+
+    def green_wakeup(self):
+        """The green event set on the next change, starting the dispatcher on first use."""
+        if self.green_event is None:
+            sender, receiver = original('socket').socketpair()
+            sender.setblocking(False)
+            self.green_event = Event()
+            eventlet.spawn_n(self.dispatch, green_socket.socket(receiver))
+            with self.condition:
+                self.sender = sender
+        return self.green_event
+
+    def dispatch(self, receiver):
+        """Set the green event whenever a native thread pokes the socket pair."""
+        while True:
+            receiver.recv(4096)
+            with self.condition:
+                self.poked = False
+            event, self.green_event = self.green_event, Event()
+            event.send()
+
+
+signal = ChangeSignal()
+live_buffer.add_listener(signal.notify)
+
+
+def read_changes(after_id, mode_ids=None, limit=1000):
+    """
+    Get the readings stored after a reading id.
+
+    Returns:
+        List of (id, mode_id, timestamp, value) tuples in id order
+    """
+    readings = live_buffer.after(after_id, mode_ids, limit)
+    if readings is None:
+        readings = get_readings_since(after_id, mode_ids, limit)
+        # Readings past a write still in progress could be followed by lower ids
+        settled = live_buffer.settled()
+        if settled is not None:
+            readings = [reading for reading in readings if reading[0] <= settled]
+    return readings
+
+
+def wait_for_changes(after_id, mode_ids=None, limit=1000, timeout=25.0):
+    """
+    Wait until readings newer than a reading id are stored.
+
+    Idle connections sleep until the live log moves, so waiting costs no
+    queries and no periodic wakeups.
+
+    Args:
+        after_id: Cursor; only readings with a higher id are returned
+        mode_ids: Restrict to these modes (all modes when None)
+        limit: Maximum number of readings returned
+        timeout: Seconds to wait before returning an empty list
+
+    Returns:
+        List of (id, mode_id, timestamp, value) tuples in id order
+    """
+    return signal.wait(lambda: read_changes(after_id, mode_ids, limit), timeout)
+
+
+def start_position(after_id=None):
+    """Cursor to start from: the given reading id, or the newest stored reading."""
+    return get_latest_reading_id() if after_id is None else after_id
+
+
+def columns(readings):
+    """Lay (id, mode_id, timestamp, value) readings out as parallel arrays."""
+    return {
+        'ids': [reading[0] for reading in readings],
+        'mode_ids': [reading[1] for reading in readings],
+        'timestamps': [reading[2] for reading in readings],
+        'values': [reading[3] for reading in readings],
+        'count': len(readings)
+    }
+
+
+def stream_events(after_id, mode_ids=None, limit=1000, interval=0.25, keepalive=15.0):
+    """
+    Generate Server-Sent Events for the readings stored after a reading id.
+
+    Each 'readings' event carries a columnar batch and the id of its last
+    reading as the event id, so a reconnecting EventSource resumes through
+    the Last-Event-ID header. Readings arriving within `interval` of a
+    batch are sent together in the next one; a comment line is sent after
+    `keepalive` idle seconds so proxies keep the connection open.
+    """
+    yield 'retry: 2000\n\n'
+    while True:
+        readings = wait_for_changes(after_id, mode_ids, limit, timeout=keepalive)
+        if not readings:
+            yield ': keepalive\n\n'
+            continue
+        after_id = readings[-1][0]
+        yield (f'id: {after_id}\nevent: readings\n'
+               f'data: {json.dumps(columns(readings), separators=(",", ":"))}\n\n')
+        if len(readings) < limit:
+            time.sleep(interval)
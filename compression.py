@@ -0,0 +1,195 @@
+"""
+Ingest-time compression of slow-moving signals.
+
+Each mode can be configured to store only the readings needed to rebuild its
+signal within a tolerance:
+
+- deadband: a reading is stored when it moves more than `tolerance` away from
+  the last stored value. The reading before it is stored as well, so linear
+  interpolation between stored points follows the step.
+- swinging_door: swinging-door trending. A reading is held back while the
+  straight line from the last stored point (the pivot) to it passes within
+  `tolerance` of every reading since; when the "doors" close, the previously
+  held reading is stored and becomes the new pivot.
+
+Linear interpolation between stored points reconstructs the signal within
+`tolerance` for swinging_door and within twice that for deadband.
+
+With either method a reading is always stored once `max_interval` seconds
+have passed since the last stored one, which bounds how stale the stored
+series can get. Filters work on (epoch seconds, value) pairs and are kept in
+memory per mode; the configuration itself lives in the mode_compression
+table (see database.set_mode_compression).
+"""
+
+from eventlet.patcher import original
+
+METHODS = ('none', 'deadband', 'swinging_door')
+DEFAULT_MAX_INTERVAL = 60.0
+
+
+class DeadbandFilter:
+    """Stores a reading when it leaves the band around the last stored value."""
+
+    def __init__(self, tolerance, max_interval=DEFAULT_MAX_INTERVAL):
+        self.tolerance = tolerance
+        self.max_interval = max_interval
+        self.last = None
+        self.held = None
+
+    def offer(self, point):
+        """Offer an (epoch, value) point; return the points to store."""
+        if self.last is None:
+            self.last = point
+            return [point]
+
+        if (abs(point[1] - self.last[1]) <= self.tolerance
+                and point[0] - self.last[0] < self.max_interval):
+            self.held = point
+            return []
+
+        stored = [self.held, point] if self.held is not None else [point]
+        self.held = None
+        self.last = point
+        return stored
+
+
+class SwingingDoorFilter:
+    """Swinging-door trending compression."""
+
+    def __init__(self, tolerance, max_interval=DEFAULT_MAX_INTERVAL):
+        self.tolerance = tolerance
+        self.max_interval = max_interval
+        self.pivot = None
+        self.held = None
+        self.upper = float('-inf')
+        self.lower = float('inf')
+
+    def open_doors(self, pivot):
+        """Start a new segment at the given stored point."""
+        self.pivot = pivot
+        self.held = None
+        self.upper = float('-inf')
+        self.lower = float('inf')
+
+    def swing(self, point):
+        """Check a point against the doors, then narrow them to its band.
+
+        Returns True when the line from the pivot to the point stays within
+        the tolerance of every reading since the pivot.
+        """
+        elapsed = point[0] - self.pivot[0]
+        if elapsed <= 0:
+            return abs(point[1] - self.pivot[1]) <= self.tolerance
+        slope = (point[1] - self.pivot[1]) / elapsed
+        within = self.upper <= slope <= self.lower
+        self.upper = max(self.upper, (point[1] - self.pivot[1] - self.tolerance) / elapsed)
+        self.lower = min(self.lower, (point[1] - self.pivot[1] + self.tolerance) / elapsed)
+        return within
+
+    def offer(self, point):
+        """Offer an (epoch, value) point; return the points to store."""
+        if self.pivot is None:
+            self.open_doors(point)
+            return [point]
+
+        if point[0] - self.pivot[0] >= self.max_interval:
+            stored = [self.held, point] if self.held is not None else [point]
+            self.open_doors(point)
+            return stored
+
+        if self.swing(point):
+            self.held = point
+            return []
+
+        # Doors closed: the held point ends the segment and starts the next
+        held = self.held
+        if held is None:
+            self.open_doors(point)
+            return [point]
+        self.open_doors(held)
+        self.swing(point)
+        self.held = point
+        return [held]
+
+
+FILTERS = {
+    'deadband': DeadbandFilter,
+    'swinging_door': SwingingDoorFilter,
+}
+
+filters = {}
+settings = {}
+stats = {}
+# Taken on database worker threads and the hub alike, never across a yield
+lock = original('threading').Lock()
+
+
+def configure(mode_id, method, tolerance=0.0, max_interval=DEFAULT_MAX_INTERVAL):
+    """
+    Set the compression method of a mode, resetting its filter state.
+
+    Args:
+        mode_id: Mode ID
+        method: One of METHODS
+        tolerance: Allowed deviation in the mode's units
+        max_interval: Maximum seconds between stored readings
+    """
+    if method not in METHODS:
+        raise ValueError(f"method must be one of: {', '.join(METHODS)}")
+    if tolerance < 0:
+        raise ValueError("tolerance must be non-negative")
+    if max_interval <= 0:
+        raise ValueError("max_interval must be positive")
+
+    with lock:
+        if method == 'none':
+            filters.pop(mode_id, None)
+            settings.pop(mode_id, None)
+        else:
+            filters[mode_id] = FILTERS[method](tolerance, max_interval)
+            settings[mode_id] = {
+                'method': method,
+                'tolerance': tolerance,
+                'max_interval': max_interval
+            }
+        stats[mode_id] = {'offered': 0, 'stored': 0}
+
+
+def is_compressed(mode_id):
+    """Return True when readings of the mode go through a filter."""
+    return mode_id in filters
+
+
+def offer(mode_id, point):
+    """
+    Run a point through the mode's filter.
+
+    Args:
+        mode_id: Mode ID
+        point: (epoch seconds, value) tuple
+
+    Returns:
+        List of points to store (the point itself for uncompressed modes)
+    """
+    with lock:
+        mode_filter = filters.get(mode_id)
+        if mode_filter is None:
+            return [point]
+        stored = mode_filter.offer(point)
+        counters = stats[mode_id]
+        counters['offered'] += 1
+        counters['stored'] += len(stored)
+        return stored
+
+
+def get_settings(mode_id):
+    """Return the compression settings and counters of a mode."""
+    with lock:
+        result = dict(settings.get(mode_id, {'method': 'none', 'tolerance': 0.0,
+                                             'max_interval': DEFAULT_MAX_INTERVAL}))
+        counters = stats.get(mode_id, {'offered': 0, 'stored': 0})
+    result['offered'] = counters['offered']
+    result['stored'] = counters['stored']
+    result['ratio'] = round(counters['offered'] / counters['stored'], 2) if counters['stored'] else None
+    return result
@@ -0,0 +1,105 @@
+"""
+Coalescing of control-plane writes.
+
+Every open dashboard sends its voltage slider position to
+POST /api/voltage/set. Instead of one transaction and one voltage_changed
+broadcast per call, VoltageCoalescer keeps the latest voltage requested for
+each mode; the server takes them once per window (take()), stores them in
+one transaction and broadcasts each changed mode once.
+
+A requested voltage is in effect immediately: get() answers with it before
+it is stored, which is where the simulator reads voltages from. Voltage
+changes should therefore go through set(), or be reported with stored()
+when written to mode_status directly.
+"""
+
+import time
+
+from eventlet.patcher import original
+
+MIN_VOLTAGE = 0.0
+MAX_VOLTAGE = 10.0
+
+
+class VoltageCoalescer:
+    """Latest requested voltage per mode, stored and broadcast once per window."""
+
+    def __init__(self):
+        # Set from request handlers (worker threads in asyncio mode), taken on the hub
+        self.lock = original('threading').Lock()
+        self.voltages = {}
+        self.pending = {}
+        self.requests = 0
+        self.flushes = 0
+        self.written = 0
+        self.failed = 0
+        self.last_flush = None
+
+    def set(self, mode_id, voltage):
+        """
+        Request a voltage for a mode; it replaces any not yet stored request.
+
+        Returns:
+            The voltage as a float
+
+        Raises:
+            ValueError: For a voltage that is not a number between 0 and 10
+        """
+        if isinstance(voltage, bool):
+            raise ValueError("Voltage must be a number between 0 and 10")
+        voltage = float(voltage)
+        if not MIN_VOLTAGE <= voltage <= MAX_VOLTAGE:
+            raise ValueError("Voltage must be a number between 0 and 10")
+        with self.lock:
+            self.voltages[mode_id] = voltage
+            self.pending[mode_id] = voltage
+            self.requests += 1
+        return voltage
+
+    def stored(self, voltages):
+        """Note voltages stored directly (e.g. by a bulk change); they supersede pending requests."""
+        with self.lock:
+            for mode_id, voltage in voltages.items():
+                self.voltages[mode_id] = voltage
+                self.pending.pop(mode_id, None)
+
+    def get(self, mode_id, default=None):
+        """Voltage last requested for a mode in this process, else `default`."""
+        return self.voltages.get(mode_id, default)
+
+    def take(self):
+        """Take the voltages requested since the last call, as {mode_id: voltage}."""
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            if pending:
+                self.flushes += 1
+                self.written += len(pending)
+                self.last_flush = time.time()
+        return pending
+
+    def requeue(self, voltages):
+        """Put back voltages taken for a write that failed, unless a newer request replaced them."""
+        with self.lock:
+            for mode_id, voltage in voltages.items():
+                self.pending.setdefault(mode_id, voltage)
+            self.written -= len(voltages)
+            self.failed += 1
+
+    def clear(self):
+        """Forget requested voltages (e.g. after switching databases)."""
+        with self.lock:
+            self.voltages.clear()
+            self.pending.clear()
+
+    def get_stats(self):
+        """Request, flush, write and failure counters."""
+        with self.lock:
+            return {
+                'requests': self.requests,
+                'flushes': self.flushes,
+                'written': self.written,
+                'coalesced': self.requests - self.written - len(self.pending),
+                'pending': len(self.pending),
+                'failed': self.failed,
+                'last_flush': self.last_flush
+            }
@@ -1,16 +1,21 @@
+import asyncio
 import time
 import random
 import math
 from datetime import datetime
 import threading
 from database import add_reading, get_active_modes, get_mode_by_id
+import aio_database
+import live_buffer
 
 
 class DataSimulator:
     """Simulates sensor data for active modes with voltage-based variation."""
     
-    def __init__(self, socketio=None):
+    def __init__(self, socketio=None, voltages=None):
         self.socketio = socketio
+        # Source of just-requested voltages not yet stored (control.VoltageCoalescer)
+        self.voltages = voltages
         self.running = False
         self.simulation_interval = 2
         self.lock = threading.Lock()
@@ -66,42 +71,96 @@ class DataSimulator:
         
         return round(value, 2)
     
+    def current_voltage(self, mode):
+        """Voltage of a mode, preferring one requested since its row was read."""
+        voltage = mode.get('voltage', 5.0)
+        if self.voltages is not None:
+            voltage = self.voltages.get(mode['id'], voltage)
+        return voltage
+    
+    def build_reading_data(self, mode, reading_id, value, voltage):
+        """Build the payload broadcast for a stored reading."""
+        return {
+            'id': reading_id,
+            'seq': live_buffer.sequence(mode['id'], reading_id) if reading_id else None,
+            'mode_id': mode['id'],
+            'mode_name': mode['name'],
+            'icon': mode['icon'],
+            'value': value,
+            'voltage': voltage,
+            'timestamp': datetime.now().isoformat()
+        }
+    
+    def reading_events(self, reading_data):
+        """List the (event, data, room) emits announcing a new reading."""
+        room = f'mode_{reading_data["mode_id"]}'
+        return [
+            ('new_reading', reading_data, None),
+            ('data_update', reading_data, None),
+            ('data_update', reading_data, room),
+        ]
+    
+    def error_events(self, mode, error):
+        """List the (event, data, room) emits reporting a simulation error."""
+        error_data = {
+            'error': str(error),
+            'mode_id': mode['id'],
+            'mode_name': mode['name']
+        }
+        return [
+            ('error', error_data, None),
+            ('error', error_data, f'mode_{mode["id"]}'),
+        ]
+    
     def simulate_reading(self, mode):
         """Simulate a single reading for a mode with voltage consideration."""
         if mode.get('is_active'):
-            voltage = mode.get('voltage', 5.0)
+            voltage = self.current_voltage(mode)
             
             with self.lock:
                 value = self.generate_value(mode['name'], voltage)
             
             try:
                 reading_id = add_reading(mode['id'], value)
+                reading_data = self.build_reading_data(mode, reading_id, value, voltage)
+                
+                if self.socketio:
+                    for event, data, room in self.reading_events(reading_data):
+                        self.socketio.emit(event, data, room=room)
                 
-                reading_data = {
-                    'id': reading_id,
-                    'mode_id': mode['id'],
-                    'mode_name': mode['name'],
-                    'icon': mode['icon'],
-                    'value': value,
-                    'voltage': voltage,
-                    'timestamp': datetime.now().isoformat()
-                }
+                return reading_data
+            except Exception as e:
+                if self.socketio:
+                    for event, data, room in self.error_events(mode, e):
+                        self.socketio.emit(event, data, room=room)
+                print(f"Error simulating reading for {mode['name']}: {e}")
+                return None
+        return None
+    
+    async def simulate_reading_async(self, mode):
+        """Async counterpart of simulate_reading for the asyncio serving mode.
+        
+        Expects self.socketio to be a python-socketio AsyncServer.
+        """
+        if mode.get('is_active'):
+            voltage = self.current_voltage(mode)
+            
+            with self.lock:
+                value = self.generate_value(mode['name'], voltage)
+            
+            try:
+                reading_id = await aio_database.add_reading(mode['id'], value)
+                reading_data = self.build_reading_data(mode, reading_id, value, voltage)
                 
                 if self.socketio:
-                    self.socketio.emit('new_reading', reading_data)
-                    self.socketio.emit('data_update', reading_data)
-                    self.socketio.emit('data_update', reading_data, room=f'mode_{mode["id"]}')
+                    for event, data, room in self.reading_events(reading_data):
+                        await self.socketio.emit(event, data, room=room)
                 
                 return reading_data
             except Exception as e:
-                error_data = {
-                    'error': str(e),
-                    'mode_id': mode['id'],
-                    'mode_name': mode['name']
-                }
                 if self.socketio:
-                    self.socketio.emit('error', error_data)
-                    self.socketio.emit('error', error_data, room=f'mode_{mode["id"]}')
+                    for event, data, room in self.error_events(mode, e):
+                        await self.socketio.emit(event, data, room=room)
                 print(f"Error simulating reading for {mode['name']}: {e}")
                 return None
         return None
@@ -136,6 +195,36 @@ class DataSimulator:
                 self.running = False
             print("Data simulator stopped")
     
+    async def run_async(self):
+        """Run the data simulator as an asyncio task (asyncio serving mode)."""
+        with self.lock:
+            if self.running:
+                print("Data simulator already running")
+                return
+            self.running = True
+        
+        print("Data simulator started")
+        
+        try:
+            while self.running:
+                try:
+                    modes = await aio_database.get_active_modes()
+                    for mode in modes:
+                        if not self.running:
+                            break
+                        await self.simulate_reading_async(mode)
+                    
+                    await asyncio.sleep(self.simulation_interval)
+                except Exception as e:
+                    print(f"Error in simulator loop: {e}")
+                    if self.socketio:
+                        await self.socketio.emit('error', {'error': str(e), 'source': 'simulator'})
+                    await asyncio.sleep(self.simulation_interval)
+        finally:
+            with self.lock:
+                self.running = False
+            print("Data simulator stopped")
+    
     def stop(self):
         """Stop the data simulator."""
         with self.lock:
@@ -1,22 +1,203 @@
 import sqlite3
 import os
+import json
+import heapq
+import bisect
+import time
+import calendar
 from datetime import datetime
-from contextlib import contextmanager
+from contextlib import contextmanager, nullcontext
+from functools import wraps
+from collections import OrderedDict
+from operator import itemgetter
 import threading
+import atexit
+from eventlet.patcher import original
+from downsample import largest_triangle_three_buckets
+import compression
+import rules
+import archive
+import storage
+import live_buffer
 
 DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'app.db')
 db_lock = threading.RLock()
 
+# Query time budget for the current thread (seconds), set via query_budget().
+query_context = threading.local()
+PROGRESS_HANDLER_INTERVAL = 10000
+
+
+class QueryTimeoutError(Exception):
+    """Raised when a query runs longer than its time budget."""
+
+    def __init__(self, budget):
+        super().__init__(f"Query exceeded its time budget of {budget:g}s")
+        self.budget = budget
+
 
 @contextmanager
-def get_db_connection():
-    """Context manager for database connections with thread safety."""
-    with db_lock:
-        conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+def query_budget(seconds):
+    """Limit how long queries issued in this block may hold the database."""
+    previous = getattr(query_context, 'budget', None)
+    query_context.budget = seconds
+    try:
+        yield
+    finally:
+        query_context.budget = previous
+
+
+class SingleFlight:
+    """Coalesce concurrent identical calls onto a single in-flight execution.
+
+    The first caller for a key runs the function; callers arriving while it is
+    still running wait for it and receive the same result (or exception).
+    Results are shared, so callers must treat them as read-only.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run fn for key, or wait for the in-flight call with the same key."""
+        with self.lock:
+            call = self.calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'done': threading.Event(), 'result': None, 'error': None}
+                self.calls[key] = call
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['result']
+
+        try:
+            call['result'] = fn(*args, **kwargs)
+            return call['result']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self.lock:
+                del self.calls[key]
+            call['done'].set()
+
+
+query_flight = SingleFlight()
+
+# Optional callable used to run blocking database work elsewhere, e.g. on a
+# native thread pool (see db_pool.enable). Called as executor(fn, *args, **kwargs).
+executor = None
+
+
+def blocking(fn):
+    """Decorator routing a blocking database call through the executor."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        if executor is None:
+            return fn(*args, **kwargs)
+        return executor(fn, *args, **kwargs)
+    return wrapper
+
+# In-memory data versions used to answer conditional GETs without a query.
+# 'readings' maps mode_id to its highest reading id (loaded lazily from the
+# database); 'status' is bumped on every mode/mode_status change and is
+# prefixed with a per-process epoch so restarts never reuse an old version.
+version_lock = threading.Lock()
+data_versions = {
+    'epoch': format(int(time.time() * 1000), 'x'),
+    'readings': None,
+    'status': 0,
+}
+
+# Alternative readings storage engine (see storage.py); None = readings table
+readings_backend = None
+
+# Modes keyed by id as of status version 'version' (see get_mode_registry)
+mode_registry = {'version': None, 'modes': {}}
+
+# Connection keeping the shared in-memory database alive (see use_memory_database)
+memory_anchor = None
+
+# Read-only copy of the database that analytics queries can be routed to
+# (see refresh_snapshot); 'versions' are the reading versions it contains.
+snapshot_state = {
+    'enabled': False,
+    'created': None,
+    'versions': None,
+    'refreshes': 0,
+    'last_duration': None,
+}
+
+# Pages copied per step of a snapshot refresh; db_lock is released between
+# steps. A write in between makes SQLite restart the copy, so after
+# SNAPSHOT_MAX_RESTARTS restarts the rest is copied without releasing it.
+SNAPSHOT_STEP_PAGES = 1024
+SNAPSHOT_MAX_RESTARTS = 2
+
+# Decoded archive chunks keyed by file path, least recently used first (see
+# decoded_chunk), and the readings they hold in total
+ARCHIVE_CACHE_READINGS = 500000
+archive_cache = OrderedDict()
+archive_cache_state = {'readings': 0}
+# Taken on database worker threads and the hub alike, never across a yield
+archive_cache_lock = original('threading').Lock()
+
+
+def coalesce(fn):
+    """
+    Decorator sharing one execution among concurrent identical calls.
+    
+    Only callers with the same query budget share a call, so e.g. an export
+    never inherits the shorter deadline of an interactive request.
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        budget = getattr(query_context, 'budget', None)
+        key = (fn.__name__, budget, args, tuple(sorted(kwargs.items())))
+        return query_flight.do(key, fn, *args, **kwargs)
+    return wrapper
+
+
+@contextmanager
+def get_db_connection(snapshot=False):
+    """Context manager for database connections with thread safety.
+    
+    When a query budget is active for the current thread, SQLite's progress
+    handler aborts any statement still running once the budget has elapsed
+    since the lock was acquired, and QueryTimeoutError is raised instead.
+    
+    Args:
+        snapshot: Open the read-only analytics snapshot instead of the live
+                  database; it is never written in place, so no lock is taken
+    """
+    with nullcontext() if snapshot else db_lock:
+        if snapshot:
+            conn = sqlite3.connect(f'file:{snapshot_path()}?immutable=1', uri=True,
+                                   check_same_thread=False)
+        else:
+            conn = sqlite3.connect(DATABASE_PATH, uri=DATABASE_PATH.startswith('file:'),
+                                   check_same_thread=False)
         conn.row_factory = sqlite3.Row
+        budget = getattr(query_context, 'budget', None)
+        deadline = None
+        if budget is not None:
+            deadline = time.monotonic() + budget
+            conn.set_progress_handler(
+                lambda: time.monotonic() > deadline,
+                PROGRESS_HANDLER_INTERVAL
+            )
         try:
             yield conn
             conn.commit()
+        except sqlite3.OperationalError as e:
+            conn.rollback()
+            if deadline is not None and time.monotonic() > deadline and 'interrupted' in str(e):
+                raise QueryTimeoutError(budget) from e
+            raise
         except Exception as e:
             conn.rollback()
             raise
@@ -24,8 +205,10 @@ def get_db_connection():
             conn.close()
 
 
+@blocking
 def init_db():
     """Initialize database with schema and seed data."""
+    mode_registry['version'] = None
     with get_db_connection() as conn:
         cursor = conn.cursor()
         
@@ -64,6 +247,84 @@ def init_db():
             )
         ''')
         
+        # Index the (few) active modes so finding them does not scan every mode
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_mode_status_active
+            ON mode_status(mode_id) WHERE is_active = 1
+        ''')
+
+        # Index mode names case-insensitively for name prefix filters
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_modes_name_nocase
+            ON modes(name COLLATE NOCASE)
+        ''')
+
+        # Create mode_compression table (modes without a row are stored raw)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS mode_compression (
+                mode_id INTEGER PRIMARY KEY,
+                method TEXT NOT NULL,
+                tolerance REAL NOT NULL DEFAULT 0,
+                max_interval REAL NOT NULL DEFAULT 60,
+                FOREIGN KEY (mode_id) REFERENCES modes (id)
+            )
+        ''')
+        
+        # Create alert_rules table (rule parameters as JSON, see rules.py)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alert_rules (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mode_id INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                params TEXT NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                FOREIGN KEY (mode_id) REFERENCES modes (id)
+            )
+        ''')
+        
+        # Create alerts table (alerts are kept when their rule is deleted)
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS alerts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                rule_id INTEGER NOT NULL,
+                mode_id INTEGER NOT NULL,
+                reading_id INTEGER,
+                kind TEXT NOT NULL,
+                value REAL NOT NULL,
+                message TEXT NOT NULL,
+                timestamp TIMESTAMP NOT NULL
+            )
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_alerts_mode_id
+            ON alerts(mode_id)
+        ''')
+        
+        # Create archive_chunks table indexing the compressed archive tier
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS archive_chunks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                mode_id INTEGER NOT NULL,
+                start_time TIMESTAMP NOT NULL,
+                end_time TIMESTAMP NOT NULL,
+                count INTEGER NOT NULL,
+                min_value REAL,
+                max_value REAL,
+                path TEXT NOT NULL,
+                size INTEGER,
+                sum_value REAL,
+                FOREIGN KEY (mode_id) REFERENCES modes (id)
+            )
+        ''')
+        # Chunks compacted before sums were indexed keep NULL and are decoded
+        cursor.execute('PRAGMA table_info(archive_chunks)')
+        if 'sum_value' not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute('ALTER TABLE archive_chunks ADD COLUMN sum_value REAL')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_archive_chunks_mode_time
+            ON archive_chunks(mode_id, start_time, end_time)
+        ''')
+        
         # Create index on readings timestamp for faster queries
         cursor.execute('''
             CREATE INDEX IF NOT EXISTS idx_readings_timestamp 
@@ -84,10 +345,117 @@ def init_db():
         
         # Seed initial mode metadata
         seed_modes(cursor)
+        load_data_versions(cursor)
+        load_compression_settings(cursor)
+        load_alert_rules(cursor)
         
         conn.commit()
 
 
+def load_data_versions(cursor):
+    """Load the per-mode highest reading ids into the in-memory versions."""
+    if readings_backend is not None:
+        readings = readings_backend.max_ids()
+    else:
+        cursor.execute('SELECT mode_id, MAX(id) AS max_id FROM readings GROUP BY mode_id')
+        readings = {row['mode_id']: row['max_id'] for row in cursor.fetchall()}
+    with version_lock:
+        data_versions['readings'] = readings
+
+
+def load_compression_settings(cursor):
+    """Configure the in-memory compression filters from mode_compression."""
+    cursor.execute('SELECT mode_id, method, tolerance, max_interval FROM mode_compression')
+    for row in cursor.fetchall():
+        compression.configure(row['mode_id'], row['method'], row['tolerance'], row['max_interval'])
+
+
+def load_alert_rules(cursor):
+    """Register the rules of alert_rules with the in-memory rule engine."""
+    rules.clear()
+    cursor.execute('SELECT id, mode_id, kind, params FROM alert_rules ORDER BY id')
+    for row in cursor.fetchall():
+        try:
+            rule = rules.create_rule(row['kind'], json.loads(row['params']))
+        except ValueError as e:
+            print(f"Skipping alert rule {row['id']}: {e}")
+            continue
+        rules.register(row['id'], row['mode_id'], rule)
+
+
+@blocking
+def refresh_data_versions():
+    """Reload the in-memory reading versions from the database."""
+    with get_db_connection() as conn:
+        load_data_versions(conn.cursor())
+
+
+def bump_status_version(cursor=None, mode_ids=None):
+    """
+    Record that mode metadata or mode status has changed.
+    
+    Given the cursor making the change and the ids of the modes it touched,
+    a mode registry that was current is patched with just those modes
+    instead of being reloaded in full on next use.
+    """
+    with version_lock:
+        current = mode_registry['version'] == (data_versions['epoch'], data_versions['status'])
+        data_versions['status'] += 1
+        version = (data_versions['epoch'], data_versions['status'])
+    
+    if current and cursor is not None and mode_ids is not None:
+        # Copied so callers holding the previous modes keep a consistent view
+        modes = dict(mode_registry['modes'])
+        modes.update(load_modes(cursor, mode_ids))
+        mode_registry.update(version=version, modes=modes)
+
+
+def load_modes(cursor, mode_ids, chunk_size=500):
+    """Load modes with their status, keyed by id."""
+    mode_ids = list(mode_ids)
+    modes = {}
+    for start in range(0, len(mode_ids), chunk_size):
+        chunk = mode_ids[start:start + chunk_size]
+        cursor.execute(f'''
+            SELECT m.*, ms.is_active, ms.voltage, ms.last_activated, ms.last_deactivated
+            FROM modes m
+            LEFT JOIN mode_status ms ON m.id = ms.mode_id
+            WHERE m.id IN ({','.join('?' * len(chunk))})
+        ''', chunk)
+        modes.update((row['id'], dict(row)) for row in cursor.fetchall())
+    return modes
+
+
+def get_data_version(mode_id=None, include_readings=True, include_status=False,
+                     snapshot=False):
+    """
+    Get a version string describing the current state of the data.
+    
+    Args:
+        mode_id: Restrict the readings version to a single mode
+        include_readings: Include the highest reading id
+        include_status: Include the mode/mode_status version
+        snapshot: Describe the analytics snapshot instead of the live data
+    
+    Returns:
+        String that changes whenever the selected data changes
+    """
+    if include_readings and data_versions['readings'] is None:
+        refresh_data_versions()
+    
+    with version_lock:
+        parts = []
+        if include_readings:
+            readings = snapshot_state['versions'] if snapshot else data_versions['readings']
+            if mode_id is not None:
+                parts.append(f"r{mode_id}:{readings.get(mode_id, 0)}")
+            else:
+                parts.append(f"r:{max(readings.values(), default=0)}")
+        if include_status:
+            parts.append(f"s:{data_versions['epoch']}.{data_versions['status']}")
+        return '-'.join(parts)
+
+
 def seed_modes(cursor):
     """Seed initial mode metadata."""
     modes = [
@@ -96,24 +464,54 @@ def seed_modes(cursor):
         ('Pressure', 'Monitor atmospheric pressure', '🔽'),
         ('Light', 'Monitor light intensity', '💡'),
     ]
+    if insert_modes(cursor, modes):
+        bump_status_version()
+
+
+def insert_modes(cursor, modes):
+    """
+    Insert (name, description, icon) modes whose names are not taken yet,
+    each with an inactive mode_status row, in a few statements.
     
-    for name, description, icon in modes:
-        cursor.execute(
-            'SELECT id FROM modes WHERE name = ?',
-            (name,)
-        )
-        if not cursor.fetchone():
-            cursor.execute(
-                'INSERT INTO modes (name, description, icon) VALUES (?, ?, ?)',
-                (name, description, icon)
-            )
-            mode_id = cursor.lastrowid
-            cursor.execute(
-                'INSERT INTO mode_status (mode_id, is_active) VALUES (?, ?)',
-                (mode_id, 0)
-            )
+    Returns:
+        List of the new mode IDs
+    """
+    cursor.execute('SELECT COALESCE(MAX(id), 0) FROM modes')
+    last_id = cursor.fetchone()[0]
+    cursor.executemany(
+        'INSERT OR IGNORE INTO modes (name, description, icon) VALUES (?, ?, ?)',
+        modes
+    )
+    cursor.execute('SELECT id FROM modes WHERE id > ? ORDER BY id', (last_id,))
+    mode_ids = [row['id'] for row in cursor.fetchall()]
+    cursor.executemany(
+        'INSERT OR IGNORE INTO mode_status (mode_id, is_active) VALUES (?, 0)',
+        [(mode_id,) for mode_id in mode_ids]
+    )
+    return mode_ids
 
 
+@blocking
+def register_modes(modes):
+    """
+    Register many modes in one transaction.
+    
+    Args:
+        modes: List of (name, description, icon) tuples; names already
+               registered are skipped
+    
+    Returns:
+        List of the new mode IDs
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        mode_ids = insert_modes(cursor, modes)
+        if mode_ids:
+            bump_status_version(cursor, mode_ids)
+        return mode_ids
+
+
+@blocking
 def get_all_modes():
     """Get all modes with their status."""
     with get_db_connection() as conn:
@@ -127,6 +525,82 @@ def get_all_modes():
         return [dict(row) for row in cursor.fetchall()]
 
 
+@blocking
+def get_modes_page(after_id=0, limit=100, active=None, prefix=None):
+    """
+    Get one page of modes with their status, in id order.
+    
+    Pages are read by id (keyset pagination), so a page costs the same
+    however deep into the listing it is.
+    
+    Args:
+        after_id: Return modes with a higher id (0 for the first page)
+        limit: Maximum number of modes
+        active: Only active (True) or inactive (False) modes
+        prefix: Only modes whose name starts with this (case-insensitive)
+    
+    Returns:
+        Dictionary with 'modes', 'next_after' (the after_id of the next
+        page, or None on the last page), 'total' (modes matching the
+        filters) and 'active_total' (active modes overall)
+    """
+    conditions = []
+    params = []
+    if active is not None:
+        conditions.append('ms.is_active = ?')
+        params.append(1 if active else 0)
+    if prefix:
+        escaped = prefix.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        conditions.append("m.name LIKE ? ESCAPE '\\'")
+        params.append(escaped + '%')
+    where = ' AND '.join(conditions) or '1'
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT m.*, ms.is_active, ms.voltage, ms.last_activated, ms.last_deactivated
+            FROM modes m
+            LEFT JOIN mode_status ms ON m.id = ms.mode_id
+            WHERE m.id > ? AND {where}
+            ORDER BY m.id
+            LIMIT ?
+        ''', [after_id] + params + [limit + 1])
+        modes = [dict(row) for row in cursor.fetchall()]
+    
+        cursor.execute(f'''
+            SELECT COUNT(*) FROM modes m
+            LEFT JOIN mode_status ms ON m.id = ms.mode_id
+            WHERE {where}
+        ''', params)
+        total = cursor.fetchone()[0]
+        cursor.execute('SELECT COUNT(*) FROM mode_status WHERE is_active = 1')
+        active_total = cursor.fetchone()[0]
+    
+    next_after = modes[limit - 1]['id'] if len(modes) > limit else None
+    return {
+        'modes': modes[:limit],
+        'next_after': next_after,
+        'total': total,
+        'active_total': active_total
+    }
+
+
+def get_mode_registry():
+    """
+    Get all modes with their status, keyed by mode id.
+    
+    Served from memory and reloaded only after a mode or mode status change,
+    so callers resolving many mode ids need no query per mode. Treat the
+    returned modes as read-only.
+    """
+    version = (data_versions['epoch'], data_versions['status'])
+    if mode_registry['version'] != version:
+        modes = {mode['id']: mode for mode in get_all_modes()}
+        mode_registry.update(version=version, modes=modes)
+    return mode_registry['modes']
+
+
+@blocking
 def get_mode_by_id(mode_id):
     """Get a specific mode by ID."""
     with get_db_connection() as conn:
@@ -141,59 +615,584 @@ def get_mode_by_id(mode_id):
         return dict(row) if row else None
 
 
+@blocking
 def update_mode_status(mode_id, is_active, enforce_single_active=False):
-    """Update the status of a mode."""
+    """
+    Update the status of a mode.
+    
+    With enforce_single_active, activating a mode deactivates the modes
+    that were active (found through the active-modes index, so this does
+    not touch every mode).
+    
+    Returns:
+        List of {'mode_id', 'is_active', 'voltage'} dicts for the modes
+        whose status was written, in mode id order
+    """
     with get_db_connection() as conn:
         cursor = conn.cursor()
         timestamp = datetime.now().isoformat()
-        
+        changed = [mode_id]
+    
         if is_active:
             if enforce_single_active:
-                cursor.execute('''
-                    UPDATE mode_status 
+                cursor.execute(
+                    'SELECT mode_id FROM mode_status WHERE is_active = 1 AND mode_id != ?',
+                    (mode_id,)
+                )
+                others = [row['mode_id'] for row in cursor.fetchall()]
+                cursor.executemany('''
+                    UPDATE mode_status
                     SET is_active = 0, last_deactivated = ?
-                    WHERE mode_id != ?
-                ''', (timestamp, mode_id))
-            
+                    WHERE mode_id = ?
+                ''', [(timestamp, other) for other in others])
+                changed.extend(others)
+    
             cursor.execute('''
-                UPDATE mode_status 
+                UPDATE mode_status
                 SET is_active = 1, last_activated = ?
                 WHERE mode_id = ?
             ''', (timestamp, mode_id))
         else:
             cursor.execute('''
-                UPDATE mode_status 
+                UPDATE mode_status
                 SET is_active = 0, last_deactivated = ?
                 WHERE mode_id = ?
             ''', (timestamp, mode_id))
+    
+        bump_status_version(cursor, changed)
+        return mode_states(cursor, changed)
 
 
+def mode_states(cursor, mode_ids):
+    """Active state and voltage of modes, as change event entries in mode id order."""
+    modes = load_modes(cursor, mode_ids)
+    return [{'mode_id': mode_id, 'is_active': bool(modes[mode_id]['is_active']),
+             'voltage': modes[mode_id]['voltage']}
+            for mode_id in sorted(modes)]
+
+
+@blocking
+def apply_mode_changes(changes):
+    """
+    Set the active state and/or voltage of many modes in one transaction.
+    
+    Args:
+        changes: List of {'mode_id', 'is_active', 'voltage'} dicts; a change
+                 without 'is_active' or 'voltage' leaves that setting alone
+    
+    Returns:
+        List of {'mode_id', 'is_active', 'voltage'} dicts with the resulting
+        state of each changed mode, in mode id order
+    
+    Raises:
+        ValueError: For unknown modes or an invalid voltage (nothing is changed)
+    """
+    for change in changes:
+        voltage = change.get('voltage')
+        if voltage is not None and (not isinstance(voltage, (int, float)) or voltage < 0 or voltage > 10):
+            raise ValueError("Voltage must be a number between 0 and 10")
+    
+    mode_ids = sorted({change['mode_id'] for change in changes})
+    if not mode_ids:
+        return []
+    placeholders = ','.join('?' * len(mode_ids))
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(f'SELECT mode_id FROM mode_status WHERE mode_id IN ({placeholders})', mode_ids)
+        unknown = set(mode_ids) - {row['mode_id'] for row in cursor.fetchall()}
+        if unknown:
+            raise ValueError(f"Unknown modes: {', '.join(map(str, sorted(unknown)))}")
+        
+        timestamp = datetime.now().isoformat()
+        cursor.executemany('''
+            UPDATE mode_status 
+            SET is_active = 1, last_activated = ?
+            WHERE mode_id = ?
+        ''', [(timestamp, change['mode_id']) for change in changes if change.get('is_active') is True])
+        cursor.executemany('''
+            UPDATE mode_status 
+            SET is_active = 0, last_deactivated = ?
+            WHERE mode_id = ?
+        ''', [(timestamp, change['mode_id']) for change in changes if change.get('is_active') is False])
+        cursor.executemany('''
+            UPDATE mode_status 
+            SET voltage = ?
+            WHERE mode_id = ?
+        ''', [(change['voltage'], change['mode_id']) for change in changes
+              if change.get('voltage') is not None])
+        
+        bump_status_version(cursor, mode_ids)
+        return mode_states(cursor, mode_ids)
+
+
+def format_timestamp(epoch_seconds):
+    """Format a unix timestamp the way the readings table stores timestamps."""
+    whole = int(epoch_seconds)
+    text = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(whole))
+    millis = int(round((epoch_seconds - whole) * 1000))
+    if millis:
+        text += f'.{min(millis, 999):03d}'
+    return text
+
+
+def parse_stored_timestamp(text):
+    """Convert a readings table timestamp back to unix seconds."""
+    epoch = calendar.timegm(time.strptime(text[:19], '%Y-%m-%d %H:%M:%S'))
+    if len(text) > 19:
+        epoch += float('0' + text[19:])
+    return epoch
+
+
+def parse_time_arg(text):
+    """Convert an ISO datetime query argument (UTC) to unix seconds."""
+    try:
+        return parse_stored_timestamp(datetime.fromisoformat(text).strftime('%Y-%m-%d %H:%M:%S.%f'))
+    except ValueError:
+        raise ValueError(f"Invalid datetime: {text}")
+
+
+def use_memory_database(name='sensor_monitor'):
+    """
+    Keep modes, status and the other tables in an in-memory SQLite database.
+    
+    Every connection of the process shares it through a shared-cache URI and
+    it lives until the process exits. Combine with the 'memory' readings
+    backend for a deployment that never touches the disk.
+    
+    Args:
+        name: Name of the in-memory database
+    """
+    global DATABASE_PATH, memory_anchor
+    DATABASE_PATH = f'file:{name}?mode=memory&cache=shared'
+    if memory_anchor is not None:
+        memory_anchor.close()
+    memory_anchor = sqlite3.connect(DATABASE_PATH, uri=True, check_same_thread=False)
+    data_versions['readings'] = None
+
+
+def use_readings_backend(name, shards=0):
+    """
+    Select the storage engine for readings.
+    
+    Args:
+        name: 'sqlite' for the readings table, or an engine known to
+              storage.create_backend (for example 'segment_log')
+        shards: Number of shard files for 'sharded_sqlite' (0 = one per mode)
+    """
+    global readings_backend
+    backend = storage.create_backend(name, DATABASE_PATH, shards=shards)
+    
+    with db_lock:
+        if readings_backend is not None:
+            readings_backend.close()
+        readings_backend = backend
+    
+    if backend is not None:
+        atexit.register(backend.close)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'readings'")
+            row = cursor.fetchone()
+            backend.reserve_ids(row[0] if row else 0)
+    
+    refresh_data_versions()
+
+
+def write_readings(rows):
+    """
+    Store (mode_id, timestamp, value) rows in the active readings store
+    and record them in the live buffer.
+    
+    Returns:
+        List of the stored readings as (id, mode_id, timestamp, value) tuples
+    """
+    if readings_backend is None:
+        with live_buffer.writing():
+            with get_db_connection() as conn:
+                stored = insert_readings(conn.cursor(), rows)
+            live_buffer.record(stored)
+        return stored
+    
+    with live_buffer.writing():
+        with backend_lock():
+            stored = readings_backend.append([
+                (mode_id, int(round(parse_stored_timestamp(timestamp) * 1000)), value)
+                for mode_id, timestamp, value in rows
+            ])
+        
+        with version_lock:
+            readings = data_versions['readings']
+            if readings is not None:
+                # Thread-safe engines write concurrently, so keep the highest id
+                for reading_id, mode_id, _, _ in stored:
+                    if reading_id > (readings.get(mode_id) or 0):
+                        readings[mode_id] = reading_id
+        
+        stored = [(reading_id, mode_id, timestamp, value)
+                  for (reading_id, mode_id, _, value), (_, timestamp, _) in zip(stored, rows)]
+        live_buffer.record(stored)
+    return stored
+
+
+def backend_lock():
+    """Lock serializing calls to readings engines that do no locking of their own."""
+    return nullcontext() if readings_backend.thread_safe else db_lock
+
+
+def backend_reading(record):
+    """Convert a backend (id, mode_id, epoch_ms, value) record to a reading dict."""
+    reading_id, mode_id, epoch_ms, value = record
+    return {
+        'id': reading_id,
+        'mode_id': mode_id,
+        'value': value,
+        'timestamp': format_timestamp(epoch_ms / 1000)
+    }
+
+
+def insert_readings(cursor, rows):
+    """
+    Insert (mode_id, timestamp, value) rows and update the data versions.
+    
+    Returns:
+        List of the stored readings as (id, mode_id, timestamp, value) tuples
+    """
+    if not rows:
+        return []
+    
+    cursor.executemany(
+        'INSERT INTO readings (mode_id, timestamp, value) VALUES (?, ?, ?)',
+        rows
+    )
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'readings'")
+    first_id = cursor.fetchone()[0] - len(rows) + 1
+    
+    with version_lock:
+        readings = data_versions['readings']
+        if readings is not None:
+            for offset, row in enumerate(rows):
+                readings[row[0]] = first_id + offset
+    
+    return [(first_id + offset, mode_id, timestamp, value)
+            for offset, (mode_id, timestamp, value) in enumerate(rows)]
+
+
+def compress_rows(rows):
+    """Run the rows of compressed modes through their filters."""
+    kept = []
+    for mode_id, timestamp, value in rows:
+        if not compression.is_compressed(mode_id):
+            kept.append((mode_id, timestamp, value))
+            continue
+        point = (parse_stored_timestamp(timestamp), value, timestamp)
+        for _, stored_value, stored_timestamp in compression.offer(mode_id, point):
+            kept.append((mode_id, stored_timestamp, stored_value))
+    return kept
+
+
+@blocking
 def add_reading(mode_id, value):
-    """Add a new reading for a mode."""
+    """
+    Add a new reading for a mode.
+    
+    Readings of modes with ingest compression go through the mode's filter
+    and may be held back, in which case None is returned.
+    """
+    if readings_backend is not None or compression.is_compressed(mode_id):
+        now = time.time()
+        point = (now, value, format_timestamp(now))
+        points = compression.offer(mode_id, point)
+        stored = write_readings([(mode_id, p[2], p[1]) for p in points])
+        if points and points[-1] is point:
+            return stored[-1][0]
+        return None
+    
+    with live_buffer.writing():
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                'INSERT INTO readings (mode_id, value) VALUES (?, ?)',
+                (mode_id, value)
+            )
+            reading_id = cursor.lastrowid
+            with version_lock:
+                if data_versions['readings'] is not None:
+                    data_versions['readings'][mode_id] = reading_id
+        
+        # The row took the CURRENT_TIMESTAMP default (whole UTC seconds)
+        live_buffer.record([(reading_id, mode_id, format_timestamp(int(time.time())), value)])
+    return reading_id
+
+
+@blocking
+def add_readings_bulk(rows):
+    """
+    Add many readings in a single transaction.
+    
+    Rows of modes with ingest compression go through the mode's filter
+    first, so fewer rows than given (plus rows held back by an earlier
+    call) may be stored.
+    
+    Args:
+        rows: List of (mode_id, timestamp, value) tuples; timestamps are
+              strings in the readings table format
+    
+    Returns:
+        List of the stored readings as (id, mode_id, timestamp, value) tuples
+    """
+    if compression.filters:
+        rows = compress_rows(rows)
+    if not rows:
+        return []
+    
+    return write_readings(rows)
+
+
+@blocking
+def set_mode_compression(mode_id, method, tolerance=0.0,
+                         max_interval=compression.DEFAULT_MAX_INTERVAL):
+    """
+    Configure ingest compression for a mode.
+    
+    Args:
+        mode_id: Mode ID
+        method: 'none', 'deadband' or 'swinging_door'
+        tolerance: Allowed deviation in the mode's units
+        max_interval: Maximum seconds between stored readings
+    
+    Returns:
+        The mode's compression settings and counters
+    """
+    compression.configure(mode_id, method, tolerance, max_interval)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if method == 'none':
+            cursor.execute('DELETE FROM mode_compression WHERE mode_id = ?', (mode_id,))
+        else:
+            cursor.execute('''
+                INSERT INTO mode_compression (mode_id, method, tolerance, max_interval)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(mode_id) DO UPDATE SET
+                    method = excluded.method,
+                    tolerance = excluded.tolerance,
+                    max_interval = excluded.max_interval
+            ''', (mode_id, method, tolerance, max_interval))
+    
+    return compression.get_settings(mode_id)
+
+
+@blocking
+def add_alert_rule(mode_id, kind, params):
+    """
+    Store an alert rule and start evaluating it on new readings of the mode.
+    
+    Args:
+        mode_id: Mode ID
+        kind: 'threshold', 'rate' or 'zscore'
+        params: The rule's parameters (see rules.py)
+    
+    Returns:
+        The rule's description
+    
+    Raises:
+        ValueError: For an unknown kind or invalid parameters
+    """
+    rule = rules.create_rule(kind, params)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(
+            'INSERT INTO alert_rules (mode_id, kind, params) VALUES (?, ?, ?)',
+            (mode_id, kind, json.dumps(rule.params()))
+        )
+        rule_id = cursor.lastrowid
+    
+    rules.register(rule_id, mode_id, rule)
+    return rules.describe(rule_id)
+
+
+@blocking
+def delete_alert_rule(rule_id):
+    """Delete an alert rule; returns whether it existed."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('DELETE FROM alert_rules WHERE id = ?', (rule_id,))
+        deleted = cursor.rowcount > 0
+    
+    rules.unregister(rule_id)
+    return deleted
+
+
+def get_alert_rules(mode_id=None):
+    """Describe the alert rules (of one mode), oldest first."""
+    return [rule for rule in map(rules.describe, sorted(rules.rules))
+            if rule is not None and (mode_id is None or rule['mode_id'] == mode_id)]
+
+
+@blocking
+def add_alerts(alerts):
+    """
+    Store fired alerts.
+    
+    Args:
+        alerts: (rule_id, mode_id, reading_id, kind, value, message, timestamp)
+                tuples, as taken from rules.take_alerts()
+    
+    Returns:
+        List of alert dictionaries with their ids
+    """
+    if not alerts:
+        return []
+    
+    keys = ('rule_id', 'mode_id', 'reading_id', 'kind', 'value', 'message', 'timestamp')
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.executemany('''
+            INSERT INTO alerts (rule_id, mode_id, reading_id, kind, value, message, timestamp)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', alerts)
+        cursor.execute("SELECT seq FROM sqlite_sequence WHERE name = 'alerts'")
+        first_id = cursor.fetchone()[0] - len(alerts) + 1
+    return [dict(zip(keys, alert), id=first_id + offset) for offset, alert in enumerate(alerts)]
+
+
+@blocking
+def get_alerts(mode_id=None, limit=100):
+    """
+    Get the most recent alerts, newest first.
+    
+    Args:
+        mode_id: Only alerts of this mode (all modes when None)
+        limit: Maximum number of alerts
+    
+    Returns:
+        List of alert dictionaries
+    """
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        if mode_id is None:
+            cursor.execute('SELECT * FROM alerts ORDER BY id DESC LIMIT ?', (limit,))
+        else:
+            cursor.execute('SELECT * FROM alerts WHERE mode_id = ? ORDER BY id DESC LIMIT ?',
+                           (mode_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@blocking
+def get_mode_ids():
+    """Get the set of all mode IDs."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT id FROM modes')
+        return {row[0] for row in cursor.fetchall()}
+
+
+@blocking
+def get_recent_readings(mode_id, limit=100):
+    """Get recent readings for a specific mode."""
+    if readings_backend is not None:
+        with backend_lock():
+            return [backend_reading(record) for record in readings_backend.recent(mode_id, limit)]
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT * FROM readings
+            WHERE mode_id = ?
+            ORDER BY timestamp DESC
+            LIMIT ?
+        ''', (mode_id, limit))
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@blocking
+def get_readings_after(mode_id, after_id, limit=5000):
+    """
+    Get the newest readings of a mode stored after a given reading id.
+    
+    Args:
+        mode_id: Mode ID
+        after_id: Only readings with a higher id are returned
+        limit: Maximum number of readings; the newest ones are kept
+    
+    Returns:
+        List of (id, timestamp, value) tuples in id order
+    """
+    if readings_backend is not None:
+        with backend_lock():
+            records = [record for record in readings_backend.scan(mode_id) if record[0] > after_id]
+        records.sort()
+        return [(reading_id, format_timestamp(epoch_ms / 1000), value)
+                for reading_id, _, epoch_ms, value in records[-limit:]]
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute('''
+            SELECT id, timestamp, value FROM readings
+            WHERE mode_id = ? AND id > ?
+            ORDER BY id DESC
+            LIMIT ?
+        ''', (mode_id, after_id, limit))
+        return cursor.fetchall()[::-1]
+
+
+@blocking
+def get_readings_since(after_id, mode_ids=None, limit=1000):
+    """
+    Get the oldest readings stored after a given reading id, across modes.
+    
+    Args:
+        after_id: Only readings with a higher id are returned
+        mode_ids: Restrict to these modes (all modes when None)
+        limit: Maximum number of readings
+    
+    Returns:
+        List of (id, mode_id, timestamp, value) tuples in id order
+    """
+    if readings_backend is not None:
+        with backend_lock():
+            records = [record for mode_id in (mode_ids or [None])
+                       for record in readings_backend.scan(mode_id) if record[0] > after_id]
+        return [(reading_id, mode_id, format_timestamp(epoch_ms / 1000), value)
+                for reading_id, mode_id, epoch_ms, value in heapq.nsmallest(limit, records)]
+    
+    query = 'SELECT id, mode_id, timestamp, value FROM readings WHERE id > ?'
+    params = [after_id]
+    if mode_ids:
+        query += f" AND mode_id IN ({', '.join('?' * len(mode_ids))})"
+        params.extend(mode_ids)
+    query += ' ORDER BY id LIMIT ?'
+    params.append(limit)
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
-        cursor.execute(
-            'INSERT INTO readings (mode_id, value) VALUES (?, ?)',
-            (mode_id, value)
-        )
-        return cursor.lastrowid
+        cursor.row_factory = None
+        cursor.execute(query, params)
+        return cursor.fetchall()
 
 
-def get_recent_readings(mode_id, limit=100):
-    """Get recent readings for a specific mode."""
-    with get_db_connection() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM readings
-            WHERE mode_id = ?
-            ORDER BY timestamp DESC
-            LIMIT ?
-        ''', (mode_id, limit))
-        return [dict(row) for row in cursor.fetchall()]
+def get_latest_reading_id():
+    """Return the highest stored reading id (0 when there are none)."""
+    if data_versions['readings'] is None:
+        refresh_data_versions()
+    with version_lock:
+        return max(data_versions['readings'].values(), default=0)
 
 
+@blocking
 def get_all_readings(limit=1000):
     """Get all readings across all modes."""
+    if readings_backend is not None:
+        modes = get_mode_registry()
+        with backend_lock():
+            records = readings_backend.latest(list(modes), limit)
+        return [dict(backend_reading(record),
+                     mode_name=modes[record[1]]['name'], icon=modes[record[1]]['icon'])
+                for record in records]
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
@@ -206,8 +1205,18 @@ def get_all_readings(limit=1000):
         return [dict(row) for row in cursor.fetchall()]
 
 
+@blocking
 def get_current_reading(mode_id):
     """Get the most recent reading for a specific mode."""
+    if readings_backend is not None:
+        mode = get_mode_by_id(mode_id)
+        with backend_lock():
+            records = readings_backend.recent(mode_id, 1)
+        if not mode or not records:
+            return None
+        return dict(backend_reading(records[0]), mode_name=mode['name'],
+                    icon=mode['icon'], description=mode['description'])
+    
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
@@ -222,6 +1231,7 @@ def get_current_reading(mode_id):
         return dict(row) if row else None
 
 
+@blocking
 def set_mode_voltage(mode_id, voltage):
     """Set the voltage for a specific mode."""
     if not isinstance(voltage, (int, float)) or voltage < 0 or voltage > 10:
@@ -238,9 +1248,39 @@ def set_mode_voltage(mode_id, voltage):
         if cursor.rowcount == 0:
             raise ValueError(f"Mode with ID {mode_id} not found")
         
+        bump_status_version(cursor, [mode_id])
         return True
 
 
+@blocking
+def set_mode_voltages(voltages):
+    """
+    Set the voltages of several modes in one transaction.
+    
+    Args:
+        voltages: Dictionary of mode_id -> voltage (0-10V)
+    
+    Returns:
+        List of the mode IDs that exist and were updated
+    """
+    for voltage in voltages.values():
+        if not isinstance(voltage, (int, float)) or voltage < 0 or voltage > 10:
+            raise ValueError("Voltage must be a number between 0 and 10")
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        updated = []
+        for mode_id, voltage in voltages.items():
+            cursor.execute('UPDATE mode_status SET voltage = ? WHERE mode_id = ?', (voltage, mode_id))
+            if cursor.rowcount:
+                updated.append(mode_id)
+    
+        if updated:
+            bump_status_version(cursor, updated)
+        return updated
+
+
+@blocking
 def get_mode_voltage(mode_id):
     """Get the voltage setting for a specific mode."""
     with get_db_connection() as conn:
@@ -252,23 +1292,468 @@ def get_mode_voltage(mode_id):
         return row['voltage'] if row else None
 
 
+@blocking
 def get_active_modes():
     """Get all currently active modes."""
     with get_db_connection() as conn:
         cursor = conn.cursor()
         cursor.execute('''
             SELECT m.*, ms.is_active, ms.voltage, ms.last_activated, ms.last_deactivated
-            FROM modes m
-            JOIN mode_status ms ON m.id = ms.mode_id
+            FROM mode_status ms
+            JOIN modes m ON m.id = ms.mode_id
             WHERE ms.is_active = 1
-            ORDER BY m.id
+            ORDER BY ms.mode_id
+        ''')
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@blocking
+def count_active_modes():
+    """Count the currently active modes."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('SELECT COUNT(*) FROM mode_status WHERE is_active = 1')
+        return cursor.fetchone()[0]
+
+
+def snapshot_path():
+    """Path of the read-only analytics snapshot of the current database."""
+    return DATABASE_PATH + '.snapshot'
+
+
+def snapshot_ready():
+    """Whether an analytics snapshot has been taken."""
+    return snapshot_state['created'] is not None
+
+
+@blocking
+def refresh_snapshot():
+    """
+    Copy the live database to the analytics snapshot.
+    
+    Uses SQLite's online backup API in steps of SNAPSHOT_STEP_PAGES pages,
+    taking db_lock for each step only, so ingest carries on during the copy.
+    Writes made between steps restart it, and the last step ends a copy that
+    no write interrupted, so the snapshot is a consistent point in time. It
+    is written to a temporary file and renamed over the previous snapshot;
+    queries still reading the old file finish against it undisturbed.
+    
+    Returns:
+        The snapshot status (see get_snapshot_status)
+    """
+    if DATABASE_PATH.startswith('file:'):
+        raise ValueError("The analytics snapshot needs an on-disk database")
+    if data_versions['readings'] is None:
+        refresh_data_versions()
+    
+    started = time.monotonic()
+    temp_path = snapshot_path() + '.tmp'
+    copy = {'remaining': None, 'restarts': 0, 'versions': None}
+    
+    def between_steps(status, remaining, total):
+        if remaining == 0:
+            # Still under db_lock, so the versions match the copied data
+            with version_lock:
+                copy['versions'] = dict(data_versions['readings'])
+            return
+        if copy['remaining'] is not None and remaining > copy['remaining']:
+            copy['restarts'] += 1
+        copy['remaining'] = remaining
+        if copy['restarts'] < SNAPSHOT_MAX_RESTARTS:
+            db_lock.release()
+            try:
+                time.sleep(0)
+            finally:
+                db_lock.acquire()
+    
+    source = sqlite3.connect(DATABASE_PATH, check_same_thread=False)
+    target = sqlite3.connect(temp_path, check_same_thread=False)
+    try:
+        with db_lock:
+            source.backup(target, pages=SNAPSHOT_STEP_PAGES, progress=between_steps)
+            created = time.time()
+    finally:
+        target.close()
+        source.close()
+    os.replace(temp_path, snapshot_path())
+    
+    snapshot_state.update(
+        created=created,
+        versions=copy['versions'],
+        refreshes=snapshot_state['refreshes'] + 1,
+        last_duration=time.monotonic() - started
+    )
+    return get_snapshot_status()
+
+
+def get_snapshot_status():
+    """
+    Describe the analytics snapshot.
+    
+    Returns:
+        Dictionary with the snapshot 'created' timestamp, its 'age_seconds'
+        (None before the first refresh), the number of 'refreshes' and the
+        'last_duration_ms' of the latest one
+    """
+    created = snapshot_state['created']
+    duration = snapshot_state['last_duration']
+    return {
+        'created': format_timestamp(created) if created is not None else None,
+        'age_seconds': round(time.time() - created, 3) if created is not None else None,
+        'refreshes': snapshot_state['refreshes'],
+        'last_duration_ms': round(duration * 1000, 3) if duration is not None else None
+    }
+
+
+def archive_directory():
+    """Directory holding the archive chunk files of the current database."""
+    return DATABASE_PATH + '.archive'
+
+
+@blocking
+def compact_readings(before):
+    """
+    Move readings older than a UTC day boundary into compressed archive chunks.
+    
+    Each (mode, day) range becomes one chunk file. Chunk files are fsynced
+    before their index rows are committed and the archived rows deleted in
+    the same transaction, so a crash leaves at worst an unreferenced file.
+    
+    Args:
+        before: Date string ('YYYY-MM-DD'); readings from earlier days are archived
+    
+    Returns:
+        Dictionary with the number of 'chunks' and 'readings' archived and
+        the archive 'bytes' written
+    """
+    if readings_backend is not None:
+        raise ValueError("Archive compaction requires the sqlite readings backend")
+    cutoff = datetime.strptime(before, '%Y-%m-%d').strftime('%Y-%m-%d')
+    summary = {'chunks': 0, 'readings': 0, 'bytes': 0}
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute('''
+            SELECT mode_id, substr(timestamp, 1, 10) AS day, id, timestamp, value
+            FROM readings
+            WHERE timestamp < ?
+            ORDER BY mode_id, day, timestamp, id
+        ''', (cutoff,))
+        
+        groups = {}
+        for mode_id, day, reading_id, timestamp, value in cursor.fetchall():
+            epoch_ms = int(round(parse_stored_timestamp(timestamp) * 1000))
+            groups.setdefault((mode_id, day), []).append((reading_id, epoch_ms, value))
+        
+        for (mode_id, day), rows in groups.items():
+            name = f'mode{mode_id}-{day}-{rows[0][0]}.chunk'
+            path, size = archive.write_chunk(archive_directory(), name, mode_id, rows)
+            values = [row[2] for row in rows]
+            cursor.execute('''
+                INSERT INTO archive_chunks
+                    (mode_id, start_time, end_time, count, min_value, max_value, sum_value, path, size)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (mode_id, format_timestamp(rows[0][1] / 1000), format_timestamp(rows[-1][1] / 1000),
+                  len(rows), min(values), max(values), sum(values), os.path.basename(path), size))
+            summary['chunks'] += 1
+            summary['readings'] += len(rows)
+            summary['bytes'] += size
+        
+        cursor.execute('DELETE FROM readings WHERE timestamp < ?', (cutoff,))
+    
+    return summary
+
+
+def archive_chunk_count():
+    """Return the number of archive chunks."""
+    with get_db_connection() as conn:
+        return conn.execute('SELECT COUNT(*) FROM archive_chunks').fetchone()[0]
+
+
+@blocking
+def get_archive_summary():
+    """Get per-mode counts and sizes of the archive tier."""
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT mode_id, COUNT(*) AS chunks, SUM(count) AS readings,
+                   SUM(size) AS bytes, MIN(start_time) AS first_reading,
+                   MAX(end_time) AS last_reading
+            FROM archive_chunks
+            GROUP BY mode_id
+            ORDER BY mode_id
         ''')
         return [dict(row) for row in cursor.fetchall()]
 
 
+def archive_chunks_in(cursor, mode_id=None, start_time=None, end_time=None):
+    """Index rows of the archive chunks overlapping a mode and time range."""
+    where_clauses = []
+    params = []
+    if mode_id is not None:
+        where_clauses.append('mode_id = ?')
+        params.append(mode_id)
+    if start_time:
+        where_clauses.append('end_time >= ?')
+        params.append(start_time)
+    if end_time:
+        where_clauses.append('start_time <= ?')
+        params.append(end_time)
+    where_sql = ' WHERE ' + ' AND '.join(where_clauses) if where_clauses else ''
+    
+    cursor.execute(f'''
+        SELECT mode_id, start_time, end_time, count, min_value, max_value, sum_value, path
+        FROM archive_chunks{where_sql}
+        ORDER BY mode_id, start_time
+    ''', params)
+    # Callers may have switched the cursor to plain tuples
+    names = [column[0] for column in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+def decoded_chunk(path):
+    """
+    Rows of an archive chunk as (id, mode_id, value, timestamp), in time order.
+    
+    Chunk files never change once written, so decoded chunks are kept in an
+    LRU cache of up to ARCHIVE_CACHE_READINGS readings.
+    """
+    path = os.path.join(archive_directory(), path)
+    with archive_cache_lock:
+        rows = archive_cache.get(path)
+        if rows is not None:
+            archive_cache.move_to_end(path)
+            return rows
+    
+    chunk_mode_id, ids, timestamps, values = archive.read_chunk(path)
+    rows = [(reading_id, chunk_mode_id, value, format_timestamp(epoch_ms / 1000))
+            for reading_id, epoch_ms, value in zip(ids, timestamps, values)]
+    with archive_cache_lock:
+        if path not in archive_cache:
+            archive_cache[path] = rows
+            archive_cache_state['readings'] += len(rows)
+        while archive_cache_state['readings'] > ARCHIVE_CACHE_READINGS and len(archive_cache) > 1:
+            _, evicted = archive_cache.popitem(last=False)
+            archive_cache_state['readings'] -= len(evicted)
+    return rows
+
+
+def readings_source(cursor, mode_id=None, start_time=None, end_time=None, chunks=None,
+                    min_value=None, max_value=None, newest=None):
+    """
+    Return the FROM source for a readings query, including archived chunks.
+    
+    When archive chunks overlap the requested mode and time range, their
+    readings within the range are loaded into a temporary table and combined
+    with the hot readings table; otherwise the readings table is used
+    directly.
+    
+    Args:
+        chunks: The archive chunks to include (see archive_chunks_in); all
+                overlapping ones when None
+        min_value: Minimum value the query filters on
+        max_value: Maximum value the query filters on
+        newest: When the query only reads the `newest` matching readings by
+                timestamp, the readings backend loads just those instead of
+                the whole range
+    """
+    if chunks is None:
+        chunks = archive_chunks_in(cursor, mode_id, start_time, end_time)
+    if not chunks and readings_backend is None:
+        return 'readings'
+    
+    sources = []
+    if readings_backend is None:
+        sources.append('SELECT id, mode_id, value, timestamp FROM readings')
+    else:
+        if newest is None:
+            records = scan_backend(mode_id, start_time, end_time)
+        else:
+            # The newest rows of the union are among the newest of each part
+            records = page_backend(mode_id, start_time, end_time, min_value, max_value, newest)
+        load_temp_readings(cursor, 'backend_readings', records)
+        sources.append('SELECT id, mode_id, value, timestamp FROM temp.backend_readings')
+    
+    if chunks:
+        archived = []
+        for chunk in chunks:
+            rows = decoded_chunk(chunk['path'])
+            # Rows are in time order, so the range is one slice
+            first = bisect.bisect_left(rows, start_time, key=itemgetter(3)) if start_time else 0
+            last = bisect.bisect_right(rows, end_time, key=itemgetter(3)) if end_time else len(rows)
+            archived.extend(rows[first:last])
+        load_temp_rows(cursor, 'archived_readings', archived)
+        sources.append('SELECT id, mode_id, value, timestamp FROM temp.archived_readings')
+    
+    return '(' + ' UNION ALL '.join(sources) + ')'
+
+
+def time_bounds_ms(start_time=None, end_time=None):
+    """Convert optional start/end time arguments to epoch milliseconds."""
+    bounds = []
+    for text in (start_time, end_time):
+        try:
+            bounds.append(int(parse_time_arg(text) * 1000) if text else None)
+        except ValueError:
+            bounds.append(None)
+    return bounds
+
+
+def scan_backend(mode_id=None, start_time=None, end_time=None):
+    """Read the readings of a mode and time range from the readings backend."""
+    with backend_lock():
+        return list(readings_backend.scan(mode_id, *time_bounds_ms(start_time, end_time)))
+
+
+def page_backend(mode_id=None, start_time=None, end_time=None, min_value=None,
+                 max_value=None, limit=100, offset=0):
+    """Read one newest-first page of readings from the readings backend."""
+    with backend_lock():
+        return readings_backend.page(mode_id, *time_bounds_ms(start_time, end_time),
+                                     min_value, max_value, limit, offset)
+
+
+def load_temp_readings(cursor, table, records):
+    """Fill a temporary readings table from (id, mode_id, epoch_ms, value) records."""
+    load_temp_rows(cursor, table, [(reading_id, mode_id, value, format_timestamp(epoch_ms / 1000))
+                                   for reading_id, mode_id, epoch_ms, value in records])
+
+
+def load_temp_rows(cursor, table, rows):
+    """Fill a temporary readings table from (id, mode_id, value, timestamp) rows."""
+    cursor.execute(f'''
+        CREATE TEMP TABLE IF NOT EXISTS {table} (
+            id INTEGER, mode_id INTEGER, value REAL, timestamp TIMESTAMP
+        )
+    ''')
+    cursor.execute(f'DELETE FROM temp.{table}')
+    cursor.executemany(
+        f'INSERT INTO temp.{table} (id, mode_id, value, timestamp) VALUES (?, ?, ?, ?)',
+        rows
+    )
+
+
+AGGREGATION_INTERVALS = {
+    '1min': 60,
+    '5min': 300,
+    '15min': 900,
+    '60min': 3600
+}
+
+
+def build_where_clause(mode_id=None, start_time=None, end_time=None,
+                       min_value=None, max_value=None):
+    """
+    Build the WHERE clause shared by the readings queries.
+    
+    Returns:
+        Tuple of (sql, params); sql is empty when no filter is set
+    """
+    params = []
+    where_clauses = []
+    
+    if mode_id is not None:
+        where_clauses.append('r.mode_id = ?')
+        params.append(mode_id)
+    
+    if start_time:
+        where_clauses.append('r.timestamp >= ?')
+        params.append(start_time)
+    
+    if end_time:
+        where_clauses.append('r.timestamp <= ?')
+        params.append(end_time)
+    
+    if min_value is not None:
+        where_clauses.append('r.value >= ?')
+        params.append(min_value)
+    
+    if max_value is not None:
+        where_clauses.append('r.value <= ?')
+        params.append(max_value)
+    
+    if not where_clauses:
+        return '', params
+    return ' WHERE ' + ' AND '.join(where_clauses), params
+
+
+def build_filtered_query(mode_id=None, start_time=None, end_time=None,
+                         min_value=None, max_value=None, limit=100, offset=0,
+                         aggregation=None, mode_columns=True, source='readings'):
+    """
+    Build the SQL and parameters for a filtered, optionally aggregated query.
+    
+    Args:
+        mode_columns: Include the joined mode name and icon in every row
+        source: Table or subquery to read readings from (see readings_source)
+    
+    Returns:
+        Tuple of (query, params)
+    """
+    params = []
+    mode_select = 'm.name as mode_name, m.icon,' if mode_columns else ''
+    
+    if aggregation and aggregation != 'raw':
+        if aggregation not in AGGREGATION_INTERVALS:
+            raise ValueError(f"Invalid aggregation interval: {aggregation}")
+        
+        interval_seconds = AGGREGATION_INTERVALS[aggregation]
+        
+        query = f'''
+            SELECT 
+                r.mode_id,
+                {mode_select}
+                AVG(r.value) as value,
+                MIN(r.value) as min_value,
+                MAX(r.value) as max_value,
+                COUNT(r.id) as count,
+                datetime((strftime('%s', r.timestamp) / ?) * ?, 'unixepoch') as timestamp
+            FROM {source} r
+            JOIN modes m ON r.mode_id = m.id
+        '''
+        params.extend([interval_seconds, interval_seconds])
+    else:
+        query = f'''
+            SELECT 
+                r.id,
+                r.mode_id,
+                {mode_select}
+                r.value,
+                r.timestamp
+            FROM {source} r
+            JOIN modes m ON r.mode_id = m.id
+        '''
+    
+    where_sql, where_params = build_where_clause(
+        mode_id, start_time, end_time, min_value, max_value
+    )
+    query += where_sql
+    params.extend(where_params)
+    
+    if aggregation and aggregation != 'raw':
+        query += ' GROUP BY r.mode_id, datetime((strftime(\'%s\', r.timestamp) / ?) * ?)'
+        params.extend([interval_seconds, interval_seconds])
+    
+    query += ' ORDER BY r.timestamp DESC'
+    query += ' LIMIT ? OFFSET ?'
+    params.extend([limit, offset])
+    
+    return query, params
+
+
+def records_needed(limit, offset, aggregation):
+    """Return how many newest readings a records page reads, or None for all."""
+    if aggregation and aggregation != 'raw':
+        return None
+    return offset + limit
+
+
+@coalesce
+@blocking
 def get_filtered_records(mode_id=None, start_time=None, end_time=None, 
                         min_value=None, max_value=None, limit=100, offset=0,
-                        aggregation=None):
+                        aggregation=None, snapshot=False):
     """
     Get filtered and optionally aggregated records with pagination.
     
@@ -281,93 +1766,276 @@ def get_filtered_records(mode_id=None, start_time=None, end_time=None,
         limit: Maximum number of records to return
         offset: Number of records to skip
         aggregation: Aggregation interval ('raw', '1min', '5min', '15min', '60min')
+        snapshot: Read from the analytics snapshot when one exists
     
     Returns:
         List of dictionaries containing reading data
     """
-    with get_db_connection() as conn:
+    with get_db_connection(snapshot=snapshot and snapshot_ready()) as conn:
         cursor = conn.cursor()
+        query, params = build_filtered_query(
+            mode_id, start_time, end_time, min_value, max_value,
+            limit, offset, aggregation,
+            source=readings_source(cursor, mode_id, start_time, end_time,
+                                   min_value=min_value, max_value=max_value,
+                                   newest=records_needed(limit, offset, aggregation))
+        )
+        cursor.execute(query, params)
+        return [dict(row) for row in cursor.fetchall()]
+
+
+@coalesce
+@blocking
+def get_filtered_records_columnar(mode_id=None, start_time=None, end_time=None,
+                                  min_value=None, max_value=None, limit=100, offset=0,
+                                  aggregation=None, snapshot=False):
+    """
+    Get filtered records as parallel column arrays.
+    
+    Takes the same arguments as get_filtered_records. Rows are read as plain
+    cursor tuples and transposed, so no per-row dict is built; mode name and
+    icon are returned once per mode in a lookup table instead of per row.
+    
+    Returns:
+        Dictionary with 'columns' (column name -> list of values), 'modes'
+        (mode_id -> {'name', 'icon'}) and 'count'
+    """
+    with get_db_connection(snapshot=snapshot and snapshot_ready()) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        query, params = build_filtered_query(
+            mode_id, start_time, end_time, min_value, max_value,
+            limit, offset, aggregation, mode_columns=False,
+            source=readings_source(cursor, mode_id, start_time, end_time,
+                                   min_value=min_value, max_value=max_value,
+                                   newest=records_needed(limit, offset, aggregation))
+        )
+        cursor.execute(query, params)
+        names = [description[0] for description in cursor.description]
+        rows = cursor.fetchall()
         
-        params = []
-        where_clauses = []
-        
-        if aggregation and aggregation != 'raw':
-            interval_map = {
-                '1min': 60,
-                '5min': 300,
-                '15min': 900,
-                '60min': 3600
-            }
-            
-            if aggregation not in interval_map:
-                raise ValueError(f"Invalid aggregation interval: {aggregation}")
-            
-            interval_seconds = interval_map[aggregation]
-            
-            query = '''
-                SELECT 
-                    r.mode_id,
-                    m.name as mode_name,
-                    m.icon,
-                    AVG(r.value) as value,
-                    MIN(r.value) as min_value,
-                    MAX(r.value) as max_value,
-                    COUNT(r.id) as count,
-                    datetime((strftime('%s', r.timestamp) / ?) * ?, 'unixepoch') as timestamp
-                FROM readings r
-                JOIN modes m ON r.mode_id = m.id
-            '''
-            params.extend([interval_seconds, interval_seconds])
-        else:
-            query = '''
-                SELECT 
-                    r.id,
-                    r.mode_id,
-                    m.name as mode_name,
-                    m.icon,
-                    r.value,
-                    r.timestamp
-                FROM readings r
-                JOIN modes m ON r.mode_id = m.id
-            '''
+        values = zip(*rows) if rows else [()] * len(names)
+        columns = {name: list(column) for name, column in zip(names, values)}
         
-        if mode_id is not None:
-            where_clauses.append('r.mode_id = ?')
-            params.append(mode_id)
+        mode_ids = sorted(set(columns['mode_id']))
+        modes = {}
+        if mode_ids:
+            placeholders = ','.join('?' * len(mode_ids))
+            cursor.execute(
+                f'SELECT id, name, icon FROM modes WHERE id IN ({placeholders})',
+                mode_ids
+            )
+            modes = {mode_id: {'name': name, 'icon': icon}
+                     for mode_id, name, icon in cursor.fetchall()}
+        
+        return {'columns': columns, 'modes': modes, 'count': len(rows)}
+
+
+CHART_METHODS = ('m4', 'lttb')
+
+
+@coalesce
+@blocking
+def get_chart_series(mode_id=None, start_time=None, end_time=None, width=800,
+                     method='m4'):
+    """
+    Get a chart series downsampled to the requested pixel width.
+    
+    The M4 reduction runs inside SQLite over the raw readings: rows are
+    grouped into one bucket per pixel and only the first, last, minimum and
+    maximum point of each bucket are returned, which keeps the rendered line
+    identical to the full-resolution one. 'lttb' additionally reduces those
+    candidates to at most `width` points per mode with Largest-Triangle-
+    Three-Buckets.
+    
+    Args:
+        mode_id: Filter by mode ID
+        start_time: Filter by start datetime (ISO format string)
+        end_time: Filter by end datetime (ISO format string)
+        width: Chart width in pixels (number of buckets)
+        method: Downsampling method ('m4' or 'lttb')
+    
+    Returns:
+        Dictionary with 'bucket_seconds' and 'series', a list with one entry
+        per mode holding parallel 'timestamps' and 'values' arrays
+    """
+    if method not in CHART_METHODS:
+        raise ValueError(f"Invalid downsampling method: {method}")
+    if width < 1:
+        raise ValueError("Width must be a positive number of pixels")
+    
+    where_sql, where_params = build_where_clause(mode_id, start_time, end_time)
+    
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        source = readings_source(cursor, mode_id, start_time, end_time)
         
-        if start_time:
-            where_clauses.append('r.timestamp >= ?')
-            params.append(start_time)
+        cursor.execute(f'''
+            SELECT MIN(r.timestamp),
+                   julianday(MAX(r.timestamp)) - julianday(MIN(r.timestamp))
+            FROM {source} r{where_sql}
+        ''', where_params)
+        first_timestamp, span_days = cursor.fetchone()
+        if first_timestamp is None:
+            return {'bucket_seconds': None, 'series': []}
         
-        if end_time:
-            where_clauses.append('r.timestamp <= ?')
-            params.append(end_time)
+        bucket_seconds = span_days * 86400.0 / width if span_days else 1.0
         
-        if min_value is not None:
-            where_clauses.append('r.value >= ?')
-            params.append(min_value)
+        cursor.execute(f'''
+            WITH b AS (
+                SELECT id, mode_id, timestamp, value, x, CAST(x / ? AS INTEGER) AS bucket
+                FROM (
+                    SELECT r.id, r.mode_id, r.timestamp, r.value,
+                           (julianday(r.timestamp) - julianday(?)) * 86400.0 AS x
+                    FROM {source} r{where_sql}
+                )
+            ),
+            ranked AS (
+                SELECT mode_id, id, timestamp, value, x,
+                       ROW_NUMBER() OVER (PARTITION BY mode_id, bucket ORDER BY x, id) AS first_rank,
+                       ROW_NUMBER() OVER (PARTITION BY mode_id, bucket ORDER BY x DESC, id DESC) AS last_rank
+                FROM b
+            )
+            -- First and last by time (not id: backfilled readings get newer ids)
+            SELECT mode_id, id, timestamp, value, x FROM ranked
+            WHERE first_rank = 1 OR last_rank = 1
+            UNION
+            SELECT mode_id, id, timestamp, value, x FROM (
+                SELECT mode_id, id, timestamp, MIN(value) AS value, x FROM b GROUP BY mode_id, bucket
+            )
+            UNION
+            SELECT mode_id, id, timestamp, value, x FROM (
+                SELECT mode_id, id, timestamp, MAX(value) AS value, x FROM b GROUP BY mode_id, bucket
+            )
+            ORDER BY mode_id, x, id
+        ''', [bucket_seconds, first_timestamp] + where_params)
         
-        if max_value is not None:
-            where_clauses.append('r.value <= ?')
-            params.append(max_value)
+        points_by_mode = {}
+        for row_mode_id, _, timestamp, value, x in cursor.fetchall():
+            points_by_mode.setdefault(row_mode_id, []).append((x, value, timestamp))
         
-        if where_clauses:
-            query += ' WHERE ' + ' AND '.join(where_clauses)
+        mode_ids = sorted(points_by_mode)
+        placeholders = ','.join('?' * len(mode_ids))
+        cursor.execute(
+            f'SELECT id, name, icon FROM modes WHERE id IN ({placeholders})',
+            mode_ids
+        )
+        modes = {row_id: (name, icon) for row_id, name, icon in cursor.fetchall()}
+    
+    series = []
+    for row_mode_id in mode_ids:
+        if row_mode_id not in modes:
+            continue
+        points = points_by_mode[row_mode_id]
+        if method == 'lttb':
+            points = largest_triangle_three_buckets(points, width)
+        name, icon = modes[row_mode_id]
+        series.append({
+            'mode_id': row_mode_id,
+            'mode_name': name,
+            'icon': icon,
+            'timestamps': [point[2] for point in points],
+            'values': [point[1] for point in points],
+            'count': len(points)
+        })
+    
+    return {'bucket_seconds': bucket_seconds, 'series': series}
+
+
+@coalesce
+@blocking
+def get_interpolated_series(mode_id, start_time=None, end_time=None, step=60, snapshot=False):
+    """
+    Rebuild an evenly spaced series from the stored readings of a mode.
+    
+    Values are linearly interpolated between the stored points around each
+    grid time, which reconstructs compressed modes within their tolerance.
+    Grid times outside the stored data get None.
+    
+    Args:
+        mode_id: Mode ID
+        start_time: Start datetime (ISO format string); defaults to the first reading
+        end_time: End datetime (ISO format string); defaults to the last reading
+        step: Grid spacing in seconds
+        snapshot: Read from the analytics snapshot when one exists
+    
+    Returns:
+        Dictionary with parallel 'timestamps' and 'values' arrays, the
+        'step_seconds' and the number of 'stored_points' used
+    """
+    if step <= 0:
+        raise ValueError("step must be a positive number of seconds")
+    
+    lower = start_time or ''
+    upper = end_time or '9999-12-31 23:59:59'
+    
+    with get_db_connection(snapshot=snapshot and snapshot_ready()) as conn:
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        source = readings_source(cursor, mode_id)
         
-        if aggregation and aggregation != 'raw':
-            query += ' GROUP BY r.mode_id, datetime((strftime(\'%s\', r.timestamp) / ?) * ?)'
-            params.extend([interval_seconds, interval_seconds])
+        # The stored points in range plus one on either side to interpolate from
+        cursor.execute(f'''
+            SELECT timestamp, value FROM (
+                SELECT timestamp, value FROM {source}
+                WHERE mode_id = ? AND timestamp < ?
+                ORDER BY timestamp DESC LIMIT 1
+            )
+            UNION ALL
+            SELECT timestamp, value FROM {source}
+            WHERE mode_id = ? AND timestamp >= ? AND timestamp <= ?
+            UNION ALL
+            SELECT timestamp, value FROM (
+                SELECT timestamp, value FROM {source}
+                WHERE mode_id = ? AND timestamp > ?
+                ORDER BY timestamp ASC LIMIT 1
+            )
+            ORDER BY timestamp
+        ''', (mode_id, lower, mode_id, lower, upper, mode_id, upper))
+        points = [(parse_stored_timestamp(timestamp), value)
+                  for timestamp, value in cursor.fetchall()]
+    
+    result = {
+        'timestamps': [],
+        'values': [],
+        'step_seconds': step,
+        'stored_points': len(points)
+    }
+    if not points:
+        return result
+    
+    start_epoch = parse_time_arg(start_time) if start_time else points[0][0]
+    end_epoch = parse_time_arg(end_time) if end_time else points[-1][0]
+    grid_size = int((end_epoch - start_epoch) / step + 1e-6) + 1
+    if grid_size > 10000:
+        raise ValueError("Too many points requested; use a larger step")
+    
+    index = 0
+    for position in range(max(grid_size, 0)):
+        grid_time = start_epoch + position * step
+        while index < len(points) - 1 and points[index + 1][0] <= grid_time:
+            index += 1
         
-        query += ' ORDER BY r.timestamp DESC'
-        query += ' LIMIT ? OFFSET ?'
-        params.extend([limit, offset])
+        left_time, left_value = points[index]
+        value = None
+        if abs(grid_time - left_time) < 1e-3:
+            value = left_value
+        elif left_time < grid_time and index < len(points) - 1:
+            right_time, right_value = points[index + 1]
+            fraction = (grid_time - left_time) / (right_time - left_time)
+            value = left_value + (right_value - left_value) * fraction
         
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        result['timestamps'].append(format_timestamp(grid_time))
+        result['values'].append(value)
+    
+    return result
 
 
+@coalesce
+@blocking
 def get_statistics(mode_id=None, start_time=None, end_time=None, 
-                   min_value=None, max_value=None):
+                   min_value=None, max_value=None, snapshot=False):
     """
     Calculate statistics for readings with optional filtering.
     
@@ -377,17 +2045,24 @@ def get_statistics(mode_id=None, start_time=None, end_time=None,
         end_time: Filter by end datetime (ISO format string)
         min_value: Filter by minimum value
         max_value: Filter by maximum value
+        snapshot: Read from the analytics snapshot when one exists
     
     Returns:
         Dictionary containing statistics (min, max, avg, count) per mode
     """
-    with get_db_connection() as conn:
+    if readings_backend is not None and not archive_chunk_count():
+        return get_backend_statistics(mode_id, start_time, end_time, min_value, max_value)
+    
+    with get_db_connection(snapshot=snapshot and snapshot_ready()) as conn:
         cursor = conn.cursor()
         
         params = []
-        where_clauses = []
+        chunks = archive_chunks_in(cursor, mode_id, start_time, end_time)
+        summarized, partial = split_archive_chunks(chunks, start_time, end_time,
+                                                   min_value, max_value)
+        source = readings_source(cursor, mode_id, start_time, end_time, chunks=partial)
         
-        query = '''
+        query = f'''
             SELECT 
                 r.mode_id,
                 m.name as mode_name,
@@ -398,38 +2073,23 @@ def get_statistics(mode_id=None, start_time=None, end_time=None,
                 MAX(r.value) as maximum,
                 MIN(r.timestamp) as first_reading,
                 MAX(r.timestamp) as last_reading
-            FROM readings r
+            FROM {source} r
             JOIN modes m ON r.mode_id = m.id
         '''
         
-        if mode_id is not None:
-            where_clauses.append('r.mode_id = ?')
-            params.append(mode_id)
-        
-        if start_time:
-            where_clauses.append('r.timestamp >= ?')
-            params.append(start_time)
-        
-        if end_time:
-            where_clauses.append('r.timestamp <= ?')
-            params.append(end_time)
-        
-        if min_value is not None:
-            where_clauses.append('r.value >= ?')
-            params.append(min_value)
-        
-        if max_value is not None:
-            where_clauses.append('r.value <= ?')
-            params.append(max_value)
-        
-        if where_clauses:
-            query += ' WHERE ' + ' AND '.join(where_clauses)
+        where_sql, where_params = build_where_clause(
+            mode_id, start_time, end_time, min_value, max_value
+        )
+        query += where_sql
+        params.extend(where_params)
         
         query += ' GROUP BY r.mode_id, m.name, m.icon'
         query += ' ORDER BY r.mode_id'
         
         cursor.execute(query, params)
         results = [dict(row) for row in cursor.fetchall()]
+        if summarized:
+            results = add_chunk_statistics(cursor, results, summarized)
         
         if mode_id is not None:
             return results[0] if results else None
@@ -437,6 +2097,103 @@ def get_statistics(mode_id=None, start_time=None, end_time=None,
         return results
 
 
+def split_archive_chunks(chunks, start_time=None, end_time=None, min_value=None, max_value=None):
+    """
+    Sort archive chunks by how a statistics query over a range can use them.
+    
+    Returns:
+        Tuple of (chunks wholly inside the range and value bounds, whose
+        indexed aggregates can be used as they are; chunks that have to be
+        decoded). Chunks whose values all fall outside the bounds are dropped.
+    """
+    summarized = []
+    partial = []
+    for chunk in chunks:
+        if (min_value is not None and chunk['max_value'] < min_value) or \
+                (max_value is not None and chunk['min_value'] > max_value):
+            continue
+        inside = (not start_time or chunk['start_time'] >= start_time) and \
+            (not end_time or chunk['end_time'] <= end_time) and \
+            (min_value is None or chunk['min_value'] >= min_value) and \
+            (max_value is None or chunk['max_value'] <= max_value)
+        # Chunks compacted before sums were indexed have no sum_value
+        if inside and chunk['sum_value'] is not None:
+            summarized.append(chunk)
+        else:
+            partial.append(chunk)
+    return summarized, partial
+
+
+def add_chunk_statistics(cursor, results, chunks):
+    """Fold the indexed aggregates of whole archive chunks into get_statistics() rows."""
+    by_mode = {row['mode_id']: row for row in results}
+    missing = sorted({chunk['mode_id'] for chunk in chunks} - set(by_mode))
+    if missing:
+        cursor.execute(f'''
+            SELECT id, name, icon FROM modes WHERE id IN ({', '.join('?' * len(missing))})
+        ''', missing)
+        for missing_id, name, icon in cursor.fetchall():
+            by_mode[missing_id] = {
+                'mode_id': missing_id, 'mode_name': name, 'icon': icon, 'count': 0,
+                'average': None, 'minimum': None, 'maximum': None,
+                'first_reading': None, 'last_reading': None
+            }
+    
+    for chunk in chunks:
+        row = by_mode.get(chunk['mode_id'])
+        if row is None:
+            continue
+        count = row['count'] + chunk['count']
+        total = (row['average'] * row['count'] if row['count'] else 0.0) + chunk['sum_value']
+        row.update(
+            count=count,
+            average=total / count,
+            minimum=chunk['min_value'] if row['minimum'] is None else min(row['minimum'], chunk['min_value']),
+            maximum=chunk['max_value'] if row['maximum'] is None else max(row['maximum'], chunk['max_value']),
+            first_reading=min(filter(None, (row['first_reading'], chunk['start_time']))),
+            last_reading=max(filter(None, (row['last_reading'], chunk['end_time'])))
+        )
+    return [by_mode[key] for key in sorted(by_mode)]
+
+
+def get_backend_statistics(mode_id=None, start_time=None, end_time=None,
+                           min_value=None, max_value=None):
+    """
+    Calculate get_statistics() results with the readings backend's aggregates.
+    
+    Engines that span several files compute the aggregates per file in
+    parallel and merge them, instead of copying the readings into SQLite.
+    """
+    modes = get_mode_registry()
+    with backend_lock():
+        aggregates = readings_backend.statistics(
+            mode_id, *time_bounds_ms(start_time, end_time), min_value, max_value
+        )
+    
+    results = []
+    for stats_mode_id in sorted(aggregates):
+        mode = modes.get(stats_mode_id)
+        if mode is None:
+            continue
+        count, total, minimum, maximum, first_ms, last_ms = aggregates[stats_mode_id]
+        results.append({
+            'mode_id': stats_mode_id,
+            'mode_name': mode['name'],
+            'icon': mode['icon'],
+            'count': count,
+            'average': total / count,
+            'minimum': minimum,
+            'maximum': maximum,
+            'first_reading': format_timestamp(first_ms / 1000),
+            'last_reading': format_timestamp(last_ms / 1000)
+        })
+    
+    if mode_id is not None:
+        return results[0] if results else None
+    
+    return results
+
+
 if __name__ == '__main__':
     init_db()
     print("Database initialized successfully!")
@@ -0,0 +1,104 @@
+"""
+Offload blocking SQLite calls from the eventlet hub to native threads.
+
+sqlite3 calls are C calls that eventlet cannot preempt, so running them on
+the hub stalls every green thread (and every WebSocket client) until they
+return. Once enabled, every database function decorated with
+database.blocking runs through eventlet.tpool on a native thread instead,
+behind a bounded queue of pending calls.
+"""
+
+import threading
+
+from eventlet import tpool
+from eventlet.patcher import original
+from eventlet.semaphore import Semaphore
+
+import database
+
+
+class DatabaseBusyError(Exception):
+    """Raised when the database call queue stays full for too long."""
+
+
+pool_state = {
+    'enabled': False,
+    'threads': 0,
+    'max_pending': 0,
+    'queue_timeout': None,
+    'pending': 0,
+    'completed': 0,
+    'rejected': 0,
+}
+pending_slots = None
+worker_context = original('threading').local()
+
+
+def run_in_pool(fn, *args, **kwargs):
+    """Run fn on a tpool thread, waiting for a free queue slot first."""
+    if getattr(worker_context, 'active', False):
+        return fn(*args, **kwargs)
+
+    if not pending_slots.acquire(timeout=pool_state['queue_timeout']):
+        pool_state['rejected'] += 1
+        raise DatabaseBusyError("Database queue is full, try again later")
+
+    pool_state['pending'] += 1
+    budget = getattr(database.query_context, 'budget', None)
+    try:
+        return tpool.execute(run_worker, budget, fn, args, kwargs)
+    finally:
+        pool_state['pending'] -= 1
+        pool_state['completed'] += 1
+        pending_slots.release()
+
+
+def run_worker(budget, fn, args, kwargs):
+    """Worker-side wrapper restoring the caller's query budget."""
+    worker_context.active = True
+    try:
+        with database.query_budget(budget):
+            return fn(*args, **kwargs)
+    finally:
+        worker_context.active = False
+
+
+def enable(threads=4, max_pending=64, queue_timeout=5.0):
+    """
+    Route blocking database calls through a native thread pool.
+
+    Args:
+        threads: Number of native worker threads
+        max_pending: Maximum number of database calls queued or running
+        queue_timeout: Seconds to wait for a queue slot before failing
+    """
+    native_threading = original('threading')
+
+    global pending_slots
+    pending_slots = Semaphore(max_pending)
+
+    # Locks taken on worker threads must be native, not green.
+    database.db_lock = native_threading.RLock()
+    database.version_lock = native_threading.Lock()
+
+    tpool.set_num_threads(threads)
+    pool_state.update(
+        enabled=True,
+        threads=threads,
+        max_pending=max_pending,
+        queue_timeout=queue_timeout,
+    )
+    database.executor = run_in_pool
+
+
+def disable():
+    """Run database calls directly on the calling thread again."""
+    database.executor = None
+    database.db_lock = threading.RLock()
+    database.version_lock = threading.Lock()
+    pool_state['enabled'] = False
+
+
+def get_pool_stats():
+    """Get a snapshot of the thread pool queue counters."""
+    return dict(pool_state)
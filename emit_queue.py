@@ -0,0 +1,222 @@
+"""
+Bounded per-client outbound queues for Socket.IO broadcasts.
+
+socketio.emit() hands each packet straight to the client's Engine.IO queue,
+which grows without limit while the client's connection is stalled. Reading
+and mode status broadcasts go through OutboundQueues instead. An event is
+handed to the client right away while its Engine.IO queue is short;
+otherwise it waits in the client's own bounded queue, drained by a green
+thread as the connection catches up. When that queue is full, the policy of
+the subscription the event belongs to decides what happens:
+
+    drop_oldest  discard the oldest queued event
+    latest       keep only the newest queued event of each kind and mode
+                 (and query, for aggregate updates)
+    disconnect   disconnect the client
+"""
+
+import time
+from collections import deque
+
+import eventlet
+
+from subscriptions import room_mode_id
+
+POLICIES = ('drop_oldest', 'latest', 'disconnect')
+
+
+class ClientQueue:
+    """Outbound events waiting for one slow client."""
+
+    def __init__(self, sid, policy):
+        self.sid = sid
+        self.default_policy = policy
+        self.policies = {}
+        # (enqueued_at, event, data, key) in send order
+        self.events = deque()
+        self.draining = False
+        self.closed = False
+        self.sent = 0
+        self.queued = 0
+        self.dropped = 0
+
+    def policy_for(self, mode_id):
+        """Policy of the subscription an event of `mode_id` belongs to."""
+        return self.policies.get(mode_id, self.default_policy)
+
+    def lag(self, now=None):
+        """Seconds the oldest queued event has been waiting."""
+        if not self.events:
+            return 0.0
+        return (now or time.monotonic()) - self.events[0][0]
+
+
+class OutboundQueues:
+    """Routes broadcasts through bounded per-client queues (eventlet mode).
+
+    Exposes the emit(event, data, room=None) signature of socketio.emit so
+    it can stand in for it, e.g. as the simulator's emitter. Mode rooms are
+    resolved through the `subscriptions` index when given. When disabled
+    (asyncio serving mode, where Flask-SocketIO does not own the clients)
+    emits pass straight through.
+    """
+
+    def __init__(self, socketio, subscriptions=None, max_depth=256, policy='drop_oldest',
+                 transport_backlog=16, poll_interval=0.05, enabled=True):
+        self.socketio = socketio
+        self.subscriptions = subscriptions
+        self.max_depth = max_depth
+        self.policy = policy
+        self.transport_backlog = transport_backlog
+        self.poll_interval = poll_interval
+        self.enabled = enabled
+        self.clients = {}
+        self.dropped = 0
+        self.disconnected = 0
+
+    def register(self, sid):
+        """Start tracking a connected client."""
+        self.clients[sid] = ClientQueue(sid, self.policy)
+
+    def unregister(self, sid):
+        """Forget a disconnected client and its queued events."""
+        client = self.clients.pop(sid, None)
+        if client is not None:
+            client.closed = True
+            client.events.clear()
+
+    def set_policy(self, sid, mode_id, policy=None):
+        """
+        Set the slow-client policy of a client's subscription to a mode.
+
+        Raises:
+            ValueError: For an unknown policy
+        """
+        if policy is None:
+            policy = self.policy
+        if policy not in POLICIES:
+            raise ValueError(f"policy must be one of {', '.join(POLICIES)}")
+        client = self.clients.get(sid)
+        if client is not None:
+            client.policies[mode_id] = policy
+
+    def clear_policy(self, sid, mode_id):
+        """Drop the policy of a subscription that has ended."""
+        client = self.clients.get(sid)
+        if client is not None:
+            client.policies.pop(mode_id, None)
+
+    def backlog(self, client):
+        """Packets waiting in the client's Engine.IO queue."""
+        server = self.socketio.server
+        try:
+            socket = server.eio.sockets.get(server.manager.eio_sid_from_sid(client.sid, '/'))
+        except (AttributeError, KeyError):
+            return 0
+        return socket.queue.qsize() if socket is not None else 0
+
+    def recipients(self, room):
+        """Session ids of the clients in a room (all clients for None)."""
+        if room is None:
+            return list(self.clients)
+        mode_id = room_mode_id(room)
+        if self.subscriptions is not None and mode_id is not None:
+            return self.subscriptions.subscribers(mode_id)
+        return [sid for sid, _ in self.socketio.server.manager.get_participants('/', room)]
+
+    def emit(self, event, data, room=None):
+        """Send an event to a room (or every client) through the client queues."""
+        if not self.enabled:
+            self.socketio.emit(event, data, room=room)
+            return
+
+        mode_id = data.get('mode_id') if isinstance(data, dict) else None
+        for sid in self.recipients(room):
+            client = self.clients.get(sid)
+            if client is None:
+                self.socketio.emit(event, data, to=sid)
+            elif not client.events and self.backlog(client) <= self.transport_backlog:
+                self.send(client, event, data)
+            else:
+                self.enqueue(client, event, data, mode_id)
+
+    def send(self, client, event, data):
+        """Hand an event to the client's connection."""
+        self.socketio.emit(event, data, to=client.sid)
+        client.sent += 1
+
+    def enqueue(self, client, event, data, mode_id):
+        """Queue an event for a slow client, applying the subscription's policy."""
+        policy = client.policy_for(mode_id)
+        # Events of one mode can belong to different queries (aggregates)
+        key = (event, mode_id, data.get('query') if isinstance(data, dict) else None)
+
+        if policy == 'latest':
+            for index, (enqueued_at, _, _, queued_key) in enumerate(client.events):
+                if queued_key == key:
+                    # Keep the place (and age) of the superseded event
+                    client.events[index] = (enqueued_at, event, data, key)
+                    self.count_drop(client)
+                    return
+
+        if len(client.events) >= self.max_depth:
+            if policy == 'disconnect':
+                self.disconnect(client)
+                return
+            client.events.popleft()
+            self.count_drop(client)
+
+        client.events.append((time.monotonic(), event, data, key))
+        client.queued += 1
+        if not client.draining:
+            client.draining = True
+            eventlet.spawn(self.drain, client)
+
+    def count_drop(self, client):
+        """Record a discarded event."""
+        client.dropped += 1
+        self.dropped += 1
+
+    def disconnect(self, client):
+        """Disconnect a client that fell too far behind."""
+        print(f"Disconnecting slow client {client.sid} "
+              f"({len(client.events)} events queued, {client.lag():.1f}s behind)")
+        self.disconnected += 1
+        self.unregister(client.sid)
+        self.socketio.server.disconnect(client.sid, namespace='/')
+
+    def drain(self, client):
+        """Forward queued events as the client's connection catches up (green thread)."""
+        try:
+            while client.events and not client.closed:
+                if self.backlog(client) > self.transport_backlog:
+                    eventlet.sleep(self.poll_interval)
+                    continue
+                _, event, data, _ = client.events.popleft()
+                self.send(client, event, data)
+        finally:
+            client.draining = False
+
+    def get_stats(self, top=10):
+        """Queue depth, drop and lag metrics, with the slowest clients listed."""
+        now = time.monotonic()
+        clients = sorted(self.clients.values(), key=lambda client: client.lag(now), reverse=True)
+        return {
+            'enabled': self.enabled,
+            'max_depth': self.max_depth,
+            'default_policy': self.policy,
+            'clients': len(clients),
+            'queued': sum(len(client.events) for client in clients),
+            'dropped': self.dropped,
+            'disconnected': self.disconnected,
+            'slowest': [{
+                'sid': client.sid,
+                'depth': len(client.events),
+                'lag_seconds': round(client.lag(now), 3),
+                'transport_backlog': self.backlog(client),
+                'sent': client.sent,
+                'queued': client.queued,
+                'dropped': client.dropped,
+                'policies': {str(mode_id): policy for mode_id, policy in client.policies.items()}
+            } for client in clients[:top] if client.events or client.dropped]
+        }
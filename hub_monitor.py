@@ -0,0 +1,66 @@
+"""Measure how long the eventlet hub is blocked between scheduled wakeups."""
+
+import time
+
+import eventlet
+
+
+class HubLagMonitor:
+    """Periodically sleeps on the hub and records how late each wakeup is.
+
+    A green thread asking to sleep for `interval` seconds should wake up on
+    time; any extra delay is time the hub spent blocked in code that did not
+    yield (for example a C call such as an un-offloaded sqlite query).
+    """
+
+    def __init__(self, interval=0.1, warn_threshold=0.25):
+        self.interval = interval
+        self.warn_threshold = warn_threshold
+        self.running = False
+        self.thread = None
+        self.samples = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.total_lag = 0.0
+        self.blocked_events = 0
+
+    def record(self, lag):
+        """Record one lag measurement in seconds."""
+        self.samples += 1
+        self.last_lag = lag
+        self.total_lag += lag
+        if lag > self.max_lag:
+            self.max_lag = lag
+        if lag >= self.warn_threshold:
+            self.blocked_events += 1
+            print(f"Event loop blocked for {lag * 1000:.0f}ms")
+
+    def run(self):
+        """Measurement loop (runs in its own green thread)."""
+        while self.running:
+            started = time.monotonic()
+            eventlet.sleep(self.interval)
+            lag = time.monotonic() - started - self.interval
+            self.record(max(lag, 0.0))
+
+    def start(self):
+        """Start measuring in a background green thread."""
+        if not self.running:
+            self.running = True
+            self.thread = eventlet.spawn(self.run)
+
+    def stop(self):
+        """Stop measuring."""
+        self.running = False
+
+    def get_stats(self):
+        """Get the lag statistics in milliseconds."""
+        return {
+            'running': self.running,
+            'interval_ms': self.interval * 1000,
+            'samples': self.samples,
+            'last_lag_ms': round(self.last_lag * 1000, 3),
+            'max_lag_ms': round(self.max_lag * 1000, 3),
+            'avg_lag_ms': round(self.total_lag / self.samples * 1000, 3) if self.samples else 0.0,
+            'blocked_events': self.blocked_events,
+        }
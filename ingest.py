@@ -0,0 +1,162 @@
+"""
+Bulk ingest of sensor readings from real devices.
+
+Readings arrive as (mode_id, timestamp, value) tuples, either as NDJSON or as
+a compact binary payload. A batch is parsed and validated as a whole, written
+in one transaction and then handed to the registered listeners (for example
+the Socket.IO broadcaster in app.py).
+
+Binary format: a sequence of little-endian 20-byte records
+    uint32 mode_id | float64 unix timestamp (seconds) | float64 value
+"""
+
+import json
+import struct
+import sys
+import time
+from datetime import datetime, timezone
+
+from database import add_readings_bulk, format_timestamp, get_mode_ids
+
+BINARY_RECORD = struct.Struct('<Idd')
+
+# Stored timestamps have four-digit years, so epochs must fall in 1970-9999
+MAX_EPOCH = 253402300800
+
+listeners = []
+
+
+class IngestError(ValueError):
+    """Raised when an ingest payload is malformed or contains invalid rows."""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or []
+
+
+def add_listener(listener):
+    """Register a callable receiving each stored batch of readings."""
+    listeners.append(listener)
+
+
+def parse_timestamp(value):
+    """Convert an epoch number, ISO string or None (now) to the stored format."""
+    if value is None:
+        return format_timestamp(time.time())
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return format_epoch(value)
+    if isinstance(value, str):
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return format_epoch(parsed.timestamp())
+    raise ValueError("timestamp must be a number, an ISO string or null")
+
+
+def format_epoch(epoch):
+    """Format unix seconds for storage, rejecting non-finite and out-of-range times."""
+    # NaN fails both comparisons; huge ints compare without overflowing
+    if not 0 <= epoch < MAX_EPOCH:
+        raise ValueError("timestamp must be a finite unix time between 1970 and 9999")
+    return format_timestamp(epoch)
+
+
+def parse_ndjson(payload):
+    """
+    Parse an NDJSON payload into raw (mode_id, timestamp, value) tuples.
+
+    Each line is either [mode_id, timestamp, value] or an object with
+    mode_id, value and an optional timestamp.
+    """
+    rows = []
+    for line_number, line in enumerate(payload.splitlines(), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise IngestError(f"Line {line_number} is not valid JSON")
+        if isinstance(item, list) and len(item) == 3:
+            rows.append(tuple(item))
+        elif isinstance(item, dict) and 'mode_id' in item and 'value' in item:
+            rows.append((item['mode_id'], item.get('timestamp'), item['value']))
+        else:
+            raise IngestError(f"Line {line_number} must be [mode_id, timestamp, value] "
+                              "or an object with mode_id and value")
+    return rows
+
+
+def parse_binary(payload):
+    """Parse a binary payload of fixed-size records into raw tuples."""
+    if len(payload) % BINARY_RECORD.size:
+        raise IngestError(f"Binary payload length must be a multiple of {BINARY_RECORD.size} bytes")
+    return list(BINARY_RECORD.iter_unpack(payload))
+
+
+def validate_rows(rows, mode_ids):
+    """
+    Validate raw rows and convert them for storage.
+
+    Returns:
+        List of (mode_id, timestamp, value) tuples ready for the database
+
+    Raises:
+        IngestError listing the first invalid rows
+    """
+    valid = []
+    errors = []
+    for index, (mode_id, timestamp, value) in enumerate(rows):
+        try:
+            if isinstance(mode_id, bool) or not isinstance(mode_id, int) or mode_id not in mode_ids:
+                raise ValueError(f"unknown mode_id {mode_id!r}")
+            # Also rejects NaN, and ints too large for a float such as 10**400
+            if isinstance(value, bool) or not isinstance(value, (int, float)) \
+                    or not -sys.float_info.max <= value <= sys.float_info.max:
+                raise ValueError("value must be a finite number")
+            valid.append((mode_id, parse_timestamp(timestamp), float(value)))
+        except (ValueError, OverflowError, OSError) as e:
+            errors.append({'row': index, 'error': str(e)})
+            if len(errors) >= 20:
+                break
+    if errors:
+        raise IngestError(f"{len(errors)} invalid row(s) in batch", errors)
+    return valid
+
+
+def store_readings(valid):
+    """
+    Store a batch of validated readings and publish it to the listeners.
+
+    Args:
+        valid: List of (mode_id, timestamp, value) tuples as returned by
+               validate_rows
+
+    Returns:
+        List of stored readings as (id, mode_id, timestamp, value) tuples;
+        compressed modes may store fewer readings than given
+    """
+    stored = add_readings_bulk(valid)
+    if not stored:
+        return stored
+
+    for listener in listeners:
+        try:
+            listener(stored)
+        except Exception as e:
+            print(f"Error in ingest listener: {e}")
+
+    return stored
+
+
+def ingest_readings(rows):
+    """
+    Validate, store and publish a batch of raw readings.
+
+    Args:
+        rows: List of raw (mode_id, timestamp, value) tuples
+
+    Returns:
+        List of stored readings as (id, mode_id, timestamp, value) tuples
+    """
+    return store_readings(validate_rows(rows, get_mode_ids()))
@@ -0,0 +1,247 @@
+"""
+Line-protocol ingest listener for edge sensors (TCP and UDP).
+
+Each reading is one text line:
+
+    mode_id,timestamp,value
+
+where `timestamp` is unix seconds (empty for "now"). TCP connections may
+stream any number of newline-terminated lines; a UDP datagram carries one or
+more lines. Parsed readings are buffered and written in batches through
+ingest.store_readings, the same path POST /api/ingest uses, so live
+subscribers receive them as readings_batch events.
+
+Runs inside the asyncio serving mode (see LINE_INGEST_TCP_PORT /
+LINE_INGEST_UDP_PORT in app.py) or on its own:
+
+    python line_listener.py --tcp-port 5100 --udp-port 5101
+
+When run on its own, readings are stored but not pushed to Socket.IO clients.
+Use bench_line_ingest.py to generate traffic against it.
+"""
+
+import argparse
+import asyncio
+import math
+import time
+
+import aio_database
+import database
+from ingest import parse_timestamp, store_readings
+
+MAX_LINE_LENGTH = 4096
+MODE_REFRESH_INTERVAL = 5.0
+
+# The listener started by the serving process, if any
+server = None
+
+
+class LineProtocol(asyncio.Protocol):
+    """TCP protocol splitting the byte stream into complete lines."""
+
+    def __init__(self, listener):
+        self.listener = listener
+        self.buffer = bytearray()
+
+    def data_received(self, data):
+        self.buffer += data
+        end = self.buffer.rfind(b'\n')
+        if end >= 0:
+            self.listener.feed(self.buffer[:end])
+            del self.buffer[:end + 1]
+        elif len(self.buffer) > MAX_LINE_LENGTH:
+            self.listener.counters['parse_errors'] += 1
+            self.buffer.clear()
+
+    def eof_received(self):
+        if self.buffer:
+            self.listener.feed(self.buffer)
+            self.buffer.clear()
+
+
+class DatagramLineProtocol(asyncio.DatagramProtocol):
+    """UDP protocol; every datagram holds whole lines."""
+
+    def __init__(self, listener):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.feed(data)
+
+
+class LineIngestServer:
+    """Parses line-protocol readings and stores them in batches.
+
+    Lines are parsed as they arrive on the event loop; the blocking database
+    write runs on the aio_database thread pool once `batch_size` readings are
+    pending or every `flush_interval` seconds. Readings beyond `max_pending`
+    (for example while the database is slow) are dropped and counted.
+    """
+
+    def __init__(self, batch_size=1000, flush_interval=0.1, max_pending=50000, store=None):
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.store = store or aio_database.asyncify(store_readings)
+        self.pending = []
+        self.mode_ids = set()
+        self.modes_loaded_at = 0.0
+        self.flush_event = asyncio.Event()
+        self.flush_task = None
+        self.transports = []
+        self.tcp_server = None
+        self.tcp_port = None
+        self.udp_port = None
+        self.counters = {
+            'lines': 0,
+            'parsed': 0,
+            'parse_errors': 0,
+            'unknown_mode': 0,
+            'dropped': 0,
+            'stored': 0,
+            'batches': 0,
+            'store_errors': 0
+        }
+
+    def parse_line(self, line):
+        """Parse one line into a (mode_id, timestamp, value) tuple."""
+        mode_field, timestamp_field, value_field = line.split(b',')
+        mode_id = int(mode_field)
+        value = float(value_field)
+        if not math.isfinite(value):
+            raise ValueError("value must be finite")
+        timestamp_field = timestamp_field.strip()
+        # Rejects non-finite and out-of-range times, such as inf or 1e20
+        epoch = float(timestamp_field) if timestamp_field else None
+        return mode_id, parse_timestamp(epoch), value
+
+    def feed(self, chunk):
+        """Parse a chunk of newline-separated lines and queue the readings."""
+        counters = self.counters
+        pending = self.pending
+        mode_ids = self.mode_ids
+
+        for line in bytes(chunk).split(b'\n'):
+            if not line.strip():
+                continue
+            counters['lines'] += 1
+            try:
+                reading = self.parse_line(line)
+            except (ValueError, OverflowError, OSError):
+                counters['parse_errors'] += 1
+                continue
+            counters['parsed'] += 1
+            if reading[0] not in mode_ids:
+                counters['unknown_mode'] += 1
+            elif len(pending) >= self.max_pending:
+                counters['dropped'] += 1
+            else:
+                pending.append(reading)
+
+        if len(pending) >= self.batch_size:
+            self.flush_event.set()
+
+    async def refresh_modes(self):
+        """Reload the known mode ids."""
+        self.mode_ids = await aio_database.asyncify(database.get_mode_ids)()
+        self.modes_loaded_at = time.monotonic()
+
+    async def flush(self):
+        """Store all pending readings in one transaction."""
+        if not self.pending:
+            return
+        batch, self.pending = self.pending, []
+        try:
+            await self.store(batch)
+            self.counters['stored'] += len(batch)
+            self.counters['batches'] += 1
+        except Exception as e:
+            self.counters['store_errors'] += 1
+            self.counters['dropped'] += len(batch)
+            print(f"Error storing line-protocol batch: {e}")
+
+    async def run_flusher(self):
+        """Flush on a full batch or every flush_interval seconds."""
+        while True:
+            try:
+                await asyncio.wait_for(self.flush_event.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.flush_event.clear()
+            await self.flush()
+            if time.monotonic() - self.modes_loaded_at > MODE_REFRESH_INTERVAL:
+                await self.refresh_modes()
+
+    async def start(self, host='0.0.0.0', tcp_port=None, udp_port=None):
+        """Open the TCP and/or UDP listeners (port 0 picks a free port)."""
+        loop = asyncio.get_running_loop()
+        await self.refresh_modes()
+
+        if tcp_port is not None:
+            self.tcp_server = await loop.create_server(lambda: LineProtocol(self), host, tcp_port)
+            self.tcp_port = self.tcp_server.sockets[0].getsockname()[1]
+        if udp_port is not None:
+            transport, _ = await loop.create_datagram_endpoint(
+                lambda: DatagramLineProtocol(self), local_addr=(host, udp_port)
+            )
+            self.transports.append(transport)
+            self.udp_port = transport.get_extra_info('sockname')[1]
+
+        self.flush_task = asyncio.create_task(self.run_flusher())
+        print(f"Line-protocol ingest listening (tcp={self.tcp_port}, udp={self.udp_port})")
+
+    async def stop(self):
+        """Close the listeners and store what is still pending."""
+        if self.tcp_server:
+            self.tcp_server.close()
+            await self.tcp_server.wait_closed()
+        for transport in self.transports:
+            transport.close()
+        if self.flush_task:
+            self.flush_task.cancel()
+            try:
+                await self.flush_task
+            except asyncio.CancelledError:
+                pass
+        await self.flush()
+
+    def get_stats(self):
+        """Return the parse/store counters and the current backlog."""
+        return dict(self.counters, pending=len(self.pending))
+
+
+def get_stats():
+    """Counters of the running listener, or None when it is not running."""
+    return server.get_stats() if server else None
+
+
+async def serve(host, tcp_port, udp_port, stats_interval):
+    """Run a standalone listener until cancelled, printing counters."""
+    global server
+    await aio_database.init_db()
+    server = LineIngestServer()
+    await server.start(host, tcp_port, udp_port)
+    try:
+        while True:
+            await asyncio.sleep(stats_interval)
+            print(server.get_stats())
+    finally:
+        await server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Line-protocol ingest listener (TCP/UDP)')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--tcp-port', type=int, default=5100)
+    parser.add_argument('--udp-port', type=int, default=5101)
+    parser.add_argument('--stats-interval', type=float, default=10.0,
+                        help='seconds between counter printouts')
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.tcp_port, args.udp_port, args.stats_interval))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,262 @@
+"""
+In-process log of the most recent readings of each mode.
+
+database.py records every stored reading here. Each reading gets the next
+per-mode sequence number, so a subscriber that reconnects can say which
+sequence it saw last and have the readings it missed replayed from memory
+(see replay()); new subscribers can be sent the recent history of a mode
+without querying the readings table. Each mode keeps at most
+HISTORY_MAX_READINGS readings.
+
+Sequence numbers restart with the process; `epoch` identifies the current
+numbering so clients can tell a restart from a gap.
+
+`position` is the highest reading id logged so far; the change feed
+(change_feed.py) watches it to learn that new readings were stored.
+
+Readings are logged in id order. Writers run concurrently (database pool
+workers, thread-safe readings engines), so a write can be recorded before
+one holding lower ids; writes are bracketed with writing(), and recorded
+readings are held back until every write that may hold a lower id has
+finished. A consumer that moves its cursor to the newest id it was served
+therefore never skips a reading.
+Listeners registered with add_listener() receive every logged batch (on
+whichever thread stored it), e.g. the continuous aggregates in
+aggregates.py and the alert rules in rules.py.
+"""
+
+import bisect
+import calendar
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+from itertools import islice
+
+from eventlet.patcher import original
+
+# Longest history a subscriber can ask for, in seconds
+HISTORY_SECONDS = 300
+HISTORY_MAX_READINGS = 2000
+
+epoch = format(int(time.time() * 1000), 'x')
+
+buffers = {}
+sequences = {}
+position = 0
+# Recorded readings waiting for lower ids, the highest id recorded, and per
+# write in progress the highest id recorded when it began (the write's
+# readings all get higher ids)
+held = []
+latest = 0
+writes = {}
+write_tokens = itertools.count()
+# First reading id logged by this process, and per mode the newest evicted id
+first_id = None
+evicted = {}
+# Taken on database worker threads and the hub alike, never across a yield
+lock = original('threading').Lock()
+listeners = []
+
+# Last parsed whole-second timestamp prefix (samples arrive in bursts per second)
+parsed_seconds = {}
+
+
+def sample_time(text):
+    """Unix seconds of a stored timestamp, parsing each whole second once."""
+    prefix = text[:19]
+    seconds = parsed_seconds.get(prefix)
+    if seconds is None:
+        parsed_seconds.clear()
+        seconds = parsed_seconds[prefix] = calendar.timegm(time.strptime(prefix, '%Y-%m-%d %H:%M:%S'))
+    if len(text) > 19:
+        return seconds + float('0' + text[19:])
+    return seconds
+
+
+def add_listener(listener):
+    """Register a callable receiving each logged batch of (id, mode_id, timestamp, value) readings."""
+    listeners.append(listener)
+
+
+@contextmanager
+def writing():
+    """Bracket storing readings and record()ing them, so no higher id is logged first."""
+    with lock:
+        token = next(write_tokens)
+        writes[token] = latest
+    try:
+        yield
+    finally:
+        with lock:
+            del writes[token]
+            released = release()
+        notify(released)
+
+
+def settled():
+    """Highest reading id no write in progress can still store below, or None when none is."""
+    with lock:
+        return min(writes.values()) if writes else None
+
+
+def record(readings):
+    """Log stored (id, mode_id, timestamp, value) readings once every lower id is recorded."""
+    global latest
+    with lock:
+        held.extend(readings)
+        latest = max(latest, max((reading[0] for reading in readings), default=0))
+        released = release()
+    notify(released)
+
+
+def release():
+    """Log the held readings no write in progress can precede (call with lock held)."""
+    global position, first_id
+    if not held:
+        return []
+    held.sort()
+    limit = min(writes.values(), default=latest)
+    released = held[:bisect.bisect_left(held, (limit + 1,))]
+    del held[:len(released)]
+
+    for reading_id, mode_id, timestamp, value in released:
+        buffer = buffers.get(mode_id)
+        if buffer is None:
+            buffer = buffers[mode_id] = deque(maxlen=HISTORY_MAX_READINGS)
+        elif len(buffer) == HISTORY_MAX_READINGS:
+            evicted[mode_id] = buffer[0][1]
+        seq = sequences.get(mode_id, 0) + 1
+        sequences[mode_id] = seq
+        buffer.append((seq, reading_id, timestamp, value))
+        if first_id is None:
+            first_id = reading_id
+        position = reading_id
+    return released
+
+
+def notify(readings):
+    """Pass logged readings to the listeners."""
+    if not readings:
+        return
+    for listener in listeners:
+        try:
+            listener(readings)
+        except Exception as e:
+            print(f"Error in live buffer listener: {e}")
+
+
+def last_sequence(mode_id):
+    """Return the sequence number of a mode's newest reading (0 before the first)."""
+    return sequences.get(mode_id, 0)
+
+
+def sequence(mode_id, reading_id):
+    """Return the sequence number of a logged reading, or None once it has been evicted."""
+    with lock:
+        for seq, entry_id, _, _ in reversed(buffers.get(mode_id, ())):
+            if entry_id == reading_id:
+                return seq
+    return None
+
+
+def sequence_map(mode_id, reading_ids):
+    """Map those of the given reading ids that are still logged to their sequence numbers."""
+    wanted = set(reading_ids)
+    with lock:
+        return {entry_id: seq for seq, entry_id, _, _ in buffers.get(mode_id, ())
+                if entry_id in wanted}
+
+
+def columns(entries):
+    """Lay (seq, id, timestamp, value) entries out as parallel arrays."""
+    return {
+        'seqs': [entry[0] for entry in entries],
+        'ids': [entry[1] for entry in entries],
+        'timestamps': [entry[2] for entry in entries],
+        'values': [entry[3] for entry in entries],
+        'count': len(entries)
+    }
+
+
+def history(mode_id, seconds):
+    """
+    Get the logged readings of a mode from the last `seconds` seconds.
+
+    Args:
+        mode_id: Mode ID
+        seconds: Length of the history, capped at HISTORY_SECONDS
+
+    Returns:
+        Dictionary with parallel 'seqs', 'ids', 'timestamps' and 'values'
+        arrays in time order and their 'count'
+    """
+    seconds = min(seconds, HISTORY_SECONDS)
+    # Stored timestamps are UTC text, so they compare in time order
+    cutoff = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(time.time() - seconds))
+    with lock:
+        entries = list(buffers.get(mode_id, ()))
+    entries = sorted((entry for entry in entries if entry[2] >= cutoff),
+                     key=lambda entry: (entry[2], entry[1]))
+    return columns(entries)
+
+
+def replay(mode_id, since):
+    """
+    Get the readings of a mode logged after sequence number `since`.
+
+    Returns:
+        The readings as columns (see columns()), or None when the log no
+        longer reaches back to `since`
+    """
+    with lock:
+        entries = list(buffers.get(mode_id, ()))
+        last = sequences.get(mode_id, 0)
+    if since >= last:
+        return columns([])
+    if not entries or entries[0][0] > since + 1:
+        return None
+    return columns([entry for entry in entries if entry[0] > since])
+
+
+def after(reading_id, mode_ids=None, limit=1000):
+    """
+    Get the logged readings stored after a given reading id.
+
+    Args:
+        reading_id: Only readings with a higher id are returned
+        mode_ids: Restrict to these modes (all modes when None)
+        limit: Maximum number of readings; the oldest ones are kept
+
+    Returns:
+        List of (id, mode_id, timestamp, value) tuples in id order, or None
+        when some of the readings may predate the log or have been evicted
+    """
+    with lock:
+        if first_id is None or reading_id < first_id - 1:
+            return None
+        selected = []
+        for mode_id in (buffers if mode_ids is None else mode_ids):
+            if evicted.get(mode_id, 0) > reading_id:
+                return None
+            newer = []
+            for _, entry_id, timestamp, value in reversed(buffers.get(mode_id, ())):
+                if entry_id <= reading_id:
+                    break
+                newer.append((entry_id, mode_id, timestamp, value))
+            newer.reverse()
+            selected.append(newer)
+    return list(islice(heapq.merge(*selected), limit))
+
+
+def clear():
+    """Drop all logged readings and restart the sequence numbers."""
+    global position, latest, first_id
+    with lock:
+        buffers.clear()
+        sequences.clear()
+        evicted.clear()
+        held.clear()
+        position = latest = 0
+        first_id = None
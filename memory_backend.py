@@ -0,0 +1,127 @@
+"""
+In-memory storage engine for readings.
+
+Each mode's readings are kept in three parallel arrays (ids, epoch_ms,
+values) sorted by time, so range queries are two binary searches and a
+slice. Nothing is persisted: the engine is meant for demos, CI runs and
+benchmark baselines that should not measure disk I/O.
+"""
+
+import heapq
+import itertools
+from array import array
+from bisect import bisect_left, bisect_right
+
+from storage import ReadingsBackend
+
+
+class Series:
+    """Time-ordered readings of one mode."""
+
+    def __init__(self):
+        self.ids = array('q')
+        self.times = array('q')
+        self.values = array('d')
+        self.max_id = None
+
+    def append(self, reading_id, epoch_ms, value):
+        """Add a reading, keeping the arrays sorted by time (then arrival)."""
+        if not self.times or epoch_ms >= self.times[-1]:
+            self.ids.append(reading_id)
+            self.times.append(epoch_ms)
+            self.values.append(value)
+        else:
+            index = bisect_right(self.times, epoch_ms)
+            self.ids.insert(index, reading_id)
+            self.times.insert(index, epoch_ms)
+            self.values.insert(index, value)
+        self.max_id = reading_id
+
+    def bounds(self, start_ms=None, end_ms=None):
+        """Return the [lo, hi) index range of readings between the bounds."""
+        lo = 0 if start_ms is None else bisect_left(self.times, start_ms)
+        hi = len(self.times) if end_ms is None else bisect_right(self.times, end_ms)
+        return lo, max(lo, hi)
+
+
+class MemoryBackend(ReadingsBackend):
+    """Array-backed per-mode series held in process memory."""
+
+    name = 'memory'
+
+    def __init__(self):
+        self.series = {}
+        self.next_id = 1
+
+    def append(self, rows):
+        stored = []
+        for mode_id, epoch_ms, value in rows:
+            series = self.series.get(mode_id)
+            if series is None:
+                series = self.series[mode_id] = Series()
+            series.append(self.next_id, epoch_ms, value)
+            stored.append((self.next_id, mode_id, epoch_ms, value))
+            self.next_id += 1
+        return stored
+
+    def recent(self, mode_id, limit):
+        series = self.series.get(mode_id)
+        if series is None:
+            return []
+        lo = max(len(series.ids) - limit, 0)
+        return [(series.ids[i], mode_id, series.times[i], series.values[i])
+                for i in range(len(series.ids) - 1, lo - 1, -1)]
+
+    def scan(self, mode_id=None, start_ms=None, end_ms=None):
+        mode_ids = [mode_id] if mode_id is not None else sorted(self.series)
+        for series_mode_id in mode_ids:
+            series = self.series.get(series_mode_id)
+            if series is None:
+                continue
+            lo, hi = series.bounds(start_ms, end_ms)
+            for reading_id, epoch_ms, value in zip(series.ids[lo:hi], series.times[lo:hi],
+                                                   series.values[lo:hi]):
+                yield reading_id, series_mode_id, epoch_ms, value
+
+    def page(self, mode_id=None, start_ms=None, end_ms=None, min_value=None,
+             max_value=None, limit=100, offset=0):
+        def newest_first(series_mode_id, series):
+            lo, hi = series.bounds(start_ms, end_ms)
+            for i in range(hi - 1, lo - 1, -1):
+                value = series.values[i]
+                if (min_value is None or value >= min_value) and \
+                        (max_value is None or value <= max_value):
+                    yield series.ids[i], series_mode_id, series.times[i], value
+
+        mode_ids = [mode_id] if mode_id is not None else sorted(self.series)
+        # Each series is already in time order, so the page is a lazy merge
+        merged = heapq.merge(*[newest_first(series_mode_id, self.series[series_mode_id])
+                               for series_mode_id in mode_ids if series_mode_id in self.series],
+                             key=lambda record: (record[2], record[0]), reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    def statistics(self, mode_id=None, start_ms=None, end_ms=None,
+                   min_value=None, max_value=None):
+        if min_value is not None or max_value is not None:
+            return super().statistics(mode_id, start_ms, end_ms, min_value, max_value)
+
+        stats = {}
+        mode_ids = [mode_id] if mode_id is not None else sorted(self.series)
+        for series_mode_id in mode_ids:
+            series = self.series.get(series_mode_id)
+            if series is None:
+                continue
+            lo, hi = series.bounds(start_ms, end_ms)
+            if lo == hi:
+                continue
+            values = series.values[lo:hi]
+            stats[series_mode_id] = (hi - lo, sum(values), min(values), max(values),
+                                     series.times[lo], series.times[hi - 1])
+        return stats
+
+    def max_ids(self):
+        return {mode_id: series.max_id for mode_id, series in self.series.items()
+                if series.max_id is not None}
+
+    def reserve_ids(self, last_id):
+        self.next_id = max(self.next_id, last_id + 1)
@@ -0,0 +1,261 @@
+"""
+Incremental alert rules evaluated on the stream of stored readings.
+
+Each mode can have any number of rules:
+
+- threshold: fires when a reading leaves the band [minimum, maximum]; it
+  re-arms once a reading is back inside.
+- rate: fires when a reading jumps by more than `max_delta` from the
+  previous one, or changes faster than `max_rate` units per second.
+- zscore: fires when a reading lies more than `threshold` standard
+  deviations from the mean of the previous `window` readings.
+
+Rules keep only the state they need (the last reading, or a running mean
+and sum of squared deviations over a fixed-size window, updated with
+Welford's method so it does not drift), so evaluating one costs O(1) per
+reading. Readings reach evaluate() through the live log listener hook
+(live_buffer.add_listener), on whichever thread stored them; fired alerts
+are collected here and taken by the server (take_alerts) to be stored in
+the alerts table and pushed to clients; alerts whose write failed are put
+back with requeue_alerts. The rules themselves live in the
+alert_rules table (see database.add_alert_rule).
+"""
+
+import math
+from collections import deque
+
+from eventlet.patcher import original
+
+from live_buffer import sample_time
+
+KINDS = ('threshold', 'rate', 'zscore')
+MAX_PENDING_ALERTS = 10000
+
+
+def number(params, name, default=None, minimum=None):
+    """Read an optional numeric rule parameter."""
+    value = params.get(name, default)
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise ValueError(f"{name} must be a number")
+    if minimum is not None and value < minimum:
+        raise ValueError(f"{name} must be at least {minimum}")
+    return value
+
+
+class ThresholdRule:
+    """Fires when a reading leaves the band [minimum, maximum]."""
+
+    kind = 'threshold'
+
+    def __init__(self, params):
+        self.minimum = number(params, 'minimum')
+        self.maximum = number(params, 'maximum')
+        if self.minimum is None and self.maximum is None:
+            raise ValueError("threshold rules need a minimum and/or a maximum")
+        if self.minimum is not None and self.maximum is not None and self.minimum > self.maximum:
+            raise ValueError("minimum must not exceed maximum")
+        self.violating = False
+
+    def params(self):
+        return {'minimum': self.minimum, 'maximum': self.maximum}
+
+    def check(self, t, value):
+        """Return an alert message for the first reading outside the band."""
+        outside = ((self.minimum is not None and value < self.minimum)
+                   or (self.maximum is not None and value > self.maximum))
+        fired = outside and not self.violating
+        self.violating = outside
+        if fired:
+            return f"value {value:g} outside [{self.minimum}, {self.maximum}]"
+        return None
+
+
+class RateRule:
+    """Fires on a jump larger than max_delta or a change faster than max_rate per second."""
+
+    kind = 'rate'
+
+    def __init__(self, params):
+        self.max_delta = number(params, 'max_delta', minimum=0)
+        self.max_rate = number(params, 'max_rate', minimum=0)
+        if self.max_delta is None and self.max_rate is None:
+            raise ValueError("rate rules need max_delta and/or max_rate")
+        self.last = None
+
+    def params(self):
+        return {'max_delta': self.max_delta, 'max_rate': self.max_rate}
+
+    def check(self, t, value):
+        """Return an alert message when the reading moved too far or too fast."""
+        last, self.last = self.last, (t, value)
+        if last is None:
+            return None
+        delta = value - last[1]
+        if self.max_delta is not None and abs(delta) > self.max_delta:
+            return f"jumped {delta:+g} (limit {self.max_delta:g})"
+        elapsed = t - last[0]
+        if self.max_rate is not None and elapsed > 0 and abs(delta) / elapsed > self.max_rate:
+            return f"changing {delta / elapsed:+g}/s (limit {self.max_rate:g}/s)"
+        return None
+
+
+class ZScoreRule:
+    """Fires when a reading is more than `threshold` deviations from the recent mean."""
+
+    kind = 'zscore'
+
+    def __init__(self, params):
+        self.window = int(number(params, 'window', 60, minimum=2))
+        self.threshold = number(params, 'threshold', 3.0, minimum=0)
+        self.min_samples = int(number(params, 'min_samples', min(10, self.window), minimum=2))
+        self.values = deque()
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def params(self):
+        return {'window': self.window, 'threshold': self.threshold,
+                'min_samples': self.min_samples}
+
+    def check(self, t, value):
+        """Score the reading against the window, then add it to the window."""
+        message = None
+        count = len(self.values)
+        if count >= self.min_samples:
+            std = math.sqrt(max(self.m2 / count, 0.0))
+            if std > 0:
+                score = (value - self.mean) / std
+                if abs(score) > self.threshold:
+                    message = f"z-score {score:+.2f} (mean {self.mean:g}, limit {self.threshold:g})"
+
+        # Welford updates: adding and removing a sample moves the mean and the
+        # squared deviations directly, without cancelling large sums
+        self.values.append(value)
+        delta = value - self.mean
+        self.mean += delta / (count + 1)
+        self.m2 += delta * (value - self.mean)
+        if count == self.window:
+            oldest = self.values.popleft()
+            delta = oldest - self.mean
+            self.mean -= delta / count
+            self.m2 = max(self.m2 - delta * (oldest - self.mean), 0.0)
+        return message
+
+
+RULE_TYPES = {rule_type.kind: rule_type for rule_type in (ThresholdRule, RateRule, ZScoreRule)}
+
+rules = {}
+rules_by_mode = {}
+fired = {}
+pending = []
+stats = {'evaluated': 0, 'alerts': 0, 'dropped': 0, 'requeued': 0}
+# Taken on database worker threads and the hub alike, never across a yield
+lock = original('threading').Lock()
+
+
+def create_rule(kind, params):
+    """
+    Build a rule from its kind and parameters.
+
+    Raises:
+        ValueError: For an unknown kind or invalid parameters
+    """
+    rule_type = RULE_TYPES.get(kind)
+    if rule_type is None:
+        raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+    return rule_type(params)
+
+
+def register(rule_id, mode_id, rule):
+    """Start evaluating a rule on the readings of a mode."""
+    rule.id = rule_id
+    rule.mode_id = mode_id
+    with lock:
+        rules[rule_id] = rule
+        rules_by_mode.setdefault(mode_id, []).append(rule)
+        fired.setdefault(rule_id, 0)
+
+
+def unregister(rule_id):
+    """Stop evaluating a rule; returns whether it existed."""
+    with lock:
+        rule = rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        remaining = [other for other in rules_by_mode[rule.mode_id] if other is not rule]
+        if remaining:
+            rules_by_mode[rule.mode_id] = remaining
+        else:
+            del rules_by_mode[rule.mode_id]
+        fired.pop(rule_id, None)
+        return True
+
+
+def clear():
+    """Drop all rules and pending alerts."""
+    with lock:
+        rules.clear()
+        rules_by_mode.clear()
+        fired.clear()
+        pending.clear()
+
+
+def describe(rule_id):
+    """Describe a registered rule, or None."""
+    rule = rules.get(rule_id)
+    if rule is None:
+        return None
+    return {
+        'id': rule_id,
+        'mode_id': rule.mode_id,
+        'kind': rule.kind,
+        'params': rule.params(),
+        'fired': fired.get(rule_id, 0)
+    }
+
+
+def evaluate(readings):
+    """Run stored (id, mode_id, timestamp, value) readings through their modes' rules."""
+    if not rules_by_mode:
+        return
+    with lock:
+        for reading_id, mode_id, timestamp, value in readings:
+            mode_rules = rules_by_mode.get(mode_id)
+            if not mode_rules:
+                continue
+            t = sample_time(timestamp)
+            for rule in mode_rules:
+                message = rule.check(t, value)
+                if message is None:
+                    continue
+                fired[rule.id] += 1
+                stats['alerts'] += 1
+                if len(pending) >= MAX_PENDING_ALERTS:
+                    stats['dropped'] += 1
+                    continue
+                pending.append((rule.id, mode_id, reading_id, rule.kind, value, message, timestamp))
+            stats['evaluated'] += len(mode_rules)
+
+
+def take_alerts():
+    """Take the alerts fired since the last call, as alerts table rows."""
+    with lock:
+        alerts = pending[:]
+        pending.clear()
+    return alerts
+
+
+def requeue_alerts(alerts):
+    """Put back alerts taken for a write that failed, ahead of newer ones."""
+    with lock:
+        room = max(MAX_PENDING_ALERTS - len(pending), 0)
+        stats['dropped'] += max(len(alerts) - room, 0)
+        stats['requeued'] += min(len(alerts), room)
+        pending[:0] = alerts[:room]
+
+
+def get_stats():
+    """Rule count and evaluation counters."""
+    with lock:
+        return dict(stats, rules=len(rules), modes=len(rules_by_mode), pending=len(pending))
@@ -0,0 +1,326 @@
+"""
+Append-only segment log storage engine for readings.
+
+Each mode has its own directory of segment files. A segment is a flat array
+of fixed-size little-endian records
+
+    id i64 | epoch_ms i64 | value f64
+
+appended in id order and rolled over after SEGMENT_RECORDS records. There
+are no per-row secondary indexes: each segment keeps a sparse in-memory time
+index with the min/max timestamp of every INDEX_STRIDE records, rebuilt when
+the log is opened, and range reads only touch the blocks that overlap. Reads
+go through mmap.
+
+Durability: appends are written to the OS immediately and fsynced in
+batches, once `fsync_batch` records or `fsync_interval` seconds have
+accumulated, and on flush()/close(). Appends followed by an idle period are
+fsynced by a background thread, so every append is durable within about
+`fsync_interval` seconds. Because records have a fixed size a torn write can
+only leave a partial record at the end of the newest segment, which is
+truncated when the log is reopened.
+
+The engine is not thread-safe on its own; database.py serializes calls to it
+under db_lock. Only the background sync runs outside it, under the engine's
+own lock.
+"""
+
+import heapq
+import mmap
+import os
+import struct
+import time
+
+from eventlet.patcher import original
+
+from storage import ReadingsBackend
+
+RECORD = struct.Struct('<qqd')
+SEGMENT_RECORDS = 1 << 20
+INDEX_STRIDE = 256
+
+
+class Segment:
+    """One segment file and its sparse time index."""
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.blocks = []
+        self.last_id = None
+
+    def load(self):
+        """Recover the segment after a restart and rebuild its index."""
+        size = os.path.getsize(self.path)
+        if size % RECORD.size:
+            # Drop a record torn by a crash mid-write
+            size -= size % RECORD.size
+            with open(self.path, 'r+b') as f:
+                f.truncate(size)
+                os.fsync(f.fileno())
+        self.count = 0
+        self.blocks = []
+        for record in self.read(0, size // RECORD.size):
+            self.note(record)
+
+    def note(self, record):
+        """Add an appended record to the index."""
+        epoch_ms = record[1]
+        if self.count % INDEX_STRIDE == 0:
+            self.blocks.append([epoch_ms, epoch_ms])
+        else:
+            block = self.blocks[-1]
+            if epoch_ms < block[0]:
+                block[0] = epoch_ms
+            elif epoch_ms > block[1]:
+                block[1] = epoch_ms
+        self.count += 1
+        self.last_id = record[0]
+
+    def read(self, start, end):
+        """Read records [start, end) through mmap."""
+        if end <= start:
+            return []
+        with open(self.path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            chunk = data[start * RECORD.size:end * RECORD.size]
+        return list(RECORD.iter_unpack(chunk))
+
+    def scan(self, start_ms, end_ms):
+        """Yield records whose timestamp falls in [start_ms, end_ms]."""
+        runs = []
+        for index, (block_min, block_max) in enumerate(self.blocks):
+            if block_max < start_ms or block_min > end_ms:
+                continue
+            if runs and runs[-1][1] == index:
+                runs[-1][1] = index + 1
+            else:
+                runs.append([index, index + 1])
+
+        # Read each run of overlapping blocks in one slice
+        for first, last in runs:
+            end = min(last * INDEX_STRIDE, self.count)
+            for record in self.read(first * INDEX_STRIDE, end):
+                if start_ms <= record[1] <= end_ms:
+                    yield record
+
+
+class ModeLog:
+    """The segments of one mode and its open append handle."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.segments = []
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.seg'):
+                segment = Segment(os.path.join(directory, name))
+                segment.load()
+                self.segments.append(segment)
+        self.file = None
+        self.dirty = False
+
+    def append(self, records):
+        """Append (id, epoch_ms, value) records, rolling segments as needed."""
+        while records:
+            if not self.segments or self.segments[-1].count >= SEGMENT_RECORDS:
+                self.roll(records[0][0])
+            segment = self.segments[-1]
+            room = SEGMENT_RECORDS - segment.count
+            batch, records = records[:room], records[room:]
+            if self.file is None:
+                self.file = open(segment.path, 'ab')
+            self.file.write(b''.join(RECORD.pack(*record) for record in batch))
+            for record in batch:
+                segment.note(record)
+        self.file.flush()
+        self.dirty = True
+
+    def roll(self, first_id):
+        """Start a new segment file."""
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        segment = Segment(os.path.join(self.directory, f'{first_id:012d}.seg'))
+        open(segment.path, 'ab').close()
+        self.segments.append(segment)
+
+    def sync(self):
+        """fsync the active segment if it has unsynced appends."""
+        if self.dirty and self.file is not None:
+            os.fsync(self.file.fileno())
+        self.dirty = False
+
+    def recent(self, limit, start_ms=None, end_ms=None, keep=None):
+        """
+        Return the `limit` records with the newest timestamps, in no particular order.
+
+        Args:
+            limit: Number of records to return
+            start_ms: Skip records before this timestamp (None = no bound)
+            end_ms: Skip records after this timestamp (None = no bound)
+            keep: Optional predicate a record must satisfy
+        """
+        if limit <= 0:
+            return []
+        start_ms = -(1 << 63) if start_ms is None else start_ms
+        end_ms = (1 << 63) - 1 if end_ms is None else end_ms
+        # Visit blocks newest first by their max timestamp, and stop once no
+        # remaining block can hold a record newer than the ones kept
+        blocks = [(-block[1], position, index, segment)
+                  for position, segment in enumerate(self.segments)
+                  for index, block in enumerate(segment.blocks)
+                  if block[1] >= start_ms and block[0] <= end_ms]
+        heapq.heapify(blocks)
+        kept = []
+        while blocks:
+            newest, _, index, segment = heapq.heappop(blocks)
+            if len(kept) >= limit and -newest < kept[0][0][0]:
+                break
+            start = index * INDEX_STRIDE
+            for record in segment.read(start, min(start + INDEX_STRIDE, segment.count)):
+                if not start_ms <= record[1] <= end_ms or (keep is not None and not keep(record)):
+                    continue
+                entry = ((record[1], record[0]), record)
+                if len(kept) < limit:
+                    heapq.heappush(kept, entry)
+                elif entry[0] > kept[0][0]:
+                    heapq.heapreplace(kept, entry)
+        return [record for _, record in kept]
+
+    def close(self):
+        self.sync()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+
+class SegmentLogBackend(ReadingsBackend):
+    """Append-only per-mode segment logs with a sparse time index."""
+
+    name = 'segment_log'
+
+    def __init__(self, directory, fsync_batch=1000, fsync_interval=0.05):
+        self.directory = directory
+        self.fsync_batch = fsync_batch
+        self.fsync_interval = fsync_interval
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+        self.logs = {}
+        self.next_id = 1
+        # Taken on database worker threads and the sync thread alike
+        self.lock = original('threading').Lock()
+        self.sync_wanted = original('threading').Event()
+        self.closed = False
+
+        os.makedirs(directory, exist_ok=True)
+        for name in os.listdir(directory):
+            if name.startswith('mode_'):
+                self.open_log(int(name[5:]))
+        for log in self.logs.values():
+            if log.segments and log.segments[-1].last_id is not None:
+                self.next_id = max(self.next_id, log.segments[-1].last_id + 1)
+
+        original('threading').Thread(target=self.sync_periodically, daemon=True).start()
+
+    def sync_periodically(self):
+        """Fsync appends that no later append picked up within fsync_interval."""
+        while True:
+            self.sync_wanted.wait()
+            original('time').sleep(self.fsync_interval)
+            with self.lock:
+                if self.closed:
+                    return
+                self.sync_wanted.clear()
+                if self.unsynced:
+                    self.sync_logs()
+
+    def open_log(self, mode_id):
+        """Return the log of a mode, opening it on first use."""
+        log = self.logs.get(mode_id)
+        if log is None:
+            log = self.logs[mode_id] = ModeLog(os.path.join(self.directory, f'mode_{mode_id}'))
+        return log
+
+    def append(self, rows):
+        stored = []
+        by_mode = {}
+        for mode_id, epoch_ms, value in rows:
+            record = (self.next_id, epoch_ms, value)
+            self.next_id += 1
+            by_mode.setdefault(mode_id, []).append(record)
+            stored.append((record[0], mode_id, epoch_ms, value))
+
+        with self.lock:
+            for mode_id, records in by_mode.items():
+                self.open_log(mode_id).append(records)
+
+            self.unsynced += len(stored)
+            if (self.unsynced >= self.fsync_batch
+                    or time.monotonic() - self.last_sync >= self.fsync_interval):
+                self.sync_logs()
+            else:
+                self.sync_wanted.set()
+        return stored
+
+    def recent(self, mode_id, limit):
+        log = self.logs.get(mode_id)
+        if log is None:
+            return []
+        records = sorted(log.recent(limit), key=lambda record: (record[1], record[0]), reverse=True)
+        return [(reading_id, mode_id, epoch_ms, value) for reading_id, epoch_ms, value in records]
+
+    def scan(self, mode_id=None, start_ms=None, end_ms=None):
+        start_ms = -(1 << 63) if start_ms is None else start_ms
+        end_ms = (1 << 63) - 1 if end_ms is None else end_ms
+        mode_ids = [mode_id] if mode_id is not None else sorted(self.logs)
+        for log_mode_id in mode_ids:
+            log = self.logs.get(log_mode_id)
+            if log is None:
+                continue
+            for segment in log.segments:
+                for reading_id, epoch_ms, value in segment.scan(start_ms, end_ms):
+                    yield reading_id, log_mode_id, epoch_ms, value
+
+    def page(self, mode_id=None, start_ms=None, end_ms=None, min_value=None,
+             max_value=None, limit=100, offset=0):
+        def keep(record):
+            return (min_value is None or record[2] >= min_value) and \
+                (max_value is None or record[2] <= max_value)
+
+        mode_ids = [mode_id] if mode_id is not None else sorted(self.logs)
+        records = []
+        for log_mode_id in mode_ids:
+            log = self.logs.get(log_mode_id)
+            if log is None:
+                continue
+            records.extend((reading_id, log_mode_id, epoch_ms, value) for reading_id, epoch_ms, value
+                           in log.recent(offset + limit, start_ms, end_ms, keep))
+        records.sort(key=lambda record: (record[2], record[0]), reverse=True)
+        return records[offset:offset + limit]
+
+    def max_ids(self):
+        return {mode_id: log.segments[-1].last_id for mode_id, log in self.logs.items()
+                if log.segments and log.segments[-1].last_id is not None}
+
+    def reserve_ids(self, last_id):
+        self.next_id = max(self.next_id, last_id + 1)
+
+    def flush(self):
+        with self.lock:
+            self.sync_logs()
+
+    def sync_logs(self):
+        """fsync every log; called with the lock held."""
+        for log in self.logs.values():
+            log.sync()
+        self.unsynced = 0
+        self.last_sync = time.monotonic()
+
+    def close(self):
+        with self.lock:
+            for log in self.logs.values():
+                log.close()
+            self.unsynced = 0
+            self.closed = True
+        self.sync_wanted.set()
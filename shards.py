@@ -0,0 +1,273 @@
+"""
+Sharded SQLite storage engine for readings.
+
+Readings are spread over several SQLite files, one per mode or one per hash
+group of modes (mode_id % shards), under `<database>.shards/`. Each shard has
+its own connection and writer lock, so writes to different shards run in
+parallel on the database thread pool instead of queueing behind the single
+app.db writer. Reading ids stay globally unique: they are handed out by the
+engine from one in-process counter.
+
+Cross-shard reads (latest readings, statistics, scans) run one query per
+shard on native threads and merge the results.
+"""
+
+import heapq
+import itertools
+import os
+import sqlite3
+
+from eventlet.patcher import original
+
+from storage import ReadingsBackend
+
+threading = original('threading')
+
+
+def fan_out(fn, items):
+    """
+    Call fn on every item in parallel on native threads.
+
+    Returns:
+        List of the results in item order
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [fn(item) for item in items]
+
+    results = [None] * len(items)
+    errors = []
+
+    def run(index):
+        try:
+            results[index] = fn(items[index])
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(index,), daemon=True)
+               for index in range(1, len(items))]
+    for thread in threads:
+        thread.start()
+    run(0)
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+class Shard:
+    """One shard database file with its own connection and writer lock."""
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS readings (
+                id INTEGER PRIMARY KEY,
+                mode_id INTEGER NOT NULL,
+                epoch_ms INTEGER NOT NULL,
+                value REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_shard_readings_mode_time
+            ON readings(mode_id, epoch_ms)
+        ''')
+        self.conn.commit()
+
+    def execute(self, query, params=()):
+        """Run a read query and return all rows."""
+        with self.lock:
+            return self.conn.execute(query, params).fetchall()
+
+    def insert(self, records):
+        """Insert (id, mode_id, epoch_ms, value) records in one transaction."""
+        with self.lock:
+            with self.conn:
+                self.conn.executemany(
+                    'INSERT INTO readings (id, mode_id, epoch_ms, value) VALUES (?, ?, ?, ?)',
+                    records
+                )
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def range_filter(mode_id=None, start_ms=None, end_ms=None, min_value=None, max_value=None):
+    """Build the WHERE clause shared by shard scans and aggregates."""
+    clauses = []
+    params = []
+    for sql, value in (('mode_id = ?', mode_id), ('epoch_ms >= ?', start_ms),
+                       ('epoch_ms <= ?', end_ms), ('value >= ?', min_value),
+                       ('value <= ?', max_value)):
+        if value is not None:
+            clauses.append(sql)
+            params.append(value)
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), params
+
+
+class ShardedSqliteBackend(ReadingsBackend):
+    """Readings spread over per-mode (or per hash group) SQLite files."""
+
+    name = 'sharded_sqlite'
+    thread_safe = True
+
+    def __init__(self, directory, shards=0):
+        """
+        Args:
+            directory: Directory holding the shard files
+            shards: Number of hash groups, or 0 for one shard per mode
+        """
+        self.directory = directory
+        self.shard_count = shards
+        self.shards = {}
+        self.shards_lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        for name in sorted(os.listdir(directory)):
+            if name.startswith('shard_') and name.endswith('.db'):
+                key = int(name[6:-3])
+                self.shards[key] = Shard(os.path.join(directory, name))
+
+        last_id = max([max(ids.values()) for ids in fan_out(self.shard_max_ids, self.shards.values())
+                       if ids] or [0])
+        self.ids = itertools.count(last_id + 1)
+
+    def shard_key(self, mode_id):
+        return mode_id % self.shard_count if self.shard_count else mode_id
+
+    def shard_for(self, mode_id, create=False):
+        """Return the shard holding a mode, opening it on first write."""
+        key = self.shard_key(mode_id)
+        shard = self.shards.get(key)
+        if shard is None and create:
+            with self.shards_lock:
+                shard = self.shards.get(key)
+                if shard is None:
+                    shard = Shard(os.path.join(self.directory, f'shard_{key}.db'))
+                    self.shards[key] = shard
+        return shard
+
+    def append(self, rows):
+        stored = []
+        by_shard = {}
+        for mode_id, epoch_ms, value in rows:
+            record = (next(self.ids), mode_id, epoch_ms, value)
+            by_shard.setdefault(self.shard_for(mode_id, create=True), []).append(record)
+            stored.append(record)
+
+        fan_out(lambda item: item[0].insert(item[1]), by_shard.items())
+        return stored
+
+    def recent(self, mode_id, limit):
+        shard = self.shard_for(mode_id)
+        if shard is None:
+            return []
+        return shard.execute('''
+            SELECT id, mode_id, epoch_ms, value FROM readings
+            WHERE mode_id = ?
+            ORDER BY epoch_ms DESC, id DESC
+            LIMIT ?
+        ''', (mode_id, limit))
+
+    def latest(self, mode_ids, limit):
+        def query(shard):
+            return shard.execute('''
+                SELECT id, mode_id, epoch_ms, value FROM readings
+                ORDER BY epoch_ms DESC, id DESC
+                LIMIT ?
+            ''', (limit,))
+
+        mode_ids = set(mode_ids)
+        merged = heapq.merge(*fan_out(query, list(self.shards.values())),
+                             key=lambda record: (record[2], record[0]), reverse=True)
+        return list(itertools.islice(
+            (record for record in merged if record[1] in mode_ids), limit
+        ))
+
+    def scan(self, mode_id=None, start_ms=None, end_ms=None):
+        where_sql, params = range_filter(mode_id, start_ms, end_ms)
+        if mode_id is not None:
+            shard = self.shard_for(mode_id)
+            shards = [shard] if shard is not None else []
+        else:
+            shards = list(self.shards.values())
+        results = fan_out(
+            lambda shard: shard.execute(
+                f'SELECT id, mode_id, epoch_ms, value FROM readings{where_sql}', params
+            ),
+            shards
+        )
+        return [record for records in results for record in records]
+
+    def page(self, mode_id=None, start_ms=None, end_ms=None, min_value=None,
+             max_value=None, limit=100, offset=0):
+        where_sql, params = range_filter(mode_id, start_ms, end_ms, min_value, max_value)
+        if mode_id is not None:
+            shard = self.shard_for(mode_id)
+            shards = [shard] if shard is not None else []
+        else:
+            shards = list(self.shards.values())
+        # Every shard returns its own first offset + limit rows; the page is
+        # cut from their merge
+        results = fan_out(
+            lambda shard: shard.execute(f'''
+                SELECT id, mode_id, epoch_ms, value FROM readings{where_sql}
+                ORDER BY epoch_ms DESC, id DESC
+                LIMIT ?
+            ''', params + [offset + limit]),
+            shards
+        )
+        merged = heapq.merge(*results, key=lambda record: (record[2], record[0]), reverse=True)
+        return list(itertools.islice(merged, offset, offset + limit))
+
+    def statistics(self, mode_id=None, start_ms=None, end_ms=None,
+                   min_value=None, max_value=None):
+        where_sql, params = range_filter(mode_id, start_ms, end_ms, min_value, max_value)
+
+        def query(shard):
+            return shard.execute(f'''
+                SELECT mode_id, COUNT(*), SUM(value), MIN(value), MAX(value),
+                       MIN(epoch_ms), MAX(epoch_ms)
+                FROM readings{where_sql}
+                GROUP BY mode_id
+            ''', params)
+
+        merged = {}
+        for rows in fan_out(query, list(self.shards.values())):
+            for row_mode_id, count, total, minimum, maximum, first_ms, last_ms in rows:
+                stats = merged.get(row_mode_id)
+                if stats is None:
+                    merged[row_mode_id] = [count, total, minimum, maximum, first_ms, last_ms]
+                else:
+                    stats[0] += count
+                    stats[1] += total
+                    stats[2] = min(stats[2], minimum)
+                    stats[3] = max(stats[3], maximum)
+                    stats[4] = min(stats[4], first_ms)
+                    stats[5] = max(stats[5], last_ms)
+        return {key: tuple(stats) for key, stats in merged.items()}
+
+    def shard_max_ids(self, shard):
+        return dict(shard.execute('SELECT mode_id, MAX(id) FROM readings GROUP BY mode_id'))
+
+    def max_ids(self):
+        merged = {}
+        for ids in fan_out(self.shard_max_ids, list(self.shards.values())):
+            merged.update(ids)
+        return merged
+
+    def reserve_ids(self, last_id):
+        with self.shards_lock:
+            first_id = next(self.ids)
+            self.ids = itertools.count(max(first_id, last_id + 1))
+
+    def close(self):
+        for shard in self.shards.values():
+            shard.close()
+        self.shards = {}
@@ -16,6 +16,13 @@ class DashboardController {
         this.voltageDebounceTimer = null;
         this.voltageDebounceDelay = 500; // 500ms debounce
         
+        // Position in the mode's sequence-numbered stream, for gap-free resume
+        this.stream = null;
+        this.lastSeq = 0;
+        this.lastId = null;
+        this.awaitingConfirmation = false;
+        this.pendingEvents = [];
+        
         // Chart-related properties
         this.chart = null;
         this.chartPaused = false;
@@ -107,20 +114,43 @@ class DashboardController {
         // Subscription events
         this.socket.on('subscription_confirmed', (data) => {
             console.log('Subscription confirmed:', data);
-            this.showFeedback('Subscribed to ' + data.mode_name, 'success');
+            if (data.mode_id === this.modeId) {
+                this.handleSubscriptionConfirmed(data);
+            }
         });
         
-        // Data events
+        // Data events (held back until the subscription is confirmed)
         this.socket.on('data_update', (data) => {
             if (data.mode_id === this.modeId) {
-                this.handleDataUpdate(data);
+                this.queueOrRun(() => {
+                    if (this.isNewReading(data.seq, data.id)) {
+                        this.handleDataUpdate(data);
+                    }
+                });
+            }
+        });
+        
+        // Bulk-ingested readings arrive as one columnar batch per mode
+        this.socket.on('readings_batch', (batch) => {
+            if (batch.mode_id === this.modeId) {
+                this.queueOrRun(() => this.handleReadingsBatch(batch));
             }
         });
         
-        // Mode status events
+        // Mode status events (listing every mode the toggle changed)
         this.socket.on('mode_changed', (data) => {
-            if (data.mode_id === this.modeId) {
-                this.handleModeChanged(data);
+            const change = data.modes.find((mode) => mode.mode_id === this.modeId);
+            if (change) {
+                this.handleModeChanged(change);
+            }
+        });
+        
+        // Bulk changes of several modes (state and voltage of each)
+        this.socket.on('modes_changed', (data) => {
+            const change = data.modes.find((mode) => mode.mode_id === this.modeId);
+            if (change) {
+                this.handleModeChanged(change);
+                this.handleVoltageChanged(change);
             }
         });
         
@@ -142,7 +172,104 @@ class DashboardController {
      * Subscribe to mode updates
      */
     subscribeToMode() {
-        this.socket.emit('subscribe_mode', { mode_id: this.modeId });
+        this.awaitingConfirmation = true;
+        if (this.stream !== null) {
+            // Resubscribing: ask for the readings missed while disconnected
+            this.socket.emit('subscribe_mode', {
+                mode_id: this.modeId,
+                since: this.lastSeq,
+                since_id: this.lastId,
+                stream: this.stream
+            });
+            return;
+        }
+        // Ask for the chart window's worth of recent readings with the confirmation
+        this.socket.emit('subscribe_mode', {
+            mode_id: this.modeId,
+            history_seconds: this.timeWindow
+        });
+    }
+
+    /**
+     * Apply the history or replay of a subscription, then the live events
+     * that arrived while waiting for it
+     */
+    handleSubscriptionConfirmed(data) {
+        const replay = data.replay;
+        if (replay && !replay.complete) {
+            // Too much was missed to replay: start over from recent history
+            this.stream = null;
+            this.subscribeToMode();
+            return;
+        }
+        
+        if (data.stream !== this.stream) {
+            // New subscription or server restart: sequence numbers start over
+            this.stream = data.stream;
+            this.lastSeq = 0;
+        }
+        if (replay && replay.count > 0) {
+            this.handleReadingsBatch(Object.assign({ mode_id: data.mode_id }, replay));
+        }
+        if (data.history) {
+            this.loadHistory(data.history);
+        }
+        this.lastSeq = Math.max(this.lastSeq, data.seq);
+        
+        this.awaitingConfirmation = false;
+        const pending = this.pendingEvents;
+        this.pendingEvents = [];
+        pending.forEach(run => run());
+        
+        if (!replay) {
+            this.showFeedback('Subscribed to ' + data.mode_name, 'success');
+        }
+    }
+
+    /**
+     * Run a live event handler now, or after the pending subscription is confirmed
+     */
+    queueOrRun(run) {
+        if (this.awaitingConfirmation) {
+            this.pendingEvents.push(run);
+        } else {
+            run();
+        }
+    }
+
+    /**
+     * Track the stream position; false for readings already seen
+     */
+    isNewReading(seq, id) {
+        if (seq !== null && seq !== undefined) {
+            if (seq <= this.lastSeq) return false;
+            this.lastSeq = seq;
+        }
+        if (id !== null && id !== undefined && (this.lastId === null || id > this.lastId)) {
+            this.lastId = id;
+        }
+        return true;
+    }
+
+    /**
+     * Fill the chart with the recent history sent with subscription_confirmed
+     */
+    loadHistory(history) {
+        if (!this.chart || !ChartHandler || history.count === 0) return;
+
+        // Stored timestamps are UTC without a zone suffix
+        const toISO = (timestamp) => timestamp.replace(' ', 'T') + 'Z';
+        ChartHandler.clearChartData(this.chart);
+        for (let i = 0; i < history.count; i++) {
+            const timestamp = new Date(toISO(history.timestamps[i])).getTime();
+            ChartHandler.addDataPoint(this.chart, 0, timestamp, history.values[i]);
+        }
+        ChartHandler.updateChart(this.chart, this.timeWindow);
+
+        this.dataCount = history.count;
+        if (this.elements.dataPoints) {
+            this.elements.dataPoints.textContent = this.dataCount;
+        }
     }
 
     /**
@@ -199,6 +326,28 @@ class DashboardController {
     handleConnection() {
         this.isConnected = true;
         this.updateConnectionStatus(true);
+        this.syncModeState();
+    }
+
+    /**
+     * Re-sync mode status and voltage missed while disconnected.
+     * Uses a conditional GET, so an unchanged mode costs a 304.
+     */
+    async syncModeState() {
+        try {
+            const mode = await fetchJSON(`/api/modes/${this.modeId}`);
+            if (!mode || mode.id !== this.modeId) return;
+
+            this.handleModeChanged({ mode_id: mode.id, is_active: !!mode.is_active });
+            if (mode.voltage !== null && mode.voltage !== undefined) {
+                if (this.elements.voltageSlider) {
+                    this.elements.voltageSlider.value = mode.voltage;
+                }
+                this.updateVoltageDisplay(mode.voltage);
+            }
+        } catch (error) {
+            console.error('Error syncing mode state:', error);
+        }
     }
 
     /**
@@ -286,6 +435,49 @@ class DashboardController {
         }
     }
 
+    /**
+     * Handle a batch of ingested readings; the newest one updates the display
+     */
+    handleReadingsBatch(batch) {
+        // Stored timestamps are UTC without a zone suffix
+        const toISO = (timestamp) => timestamp.replace(' ', 'T') + 'Z';
+        
+        // Skip readings already received (replays overlap live events)
+        const seqs = batch.seqs || [];
+        const fresh = [];
+        for (let i = 0; i < batch.count; i++) {
+            if (this.isNewReading(seqs[i], batch.ids[i])) {
+                fresh.push(i);
+            }
+        }
+        if (fresh.length === 0) return;
+        if (fresh.length < batch.count) {
+            batch = {
+                mode_id: batch.mode_id,
+                ids: fresh.map(i => batch.ids[i]),
+                timestamps: fresh.map(i => batch.timestamps[i]),
+                values: fresh.map(i => batch.values[i]),
+                count: fresh.length
+            };
+        }
+        const last = batch.count - 1;
+        
+        this.dataCount += last;
+        if (!this.chartPaused && this.chart && ChartHandler) {
+            for (let i = 0; i < last; i++) {
+                const timestamp = new Date(toISO(batch.timestamps[i])).getTime();
+                ChartHandler.addDataPoint(this.chart, 0, timestamp, batch.values[i]);
+            }
+        }
+        
+        this.handleDataUpdate({
+            id: batch.ids[last],
+            mode_id: batch.mode_id,
+            value: batch.values[last],
+            timestamp: toISO(batch.timestamps[last])
+        });
+    }
+
     /**
      * Calculate and update data rate
      */
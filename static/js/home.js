@@ -1,18 +1,42 @@
 const socket = io();
 
+const MODES_PAGE_SIZE = 48;
+const MODE_THEMES = {
+    'Temperature': 'Climate Monitoring',
+    'Humidity': 'Environmental Control',
+    'Pressure': 'Atmospheric Analysis',
+    'Light': 'Luminosity Tracking'
+};
+
+// Paging state of the mode listing; the first page is rendered by the server
+let nextAfter = null;
+let searchPrefix = '';
+let loadingModes = false;
+let modesRequest = 0;
+
 socket.on('connect', function() {
     console.log('Connected to server');
 });
 
 socket.on('mode_status_changed', function(data) {
     console.log('Mode status changed:', data);
-    updateModeCards(data.all_modes);
+    updateModeCards(data.modes.map(change => ({ id: change.mode_id, is_active: change.is_active })));
+    updateDashboardButton(data.active_total);
+});
+
+socket.on('modes_changed', function(data) {
+    console.log('Modes changed:', data);
+    updateModeCards(data.modes.map(change => ({ id: change.mode_id, is_active: change.is_active })));
+    updateDashboardButton(data.active_total);
 });
 
 function updateModeCards(modes) {
     modes.forEach(mode => {
         const card = document.querySelector(`.mode-selection-card[data-mode-id="${mode.id}"]`);
         const toggle = document.querySelector(`.mode-toggle[data-mode-id="${mode.id}"]`);
+        if (!card || !toggle) {
+            return;
+        }
         const statusElement = card.querySelector('.mode-card-status');
         const statusText = statusElement.querySelector('span:last-child');
         
@@ -28,52 +52,147 @@ function updateModeCards(modes) {
             statusText.textContent = 'Inactive';
         }
     });
+}
+
+function updateDashboardButton(activeTotal) {
+    // Only some modes are loaded, so the server counts the active ones
+    document.getElementById('viewDashboardBtn').disabled = activeTotal === 0;
+}
+
+function createModeCard(mode) {
+    const template = document.getElementById('modeCardTemplate');
+    const card = template.content.firstElementChild.cloneNode(true);
+    const toggle = card.querySelector('.mode-toggle');
+    const link = card.querySelector('.btn-mode-dashboard');
     
-    updateDashboardButton(modes);
+    card.dataset.modeId = mode.id;
+    toggle.dataset.modeId = mode.id;
+    card.querySelector('.mode-card-icon').textContent = mode.icon;
+    card.querySelector('.mode-card-title').textContent = mode.name;
+    card.querySelector('.mode-card-description').textContent = mode.description;
+    card.querySelector('.mode-card-theme').textContent = MODE_THEMES[mode.name] || 'Sensor Theme';
+    link.href = `/dashboard/${mode.id}`;
+    link.textContent = `View ${mode.name} Dashboard →`;
+    
+    if (mode.is_active) {
+        card.classList.add('active');
+        toggle.checked = true;
+        card.querySelector('.mode-card-status').classList.add('active');
+        card.querySelector('.mode-card-status span:last-child').textContent = 'Active';
+    }
+    return card;
 }
 
-function updateDashboardButton(modes) {
-    const viewDashboardBtn = document.getElementById('viewDashboardBtn');
-    const hasActiveMode = modes.some(mode => mode.is_active);
+async function loadModes(reset) {
+    // A new search replaces a page still loading; further pages wait for it
+    if (!reset && (loadingModes || nextAfter === null)) {
+        return;
+    }
+    const request = ++modesRequest;
+    loadingModes = true;
+    
+    const params = new URLSearchParams({
+        after: reset ? 0 : nextAfter,
+        limit: MODES_PAGE_SIZE
+    });
+    if (searchPrefix) {
+        params.set('q', searchPrefix);
+    }
+    
+    try {
+        const response = await fetch(`/api/modes?${params}`);
+        if (!response.ok) {
+            throw new Error('Failed to load modes');
+        }
+        const page = await response.json();
+        if (request !== modesRequest) {
+            return;
+        }
+        const grid = document.getElementById('modeCardsGrid');
+        if (reset) {
+            grid.replaceChildren();
+        }
+        page.modes.forEach(mode => grid.appendChild(createModeCard(mode)));
+        
+        nextAfter = page.next_after;
+        document.getElementById('loadMoreModes').hidden = nextAfter === null;
+        document.getElementById('modeCount').textContent = `${page.total} modes`;
+    } catch (error) {
+        console.error('Error loading modes:', error);
+    } finally {
+        if (request === modesRequest) {
+            loadingModes = false;
+        }
+    }
+}
+
+async function toggleMode(toggle) {
+    const modeId = toggle.dataset.modeId;
+    const isChecked = toggle.checked;
     
-    if (hasActiveMode) {
-        viewDashboardBtn.disabled = false;
-    } else {
-        viewDashboardBtn.disabled = true;
+    try {
+        const response = await fetch(`/api/modes/${modeId}/toggle`, {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json'
+            },
+            body: JSON.stringify({
+                enforce_single_active: true
+            })
+        });
+        
+        if (!response.ok) {
+            throw new Error('Failed to toggle mode');
+        }
+        
+        const data = await response.json();
+        console.log('Mode toggled successfully:', data);
+        
+    } catch (error) {
+        console.error('Error toggling mode:', error);
+        toggle.checked = !isChecked;
     }
 }
 
 document.addEventListener('DOMContentLoaded', function() {
-    const toggles = document.querySelectorAll('.mode-toggle');
+    const grid = document.getElementById('modeCardsGrid');
+    const nextAfterValue = grid.dataset.nextAfter;
+    nextAfter = nextAfterValue === '' ? null : Number(nextAfterValue);
+    
+    // Delegated, so lazily loaded cards need no listeners of their own
+    grid.addEventListener('change', function(e) {
+        if (e.target.classList.contains('mode-toggle')) {
+            toggleMode(e.target);
+        }
+    });
     
-    toggles.forEach(toggle => {
-        toggle.addEventListener('change', async function(e) {
-            const modeId = this.dataset.modeId;
-            const isChecked = this.checked;
-            
-            try {
-                const response = await fetch(`/api/modes/${modeId}/toggle`, {
-                    method: 'POST',
-                    headers: {
-                        'Content-Type': 'application/json'
-                    },
-                    body: JSON.stringify({
-                        enforce_single_active: true
-                    })
-                });
-                
-                if (!response.ok) {
-                    throw new Error('Failed to toggle mode');
-                }
-                
-                const data = await response.json();
-                console.log('Mode toggled successfully:', data);
-                
-            } catch (error) {
-                console.error('Error toggling mode:', error);
-                this.checked = !isChecked;
+    grid.addEventListener('click', function(e) {
+        const card = e.target.closest('.mode-selection-card');
+        if (card && !e.target.closest('.toggle-switch') && !e.target.closest('.btn-mode-dashboard')) {
+            const toggle = card.querySelector('.mode-toggle');
+            if (toggle && !toggle.disabled) {
+                toggle.click();
             }
-        });
+        }
+    });
+    
+    const loadMoreBtn = document.getElementById('loadMoreModes');
+    loadMoreBtn.addEventListener('click', () => loadModes(false));
+    if ('IntersectionObserver' in window) {
+        new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadModes(false);
+            }
+        }).observe(loadMoreBtn);
+    }
+    
+    let searchTimer = null;
+    document.getElementById('modeSearch').addEventListener('input', function() {
+        clearTimeout(searchTimer);
+        searchTimer = setTimeout(() => {
+            searchPrefix = this.value.trim();
+            loadModes(true);
+        }, 250);
     });
     
     const viewDashboardBtn = document.getElementById('viewDashboardBtn');
@@ -84,16 +203,4 @@ document.addEventListener('DOMContentLoaded', function() {
             }
         });
     }
-    
-    const modeCards = document.querySelectorAll('.mode-selection-card');
-    modeCards.forEach(card => {
-        card.addEventListener('click', function(e) {
-            if (!e.target.closest('.toggle-switch')) {
-                const toggle = this.querySelector('.mode-toggle');
-                if (toggle && !toggle.disabled) {
-                    toggle.click();
-                }
-            }
-        });
-    });
 });
@@ -10,3 +10,30 @@ document.addEventListener('DOMContentLoaded', function() {
         }
     });
 });
+
+const etagCache = new Map();
+
+/**
+ * Fetch JSON from a read endpoint using conditional GET.
+ * Remembers the ETag and body per URL; a 304 reply reuses the cached body.
+ */
+async function fetchJSON(url) {
+    const cached = etagCache.get(url);
+    const headers = cached ? { 'If-None-Match': cached.etag } : {};
+    const response = await fetch(url, { headers, cache: 'no-store' });
+
+    if (response.status === 304 && cached) {
+        return cached.data;
+    }
+
+    const data = await response.json();
+    if (!response.ok) {
+        throw new Error(data.error || `Request failed with status ${response.status}`);
+    }
+
+    const etag = response.headers.get('ETag');
+    if (etag) {
+        etagCache.set(url, { etag, data });
+    }
+    return data;
+}
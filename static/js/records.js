@@ -43,14 +43,7 @@ async function loadRecords() {
     try {
         currentFilters = getFilters();
         const queryString = new URLSearchParams(currentFilters).toString();
-        const response = await fetch(`/api/records?${queryString}`);
-        
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.error || 'Failed to load records');
-        }
-
-        const data = await response.json();
+        const data = await fetchJSON(`/api/records?${queryString}`);
         loadingMessage.style.display = 'none';
 
         const isAggregated = currentFilters.aggregation && currentFilters.aggregation !== 'raw';
@@ -160,6 +153,33 @@ function updatePagination(count) {
         : `Page ${currentPage}`;
 }
 
+async function loadModeOptions(prefix) {
+    // Only a page of modes is rendered, so options for others come from a search
+    const select = document.getElementById('modeFilter');
+    const selected = select.value;
+    const params = new URLSearchParams({ limit: 100 });
+    if (prefix) params.set('q', prefix);
+
+    try {
+        const response = await fetch(`/api/modes?${params}`);
+        if (!response.ok) throw new Error('Failed to load modes');
+        const page = await response.json();
+
+        const options = [new Option('All Modes', '')];
+        page.modes.forEach(mode => {
+            options.push(new Option(`${mode.icon} ${mode.name}`, mode.id));
+        });
+        const keep = Array.from(select.options).find(option => option.value === selected);
+        if (selected && !page.modes.some(mode => String(mode.id) === selected) && keep) {
+            options.push(keep);
+        }
+        select.replaceChildren(...options);
+        select.value = selected;
+    } catch (error) {
+        console.error('Error loading modes:', error);
+    }
+}
+
 function applyFilters() {
     currentPage = 1;
     loadRecords();
@@ -217,14 +237,7 @@ async function loadStatistics() {
 
     try {
         const queryString = new URLSearchParams(filters).toString();
-        const response = await fetch(`/api/statistics?${queryString}`);
-        
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.error || 'Failed to load statistics');
-        }
-
-        const data = await response.json();
+        const data = await fetchJSON(`/api/statistics?${queryString}`);
         const statsSection = document.getElementById('statisticsSection');
         const statsContent = document.getElementById('statsContent');
 
@@ -284,32 +297,24 @@ async function loadChart() {
     const chartCanvas = document.getElementById('recordsChart');
     
     const filters = getFilters();
-    delete filters.limit;
-    delete filters.offset;
-    
-    if (!filters.aggregation || filters.aggregation === 'raw') {
-        filters.aggregation = '5min';
-    }
-    
-    filters.limit = 500;
+    const params = {
+        width: Math.max(100, Math.round(chartCanvas.parentElement.clientWidth || 800)),
+        method: 'm4'
+    };
+    if (filters.mode_id) params.mode_id = filters.mode_id;
+    if (filters.start_time) params.start_time = filters.start_time;
+    if (filters.end_time) params.end_time = filters.end_time;
     
     try {
-        const queryString = new URLSearchParams(filters).toString();
-        const response = await fetch(`/api/records?${queryString}`);
-        
-        if (!response.ok) {
-            const error = await response.json();
-            throw new Error(error.error || 'Failed to load chart data');
-        }
-
-        const data = await response.json();
+        const queryString = new URLSearchParams(params).toString();
+        const data = await fetchJSON(`/api/chart-series?${queryString}`);
         
-        if (data.records.length === 0) {
+        if (data.series.length === 0) {
             chartSection.style.display = 'none';
             return;
         }
 
-        renderChart(data.records);
+        renderChart(data.series);
         chartSection.style.display = 'block';
     } catch (error) {
         console.error('Error loading chart:', error);
@@ -317,7 +322,7 @@ async function loadChart() {
     }
 }
 
-function renderChart(records) {
+function renderChart(series) {
     const chartCanvas = document.getElementById('recordsChart');
     const ctx = chartCanvas.getContext('2d');
     
@@ -325,22 +330,6 @@ function renderChart(records) {
         recordsChart.destroy();
     }
     
-    const groupedByMode = records.reduce((acc, record) => {
-        const modeKey = `${record.mode_id}_${record.mode_name}`;
-        if (!acc[modeKey]) {
-            acc[modeKey] = {
-                mode_name: record.mode_name,
-                icon: record.icon,
-                data: []
-            };
-        }
-        acc[modeKey].data.push({
-            x: new Date(record.timestamp),
-            y: record.value
-        });
-        return acc;
-    }, {});
-    
     const colors = [
         { bg: 'rgba(52, 152, 219, 0.2)', border: 'rgba(52, 152, 219, 1)' },
         { bg: 'rgba(46, 204, 113, 0.2)', border: 'rgba(46, 204, 113, 1)' },
@@ -350,17 +339,21 @@ function renderChart(records) {
         { bg: 'rgba(52, 73, 94, 0.2)', border: 'rgba(52, 73, 94, 1)' }
     ];
     
-    const datasets = Object.values(groupedByMode).map((mode, index) => {
+    const datasets = series.map((mode, index) => {
         const colorSet = colors[index % colors.length];
+        const dense = mode.count > 200;
         return {
             label: `${mode.icon} ${mode.mode_name}`,
-            data: mode.data,
+            data: mode.timestamps.map((timestamp, i) => ({
+                x: new Date(timestamp),
+                y: mode.values[i]
+            })),
             borderColor: colorSet.border,
             backgroundColor: colorSet.bg,
             borderWidth: 2,
-            tension: 0.3,
+            tension: dense ? 0 : 0.3,
             fill: true,
-            pointRadius: 3,
+            pointRadius: dense ? 0 : 3,
             pointHoverRadius: 5
         };
     });
@@ -545,4 +538,13 @@ document.addEventListener('DOMContentLoaded', function() {
     if (recordsPerPageSelect) {
         recordsPerPageSelect.addEventListener('change', changeRecordsPerPage);
     }
+    
+    const modeFilterSearch = document.getElementById('modeFilterSearch');
+    if (modeFilterSearch) {
+        let searchTimer = null;
+        modeFilterSearch.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => loadModeOptions(this.value.trim()), 250);
+        });
+    }
 });
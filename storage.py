@@ -0,0 +1,136 @@
+"""
+Pluggable storage engines for sensor readings.
+
+By default readings live in the SQLite readings table and database.py
+queries it directly. An alternative engine implements ReadingsBackend and is
+installed with database.use_readings_backend(); the reading functions in
+database.py then write to and read from it, while modes, mode_status and the
+other metadata stay in SQLite. Analytics queries load the rows a query needs
+from the engine into a temporary SQLite table, so their SQL is shared;
+paginated reads ask the engine for just the page (see ReadingsBackend.page).
+
+Readings cross this interface as (id, mode_id, epoch_ms, value) tuples.
+Engines that do their own locking set `thread_safe`; calls to the others
+are serialized under database.db_lock.
+"""
+
+import heapq
+import itertools
+
+
+class ReadingsBackend:
+    """Interface of a readings storage engine."""
+
+    name = None
+    thread_safe = False
+
+    def append(self, rows):
+        """
+        Store readings.
+
+        Args:
+            rows: List of (mode_id, epoch_ms, value) tuples
+
+        Returns:
+            List of stored (id, mode_id, epoch_ms, value) tuples
+        """
+        raise NotImplementedError
+
+    def recent(self, mode_id, limit):
+        """Return up to `limit` readings of a mode, newest first."""
+        raise NotImplementedError
+
+    def latest(self, mode_ids, limit):
+        """Return up to `limit` readings across the given modes, newest first."""
+        merged = heapq.merge(*[self.recent(mode_id, limit) for mode_id in mode_ids],
+                             key=lambda record: (record[2], record[0]), reverse=True)
+        return list(itertools.islice(merged, limit))
+
+    def scan(self, mode_id=None, start_ms=None, end_ms=None):
+        """Iterate over readings in a time range (bounds inclusive, None = open)."""
+        raise NotImplementedError
+
+    def page(self, mode_id=None, start_ms=None, end_ms=None, min_value=None,
+             max_value=None, limit=100, offset=0):
+        """
+        Return one page of the readings in a time and value range.
+
+        Readings are ordered newest first by (epoch_ms, id), the order the
+        records views use, so a query only has to load the rows it shows.
+
+        Returns:
+            List of up to `limit` (id, mode_id, epoch_ms, value) tuples,
+            skipping the first `offset`
+        """
+        records = (record for record in self.scan(mode_id, start_ms, end_ms)
+                   if (min_value is None or record[3] >= min_value)
+                   and (max_value is None or record[3] <= max_value))
+        return heapq.nlargest(offset + limit, records,
+                              key=lambda record: (record[2], record[0]))[offset:]
+
+    def statistics(self, mode_id=None, start_ms=None, end_ms=None,
+                   min_value=None, max_value=None):
+        """
+        Aggregate readings per mode.
+
+        Returns:
+            Dictionary mapping mode_id to a (count, sum, min, max,
+            first_epoch_ms, last_epoch_ms) tuple
+        """
+        stats = {}
+        for _, record_mode_id, epoch_ms, value in self.scan(mode_id, start_ms, end_ms):
+            if (min_value is not None and value < min_value) or \
+                    (max_value is not None and value > max_value):
+                continue
+            current = stats.get(record_mode_id)
+            if current is None:
+                stats[record_mode_id] = [1, value, value, value, epoch_ms, epoch_ms]
+            else:
+                current[0] += 1
+                current[1] += value
+                current[2] = min(current[2], value)
+                current[3] = max(current[3], value)
+                current[4] = min(current[4], epoch_ms)
+                current[5] = max(current[5], epoch_ms)
+        return {key: tuple(current) for key, current in stats.items()}
+
+    def max_ids(self):
+        """Return the highest reading id per mode."""
+        raise NotImplementedError
+
+    def reserve_ids(self, last_id):
+        """Make sure new readings get ids above `last_id`."""
+        raise NotImplementedError
+
+    def flush(self):
+        """Make all appended readings durable."""
+
+    def close(self):
+        """Flush and release resources."""
+        self.flush()
+
+
+def create_backend(name, path, shards=0):
+    """
+    Create a readings backend by name.
+
+    Args:
+        name: Engine name ('segment_log', 'sharded_sqlite' or 'memory')
+        path: Base path the engine may store its files under
+        shards: Number of shard files for 'sharded_sqlite' (0 = one per mode)
+
+    Returns:
+        A ReadingsBackend, or None for the built-in SQLite table
+    """
+    if name in (None, '', 'sqlite'):
+        return None
+    if name == 'segment_log':
+        from segment_log import SegmentLogBackend
+        return SegmentLogBackend(path + '.segments')
+    if name == 'sharded_sqlite':
+        from shards import ShardedSqliteBackend
+        return ShardedSqliteBackend(path + '.shards', shards=shards)
+    if name == 'memory':
+        from memory_backend import MemoryBackend
+        return MemoryBackend()
+    raise ValueError(f"Unknown readings backend: {name}")
@@ -0,0 +1,68 @@
+"""
+Who is subscribed to what, indexed both ways.
+
+Socket.IO handlers record each client's mode subscriptions here; the
+reverse index (mode -> subscribers) lets the emit path (emit_queue.py) find
+the clients of a mode room directly instead of asking the Socket.IO
+manager for the room's participants.
+"""
+
+ROOM_PREFIX = 'mode_'
+
+
+def room_mode_id(room):
+    """Mode id of a 'mode_<id>' room name, or None for other rooms."""
+    if room and room.startswith(ROOM_PREFIX) and room[len(ROOM_PREFIX):].isdigit():
+        return int(room[len(ROOM_PREFIX):])
+    return None
+
+
+class SubscriptionIndex:
+    """Client -> modes and mode -> clients maps kept in step."""
+
+    def __init__(self):
+        self.by_client = {}
+        self.by_mode = {}
+
+    def __contains__(self, sid):
+        return sid in self.by_client
+
+    def __len__(self):
+        return len(self.by_client)
+
+    def connect(self, sid):
+        """Start tracking a client with no subscriptions."""
+        self.by_client.setdefault(sid, set())
+
+    def disconnect(self, sid):
+        """Forget a client; returns the modes it was subscribed to."""
+        mode_ids = self.by_client.pop(sid, set())
+        for mode_id in mode_ids:
+            self.remove_subscriber(mode_id, sid)
+        return mode_ids
+
+    def add(self, sid, mode_id):
+        """Subscribe a client to a mode."""
+        self.by_client.setdefault(sid, set()).add(mode_id)
+        self.by_mode.setdefault(mode_id, set()).add(sid)
+
+    def discard(self, sid, mode_id):
+        """Unsubscribe a client from a mode, if it was subscribed."""
+        self.by_client.get(sid, set()).discard(mode_id)
+        self.remove_subscriber(mode_id, sid)
+
+    def remove_subscriber(self, mode_id, sid):
+        """Drop a client from a mode's subscribers (and the mode once it has none)."""
+        subscribers = self.by_mode.get(mode_id)
+        if subscribers is not None:
+            subscribers.discard(sid)
+            if not subscribers:
+                del self.by_mode[mode_id]
+
+    def modes(self, sid):
+        """Modes a client is subscribed to."""
+        return set(self.by_client.get(sid, ()))
+
+    def subscribers(self, mode_id):
+        """Clients subscribed to a mode."""
+        return set(self.by_mode.get(mode_id, ()))
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for continuous sliding-window aggregates
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import database
+import live_buffer
+from aggregates import RollingWindow, TumblingBuckets
+from app import app, socketio, continuous_queries, publish_aggregates
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    live_buffer.clear()
+
+
+def received(client, name):
+    """Payloads of the events called `name` a client has received."""
+    return [msg['args'][0] for msg in client.get_received() if msg['name'] == name]
+
+
+def test_rolling_window_matches_recompute():
+    """Incremental mean/min/max equal a full recompute over the window."""
+    print("Testing rolling window...")
+
+    rng = random.Random(7)
+    window = RollingWindow(10)
+    samples = []
+    t = 1000.0
+    for _ in range(2000):
+        t += rng.choice([0.1, 0.5, 1.0, 3.0])
+        value = rng.uniform(-50, 50)
+        window.add(t, value, arrived=t)
+        samples.append((t, value))
+        inside = [v for ts, v in samples if ts > t - 10]
+        snapshot = window.snapshot()
+        assert snapshot['count'] == len(inside)
+        assert snapshot['min'] == min(inside) and snapshot['max'] == max(inside)
+        assert abs(snapshot['mean'] - sum(inside) / len(inside)) < 1e-6
+
+    assert window.advance(t + 5)
+    assert window.snapshot()['count'] == len([ts for ts, _ in samples if ts > t - 5])
+    assert window.advance(t + 10) and window.snapshot()['count'] == 0, "Idle windows expire by the clock"
+    assert not window.advance(t + 20)
+
+    backfill = RollingWindow(10)
+    arrived = time.monotonic()
+    backfill.add(t - 3600, 1.0, arrived=arrived)
+    backfill.add(t - 3599, 2.0, arrived=arrived + 1)
+    assert not backfill.advance(arrived + 2) and backfill.snapshot()['count'] == 2, \
+        "Backfilled readings are not expired by their age"
+    assert backfill.advance(arrived + 10.5) and backfill.snapshot()['count'] == 1
+    assert backfill.advance(arrived + 11) and backfill.snapshot()['count'] == 0
+
+    print("✓ Rolling window is exact")
+
+
+def test_buckets():
+    """Buckets are aligned, closed in order and late samples are counted."""
+    print("Testing tumbling buckets...")
+
+    buckets = TumblingBuckets(60)
+    for t, value in [(120, 1.0), (150, 3.0), (179.9, 2.0), (185, 10.0), (100, 5.0), (300, 4.0)]:
+        buckets.add(t, value)
+
+    snapshot = buckets.snapshot(flush=True)
+    assert [bucket['start'] for bucket in snapshot['closed']] == ['1970-01-01 00:02:00', '1970-01-01 00:03:00']
+    assert snapshot['closed'][0] == {'start': '1970-01-01 00:02:00', 'count': 3, 'mean': 2.0,
+                                     'min': 1.0, 'max': 3.0}
+    assert snapshot['current']['start'] == '1970-01-01 00:05:00' and snapshot['late'] == 1
+    assert buckets.snapshot()['closed'] == []
+
+    print("✓ Buckets close in order")
+
+
+def test_shared_queries():
+    """Clients asking for the same query share one operator."""
+    print("Testing shared queries...")
+
+    now = time.time()
+    ingest_readings([(1, now - 5, 1.0), (1, now - 4, 2.0)])
+
+    first = socketio.test_client(app)
+    second = socketio.test_client(app)
+    first.emit('subscribe_aggregate', {'mode_id': 1, 'kind': 'rolling', 'seconds': 60})
+    second.emit('subscribe_aggregate', {'mode_id': 1, 'seconds': 60})
+    subscribed = received(first, 'aggregate_subscribed')[0]
+    assert subscribed['query'] == 'rolling:60:1'
+    assert subscribed['count'] == 2 and subscribed['mean'] == 1.5, "Seeded from the live log"
+    assert received(second, 'aggregate_subscribed')[0]['query'] == 'rolling:60:1'
+    assert continuous_queries.get_stats()['queries'] == 1
+    assert continuous_queries.get_stats()['subscriptions'] == 2
+
+    samples = continuous_queries.samples
+    ingest_readings([(1, now - 3, 6.0), (2, now, 100.0)])
+    database.add_reading(1, 3.0)
+    assert continuous_queries.samples == samples + 2, "Each reading is processed once"
+
+    publish_aggregates()
+    for client in (first, second):
+        update = received(client, 'aggregate_update')[-1]
+        assert update['count'] == 4 and update['mean'] == 3.0
+        assert update['min'] == 1.0 and update['max'] == 6.0
+    publish_aggregates()
+    assert received(first, 'aggregate_update') == [], "Unchanged queries are not pushed"
+    expired = dict(continuous_queries.collect(now=time.monotonic() + 120))
+    assert expired['rolling:60:1']['count'] == 0 and expired['rolling:60:1']['mean'] is None, \
+        "A mode that stops reporting publishes an empty window"
+
+    first.emit('subscribe_aggregate', {'mode_id': 1, 'kind': 'buckets', 'seconds': 60})
+    assert received(first, 'aggregate_subscribed')[0]['current']['count'] >= 1
+
+    first.emit('subscribe_aggregate', {'mode_id': 1, 'kind': 'median'})
+    assert 'kind must be one of' in received(first, 'error')[0]['error']
+    first.emit('subscribe_aggregate', {'mode_id': 99})
+    assert received(first, 'error')[0]['error'] == 'Mode 99 not found'
+
+    first.emit('unsubscribe_aggregate', {'query': 'rolling:60:1'})
+    assert received(first, 'aggregate_unsubscribed')[0] == {'query': 'rolling:60:1'}
+    first.disconnect()
+    second.disconnect()
+    assert continuous_queries.get_stats()['queries'] == 0, "Operators go away with their subscribers"
+
+    status = app.test_client().get('/api/diagnostics/event-loop').get_json()
+    assert status['continuous_queries']['subscriptions'] == 0
+
+    print("✓ Queries are computed once and shared")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Continuous Aggregate Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_rolling_window_matches_recompute()
+        test_buckets()
+        test_shared_queries()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Test script for the compressed columnar archive tier
+"""
+
+import math
+import os
+import random
+import shutil
+import sys
+import tempfile
+
+import archive
+import database
+from app import app
+from ingest import ingest_readings
+
+STATISTICS_QUERIES = [
+    {'mode_id': 2, 'start_time': '2023-11-14 12:00:00', 'end_time': '2023-11-15 12:00:00'},
+    {'start_time': '2023-11-14 00:00:00', 'end_time': '2023-11-15 23:59:59'},
+    {'min_value': 17, 'max_value': 23},
+    {'min_value': 21},
+]
+
+QUERIES = [
+    {},
+    {'mode_id': 1},
+    {'mode_id': 2, 'start_time': '2023-11-14 12:00:00', 'end_time': '2023-11-15 12:00:00'},
+    {'min_value': 20, 'max_value': 22, 'limit': 1000},
+    {'offset': 2000, 'limit': 50},
+]
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database with three days of readings."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+    rng = random.Random(3)
+    start = 1699920000.0  # 2023-11-14 00:00:00 UTC
+    rows = []
+    for i in range(3 * 24 * 60):
+        for mode_id in (1, 2):
+            value = round(20 + 2 * math.sin(i / 90) + rng.uniform(-0.1, 0.1), 2)
+            rows.append((mode_id, start + i * 60, value))
+    ingest_readings(rows)
+
+
+def teardown_module(module=None):
+    """Remove the archive directory."""
+    shutil.rmtree(database.archive_directory(), ignore_errors=True)
+
+
+def test_codecs_round_trip():
+    """Delta-of-delta and Gorilla encodings are lossless."""
+    print("Testing codecs...")
+
+    timestamps = [1700000000000 + i * 1000 for i in range(1000)]
+    timestamps[500] += 37
+    timestamps[700] += 10 ** 8
+    values = [20.5] * 10 + [random.uniform(-1e6, 1e6) for _ in range(500)] + [0.0, -0.0, 1e-300]
+
+    assert archive.decode_integers(archive.encode_integers(timestamps), 0, 1000) == timestamps
+    decoded = archive.decode_floats(archive.encode_floats(values), 0, len(values))
+    assert [math.copysign(1, v) for v in decoded] == [math.copysign(1, v) for v in values]
+    assert decoded == values
+
+    regular = archive.encode_integers([i * 1000 for i in range(1000)])
+    assert len(regular) < 140, "Regular timestamps should cost about one bit each"
+
+    print("✓ Codecs round-trip losslessly")
+
+
+def test_compaction_is_transparent():
+    """Queries return the same results before and after archiving."""
+    print("Testing transparent reads...")
+
+    before = {}
+    for index, query in enumerate(QUERIES):
+        before[index] = database.get_filtered_records(**dict({'limit': 100}, **query))
+    aggregated_before = database.get_filtered_records(aggregation='60min', limit=1000)
+    stats_before = database.get_statistics()
+    filtered_before = [database.get_statistics(**query) for query in STATISTICS_QUERIES]
+    series_before = database.get_chart_series(mode_id=1, width=200)
+
+    summary = database.compact_readings('2023-11-16')
+    assert summary['chunks'] == 4 and summary['readings'] == 4 * 1440
+    assert summary['bytes'] < summary['readings'] * 8, "Archive should be compact"
+    print(f"  archived {summary['readings']} readings in {summary['bytes']} bytes")
+
+    for index, query in enumerate(QUERIES):
+        after = database.get_filtered_records(**dict({'limit': 100}, **query))
+        assert after == before[index], f"Records differ for {query}"
+
+    aggregated_after = database.get_filtered_records(aggregation='60min', limit=1000)
+    assert (sorted((r['mode_id'], r['count'], r['min_value'], r['max_value']) for r in aggregated_after)
+            == sorted((r['mode_id'], r['count'], r['min_value'], r['max_value']) for r in aggregated_before))
+
+    stats_after = database.get_statistics()
+    for old, new in zip(stats_before, stats_after):
+        assert old['count'] == new['count']
+        assert abs(old['average'] - new['average']) < 1e-9
+        assert (old['minimum'], old['maximum']) == (new['minimum'], new['maximum'])
+        assert (old['first_reading'], old['last_reading']) == (new['first_reading'], new['last_reading'])
+
+    assert database.get_chart_series(mode_id=1, width=200) == series_before
+
+    for query, old in zip(STATISTICS_QUERIES, filtered_before):
+        new = database.get_statistics(**query)
+        if 'mode_id' in query:
+            old, new = [old], [new]
+        assert [row['count'] for row in new] == [row['count'] for row in old], f"Counts differ for {query}"
+        for old_row, new_row in zip(old, new):
+            assert abs(old_row['average'] - new_row['average']) < 1e-9
+            assert {key: old_row[key] for key in old_row if key != 'average'} == \
+                {key: new_row[key] for key in new_row if key != 'average'}, f"Statistics differ for {query}"
+
+    print("✓ Records, statistics and chart series read the archive transparently")
+
+
+def test_archive_reads_decode_little():
+    """Statistics use the chunk index; decoded chunks are cached and trimmed to the range."""
+    print("Testing archive read costs...")
+
+    decoded = []
+    read_chunk = archive.read_chunk
+
+    def counting_read_chunk(path):
+        decoded.append(os.path.basename(path))
+        return read_chunk(path)
+
+    database.archive_cache.clear()
+    database.archive_cache_state['readings'] = 0
+    archive.read_chunk = counting_read_chunk
+    try:
+        assert database.get_statistics(mode_id=1)['count'] == 3 * 1440
+        database.get_statistics(start_time='2023-11-14 00:00:00', end_time='2023-11-15 23:59:59')
+        assert decoded == [], "Whole chunks are summarized from the index"
+
+        database.get_statistics(mode_id=1, start_time='2023-11-14 06:00:00')
+        assert len(decoded) == 1, "Only the chunk cut by the range is decoded"
+
+        window = {'mode_id': 1, 'start_time': '2023-11-14 06:00:00', 'end_time': '2023-11-14 06:09:59'}
+        records = database.get_filtered_records(limit=100, **window)
+        assert len(records) == 10
+        assert database.get_filtered_records(limit=100, **window) == records
+        assert len(decoded) == 1, "Decoded chunks are cached"
+    finally:
+        archive.read_chunk = read_chunk
+
+    print("✓ Archive reads decode only what they need, once")
+
+
+def test_archive_endpoints():
+    """The archive summary and compaction endpoints work."""
+    print("Testing archive endpoints...")
+
+    client = app.test_client()
+    modes = client.get('/api/archive').get_json()['modes']
+    assert [m['readings'] for m in modes] == [2880, 2880]
+
+    response = client.post('/api/archive/compact', json={'before': '2023-11-17'})
+    assert response.status_code == 200
+    assert response.get_json()['readings'] == 2 * 1440
+
+    records = client.get('/api/records?mode_id=2&limit=5&export=1').get_json()
+    assert records['count'] == 5
+
+    assert client.post('/api/archive/compact', json={'before': 'yesterday'}).status_code == 400
+    assert client.post('/api/archive/compact', json={'older_than_days': 0}).status_code == 400
+
+    print("✓ Archive endpoints work")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Archive Tier Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_codecs_round_trip()
+        test_compaction_is_transparent()
+        test_archive_reads_decode_little()
+        test_archive_endpoints()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for the asyncio/ASGI serving mode
+"""
+
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+
+try:
+    import aiohttp
+    import uvicorn
+    import socketio
+    HAS_ASGI_DEPS = True
+except ImportError:
+    HAS_ASGI_DEPS = False
+
+import database
+
+
+def free_port():
+    """Pick an unused localhost port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def exercise_server():
+    """Start the ASGI app, then drive it over HTTP and Socket.IO."""
+    import asgi_app
+
+    # Lets the event stream below notice its client went away quickly
+    asgi_app.flask_app.config['FEED_KEEPALIVE'] = 1
+    port = free_port()
+    url = f'http://127.0.0.1:{port}'
+    server = uvicorn.Server(uvicorn.Config(asgi_app.asgi_app, host='127.0.0.1', port=port,
+                                           log_level='warning'))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            async with session.get(f'{url}/api/modes') as response:
+                assert response.status == 200
+                modes = await response.json()
+                assert len(modes) >= 4
+        print("✓ Flask routes are served through the ASGI adapter")
+
+        async with aiohttp.ClientSession() as session:
+            long_poll = asyncio.create_task(session.get(f'{url}/api/feed?mode_id=1&timeout=3'))
+            await asyncio.sleep(0.2)
+            started = asyncio.get_running_loop().time()
+            async with session.get(f'{url}/api/modes') as response:
+                assert response.status == 200
+            elapsed = asyncio.get_running_loop().time() - started
+            assert not long_poll.done() and elapsed < 1, \
+                f"A long-poll should not hold up other requests (took {elapsed:.2f}s)"
+            (await long_poll).release()
+
+            async with session.get(f'{url}/api/feed/stream?mode_id=1') as stream:
+                assert (await stream.content.readuntil(b'\n\n')).startswith(b'retry:')
+                async with session.get(f'{url}/api/modes') as response:
+                    assert response.status == 200, "Served while an event stream is open"
+                long_poll = asyncio.create_task(session.get(f'{url}/api/feed?mode_id=1&timeout=10'))
+                await asyncio.sleep(0.2)
+                started = asyncio.get_running_loop().time()
+                async with session.post(f'{url}/api/ingest', data='[1, null, 4.5]',
+                                        headers={'Content-Type': 'application/x-ndjson'}) as response:
+                    assert response.status == 201
+                event = await asyncio.wait_for(stream.content.readuntil(b'\n\n'), timeout=5)
+                assert b'event: readings' in event and b'4.5' in event
+                async with await long_poll as response:
+                    body = await response.json()
+                assert body['readings']['values'] == [4.5]
+                assert asyncio.get_running_loop().time() - started < 2, "Waiters wake on the write"
+        print("✓ Requests run in parallel on the HTTP thread pool")
+
+        client = socketio.AsyncClient(reconnection=False)
+        events = {'confirmed': asyncio.Event(), 'mode_changed': asyncio.Event()}
+        received = {}
+
+        @client.on('subscription_confirmed')
+        async def on_confirmed(data):
+            received['confirmed'] = data
+            events['confirmed'].set()
+
+        @client.on('mode_changed')
+        async def on_mode_changed(data):
+            received['mode_changed'] = data
+            events['mode_changed'].set()
+
+        await client.connect(url, transports=['websocket'])
+        await client.emit('subscribe_mode', {'mode_id': 1, 'policy': 'latest'})
+        await asyncio.wait_for(events['confirmed'].wait(), timeout=5)
+        assert received['confirmed']['mode_name'] == 'Temperature'
+        assert received['confirmed']['policy'] is None, "Policies only apply in eventlet mode"
+        print("✓ AsyncServer handles subscriptions")
+
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f'{url}/api/mode/toggle', json={'mode_id': 1}) as response:
+                assert response.status == 200
+        await asyncio.wait_for(events['mode_changed'].wait(), timeout=5)
+        assert received['mode_changed']['mode_id'] == 1
+        print("✓ Emits from Flask routes reach asyncio clients")
+
+        await client.disconnect()
+    finally:
+        server.should_exit = True
+        await serve_task
+
+
+def test_asgi_mode():
+    """The asyncio serving mode serves HTTP and Socket.IO."""
+    print("Testing asyncio serving mode...")
+
+    if not HAS_ASGI_DEPS:
+        print("  (skipped: uvicorn/aiohttp not installed)")
+        return
+    if 'app' in sys.modules and sys.modules['app'].SERVER_MODE != 'asyncio':
+        print("  (skipped: app already imported in eventlet mode)")
+        return
+
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+
+    asyncio.run(exercise_server())
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Asyncio Serving Mode Tests")
+    print("=" * 50)
+
+    try:
+        test_asgi_mode()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
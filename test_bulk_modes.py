@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Test script for the bulk mode control endpoint
+"""
+
+import os
+import sys
+import tempfile
+
+import database
+from app import app, socketio, voltage_writes, flush_voltages
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    voltage_writes.clear()
+
+
+def events(client, name):
+    """Payloads of the events called `name` a client has received."""
+    return [msg['args'][0] for msg in client.get_received() if msg['name'] == name]
+
+
+def test_bulk_changes():
+    """Many modes change in one request and one modes_changed event."""
+    print("Testing bulk mode changes...")
+
+    client = app.test_client()
+    watcher = socketio.test_client(app)
+    watcher.get_received()
+
+    response = client.post('/api/modes/bulk', json={'changes': [
+        {'mode_id': 1, 'is_active': True, 'voltage': 6.5},
+        {'mode_id': 2, 'is_active': True},
+        {'mode_id': 3, 'voltage': 2},
+    ]})
+    assert response.status_code == 200
+    states = response.get_json()['modes']
+    assert states == [
+        {'mode_id': 1, 'is_active': True, 'voltage': 6.5},
+        {'mode_id': 2, 'is_active': True, 'voltage': 5.0},
+        {'mode_id': 3, 'is_active': False, 'voltage': 2.0},
+    ]
+    received = watcher.get_received()
+    assert [msg['name'] for msg in received] == ['modes_changed'], "One combined event"
+    assert received[0]['args'][0]['modes'] == states
+    assert received[0]['args'][0]['active_total'] == 2
+    assert database.get_mode_by_id(1)['is_active'] and database.get_mode_voltage(3) == 2.0
+
+    response = client.post('/api/modes/bulk', json={'mode_ids': '*', 'is_active': False})
+    assert [state['is_active'] for state in response.get_json()['modes']] == [False] * 4
+    assert database.get_active_modes() == []
+    changed = events(watcher, 'modes_changed')
+    assert len(changed) == 1 and changed[0]['active_total'] == 0
+
+    response = client.post('/api/modes/bulk', json={'pattern': 'temp*', 'is_active': True})
+    assert [state['mode_id'] for state in response.get_json()['modes']] == [1]
+    watcher.disconnect()
+
+    print("✓ Modes change together with one event")
+
+
+def test_bulk_is_atomic():
+    """Invalid requests change nothing."""
+    print("Testing bulk validation...")
+
+    client = app.test_client()
+    before = database.get_all_modes()
+    for body, message in [
+        ({'changes': [{'mode_id': 2, 'is_active': True}, {'mode_id': 99, 'is_active': True}]}, 'not found'),
+        ({'changes': [{'mode_id': 2, 'voltage': 5}, {'mode_id': 3, 'voltage': 11}]}, 'between 0 and 10'),
+        ({'changes': [{'mode_id': 2, 'is_active': 'yes'}]}, 'true or false'),
+        ({'changes': [{'mode_id': 2}]}, 'is_active or voltage is required'),
+        ({'changes': [{'mode_id': 2, 'voltage': 1}, {'mode_id': '2', 'voltage': 2}]}, 'only once'),
+        ({'changes': []}, 'non-empty list'),
+        ({'is_active': True}, 'mode_id, mode_ids or pattern is required'),
+    ]:
+        response = client.post('/api/modes/bulk', json=body)
+        assert response.status_code == 400, body
+        assert message in response.get_json()['error'], response.get_json()
+    assert database.get_all_modes() == before, "Nothing was changed"
+
+    print("✓ Invalid requests are rejected as a whole")
+
+
+def test_bulk_voltage_supersedes_pending():
+    """A bulk voltage replaces a slider request not yet flushed."""
+    print("Testing bulk voltages and coalesced requests...")
+
+    client = app.test_client()
+    client.post('/api/voltage/set', json={'mode_id': 4, 'voltage': 9})
+    client.post('/api/modes/bulk', json={'mode_ids': [4], 'voltage': 1.5})
+    assert voltage_writes.get(4) == 1.5
+    assert flush_voltages() == []
+    assert database.get_mode_voltage(4) == 1.5
+
+    print("✓ Bulk voltages take precedence")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Bulk Mode Control Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_bulk_changes()
+        test_bulk_is_atomic()
+        test_bulk_voltage_supersedes_pending()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
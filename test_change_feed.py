@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Test script for the long-poll and Server-Sent Events change feed
+"""
+
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+import eventlet
+from eventlet.patcher import original
+
+import database
+import live_buffer
+from app import app
+import change_feed
+from change_feed import read_changes
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    live_buffer.clear()
+
+
+def test_log_and_database_reads():
+    """Changes come from the live log, or the database when the log is short."""
+    print("Testing change reads...")
+
+    now = time.time()
+    stored = ingest_readings([(mode_id, now, float(i)) for i in range(10) for mode_id in (1, 2)])
+    first_id = stored[0][0]
+
+    logged = live_buffer.after(first_id, [2], limit=3)
+    assert [reading[1] for reading in logged] == [2, 2, 2]
+    assert [reading[3] for reading in logged] == [0.0, 1.0, 2.0]
+    assert len(live_buffer.after(first_id - 1)) == 20
+    assert live_buffer.after(first_id - 2) is None, "Readings before the log are not in it"
+
+    live_buffer.clear()
+    assert live_buffer.after(first_id) is None
+    from_db = read_changes(first_id, [2], limit=3)
+    assert from_db == logged
+    assert len(read_changes(0)) == 20
+
+    rows = [(3, now, float(i)) for i in range(live_buffer.HISTORY_MAX_READINGS + 5)]
+    stored = ingest_readings(rows)
+    assert live_buffer.after(stored[0][0] - 1, [3]) is None, "Evicted readings fall back to the database"
+    assert len(read_changes(stored[0][0] - 1, [3], limit=10000)) == len(rows)
+
+    print("✓ Changes are read from the log or the database")
+
+
+def test_out_of_order_writers():
+    """The log serves no reading past a lower id whose write is still in progress."""
+    print("Testing writers logging out of id order...")
+
+    live_buffer.clear()
+    timestamp = database.format_timestamp(time.time())
+    slow = live_buffer.writing()
+    slow.__enter__()
+    with live_buffer.writing():
+        live_buffer.record([(reading_id, 1, timestamp, 0.0) for reading_id in (6, 7, 8)])
+    assert live_buffer.position == 0 and live_buffer.last_sequence(1) == 0, \
+        "Readings 6-8 wait for the write holding 1-5"
+    assert live_buffer.settled() == 0
+    live_buffer.record([(reading_id, 1, timestamp, 0.0) for reading_id in range(1, 6)])
+    slow.__exit__(None, None, None)
+    assert live_buffer.position == 8 and live_buffer.settled() is None
+    assert [reading[0] for reading in live_buffer.after(0)] == list(range(1, 9))
+    assert live_buffer.replay(1, 0)['ids'] == list(range(1, 9)), "Sequence numbers follow ids"
+
+    live_buffer.clear()
+    ids = itertools.count(1)
+    id_lock = original('threading').Lock()
+    threading = original('threading')
+    writers_done = threading.Event()
+    seen = []
+
+    def writer():
+        for _ in range(50):
+            with live_buffer.writing():
+                with id_lock:
+                    batch = [next(ids) for _ in range(random.randint(1, 5))]
+                time.sleep(random.random() * 0.002)
+                live_buffer.record([(reading_id, 1, timestamp, 0.0) for reading_id in batch])
+
+    def consumer():
+        cursor = 0
+        while True:
+            done = writers_done.is_set()
+            readings = live_buffer.after(cursor, limit=100000)
+            if readings:
+                seen.extend(reading[0] for reading in readings)
+                cursor = readings[-1][0]
+            elif done and readings is not None:
+                return
+            time.sleep(0.0005)
+
+    threads = [threading.Thread(target=writer) for _ in range(8)]
+    reader = threading.Thread(target=consumer)
+    reader.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    writers_done.set()
+    reader.join()
+    assert seen == list(range(1, next(ids))), "Every reading is seen once, in id order"
+    live_buffer.clear()
+
+    print("✓ Concurrent writers never make a cursor skip a reading")
+
+
+def test_long_poll():
+    """The long-poll endpoint returns new readings as soon as they are stored."""
+    print("Testing long-poll feed...")
+
+    client = app.test_client()
+    last_id = database.get_latest_reading_id()
+
+    body = client.get('/api/feed?timeout=0').get_json()
+    assert body['readings']['count'] == 0 and body['last_id'] == last_id
+
+    def store_later():
+        eventlet.sleep(0.3)
+        database.add_reading(4, 42.0)
+
+    writer = eventlet.spawn(store_later)
+    started = time.monotonic()
+    body = client.get(f'/api/feed?after={last_id}&mode_id=4&timeout=5').get_json()
+    writer.wait()
+    assert time.monotonic() - started < 3, "Long-poll should wake up on the new reading"
+    assert body['readings']['values'] == [42.0] and body['readings']['mode_ids'] == [4]
+    assert body['last_id'] > last_id
+
+    body = client.get('/api/feed?after=0&mode_id=1,2&limit=5&timeout=0').get_json()
+    assert body['readings']['count'] == 5 and set(body['readings']['mode_ids']) == {1, 2}
+
+    assert client.get('/api/feed?mode_id=99').status_code == 400
+    assert client.get('/api/feed?after=abc').status_code == 400
+
+    print("✓ Long-poll returns new readings")
+
+
+def test_wakeup_from_native_thread():
+    """A reading logged on a native thread wakes a waiting green connection."""
+    print("Testing cross-thread wakeups...")
+
+    timestamp = database.format_timestamp(time.time())
+    last_id = live_buffer.position
+
+    def record_later():
+        original('time').sleep(0.2)
+        with live_buffer.writing():
+            live_buffer.record([(last_id + 1, 1, timestamp, 9.0)])
+
+    thread = original('threading').Thread(target=record_later)
+    started = time.monotonic()
+    thread.start()
+    readings = change_feed.wait_for_changes(last_id, [1], timeout=5)
+    thread.join()
+    assert [reading[0] for reading in readings] == [last_id + 1]
+    assert time.monotonic() - started < 2, "The waiter should wake on the reading, not the timeout"
+    live_buffer.clear()
+
+    print("✓ Native writers wake green waiters")
+
+
+def test_event_stream():
+    """The event stream batches readings and resumes from Last-Event-ID."""
+    print("Testing event stream...")
+
+    client = app.test_client()
+    last_id = database.get_latest_reading_id()
+    response = client.get('/api/feed/stream?mode_id=1', headers={'Last-Event-ID': str(last_id)})
+    assert response.mimetype == 'text/event-stream'
+    events = iter(response.response)
+    assert next(events).startswith(b'retry:')
+
+    now = time.time()
+    stored = ingest_readings([(1, now, 1.5), (2, now, 2.5), (1, now, 3.5)])
+    event = next(events).decode()
+    lines = dict(line.split(': ', 1) for line in event.strip().split('\n'))
+    assert lines['event'] == 'readings'
+    assert int(lines['id']) == stored[-1][0]
+    assert json.loads(lines['data'])['values'] == [1.5, 3.5]
+    response.close()
+
+    print("✓ Event stream sends batched readings")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Change Feed Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_log_and_database_reads()
+        test_out_of_order_writers()
+        test_long_poll()
+        test_wakeup_from_native_thread()
+        test_event_stream()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side chart downsampling (M4 / LTTB)
+"""
+
+import math
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import database
+from app import app
+from downsample import largest_triangle_three_buckets
+
+
+def setup_module(module=None):
+    """Create a temporary database with a dense sine-wave series."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+    start = datetime(2024, 1, 1)
+    with database.get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO readings (mode_id, value, timestamp) VALUES (?, ?, ?)',
+            [
+                (1, math.sin(i / 50.0) * 10 + (25 if i == 777 else 0),
+                 (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'))
+                for i in range(5000)
+            ]
+        )
+
+
+def test_lttb_keeps_endpoints():
+    """LTTB returns the requested number of points including both ends."""
+    print("Testing LTTB...")
+
+    points = [(float(i), math.sin(i / 10.0)) for i in range(1000)]
+    sampled = largest_triangle_three_buckets(points, 100)
+    assert len(sampled) == 100
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert largest_triangle_three_buckets(points[:5], 100) == points[:5]
+
+    print("✓ LTTB keeps endpoints and honours the threshold")
+
+
+def test_m4_preserves_extremes():
+    """M4 output is bounded by the width and keeps the global min and max."""
+    print("Testing M4 downsampling...")
+
+    result = database.get_chart_series(mode_id=1, width=100)
+    series = result['series'][0]
+    assert series['count'] <= 4 * 100, f"Too many points: {series['count']}"
+
+    with database.get_db_connection() as conn:
+        row = conn.execute('SELECT MIN(value), MAX(value) FROM readings WHERE mode_id = 1').fetchone()
+    assert min(series['values']) == row[0], "Minimum should be preserved"
+    assert max(series['values']) == row[1], "Maximum (spike) should be preserved"
+    assert series['timestamps'] == sorted(series['timestamps']), "Series should be time ordered"
+
+    print("✓ M4 bounds the output and preserves extremes")
+
+
+def test_backfilled_readings_stay_time_ordered():
+    """Readings ingested out of time order are charted in time order."""
+    print("Testing chart series with backfilled readings...")
+
+    start = datetime(2024, 1, 1)
+    rows = [(3, (start + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'), float(i))
+            for i in range(1000)]
+    # Newest half first, then the older half backfilled with higher ids
+    database.add_readings_bulk(rows[500:])
+    database.add_readings_bulk(rows[:500])
+
+    for method in database.CHART_METHODS:
+        series = database.get_chart_series(mode_id=3, width=50, method=method)['series'][0]
+        assert series['timestamps'] == sorted(series['timestamps']), f"{method} out of time order"
+        assert series['timestamps'][0] == rows[0][1] and series['timestamps'][-1] == rows[-1][1], \
+            f"{method} should keep the first and last reading by time"
+        assert series['values'] == sorted(series['values']), f"{method} values follow time"
+
+    print("✓ Backfilled readings are charted in time order")
+
+
+def test_lttb_method():
+    """The LTTB method reduces to at most width points per mode."""
+    print("Testing LTTB method...")
+
+    result = database.get_chart_series(mode_id=1, width=100, method='lttb')
+    assert result['series'][0]['count'] <= 100
+
+    print("✓ LTTB method respects width")
+
+
+def test_chart_series_endpoint():
+    """The endpoint validates parameters and returns series."""
+    print("Testing chart series endpoint...")
+
+    client = app.test_client()
+    data = client.get('/api/chart-series?width=200').get_json()
+    assert data['series'][0]['mode_name'] == 'Temperature'
+    assert client.get('/api/chart-series?width=0').status_code == 400
+    assert client.get('/api/chart-series?method=foo').status_code == 400
+    assert client.get('/api/chart-series?mode_id=999').status_code == 404
+    empty = client.get('/api/chart-series?mode_id=2').get_json()
+    assert empty['series'] == []
+
+    print("✓ Chart series endpoint works")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Chart Downsampling Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_lttb_keeps_endpoints()
+        test_m4_preserves_extremes()
+        test_backfilled_readings_stay_time_ordered()
+        test_lttb_method()
+        test_chart_series_endpoint()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for the columnar response format of /api/records
+"""
+
+import os
+import sys
+import tempfile
+
+import database
+from app import app
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database with readings."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    for mode_id in [1, 2]:
+        for i in range(5):
+            database.add_reading(mode_id, 20.0 + i)
+
+
+def test_columnar_matches_rows():
+    """Columnar output should carry the same data as the row format."""
+    print("Testing columnar vs row format...")
+
+    for aggregation in ['raw', '1min']:
+        rows = database.get_filtered_records(limit=50, aggregation=aggregation)
+        result = database.get_filtered_records_columnar(limit=50, aggregation=aggregation)
+        columns = result['columns']
+
+        assert result['count'] == len(rows), "Counts should match"
+        assert 'mode_name' not in columns, "Mode metadata should not repeat per row"
+        for index, row in enumerate(rows):
+            for name, values in columns.items():
+                assert values[index] == row[name], f"Mismatch in column {name}"
+            mode = result['modes'][row['mode_id']]
+            assert mode['name'] == row['mode_name'] and mode['icon'] == row['icon']
+
+    print("✓ Columnar output matches row output")
+
+
+def test_columnar_endpoint():
+    """The API should serve the columnar format on request."""
+    print("Testing columnar endpoint...")
+
+    client = app.test_client()
+    response = client.get('/api/records?format=columnar&mode_id=1')
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data['format'] == 'columnar'
+    assert data['count'] == 5
+    assert set(data['columns']) == {'id', 'mode_id', 'value', 'timestamp'}
+    assert data['modes']['1']['name'] == 'Temperature'
+
+    empty = client.get('/api/records?format=columnar&min_value=1000').get_json()
+    assert empty['count'] == 0 and empty['columns']['value'] == []
+
+    assert client.get('/api/records?format=xml').status_code == 400
+
+    print("✓ Columnar endpoint works")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Columnar Records Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_columnar_matches_rows()
+        test_columnar_endpoint()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for deadband / swinging-door compression at ingest
+"""
+
+import math
+import os
+import random
+import sys
+import tempfile
+
+import compression
+import database
+from app import app
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def teardown_module(module=None):
+    """Store later readings uncompressed again."""
+    for mode_id in list(compression.filters):
+        compression.configure(mode_id, 'none')
+
+
+def slow_signal(count, noise=0.05):
+    """A slowly drifting signal sampled once per second."""
+    rng = random.Random(7)
+    return [(1700000000.0 + i, 100 + 3 * math.sin(i / 40) + rng.uniform(-noise, noise))
+            for i in range(count)]
+
+
+def max_error(points, stored):
+    """Largest deviation of linear interpolation over stored from the originals."""
+    worst = 0.0
+    for t, v in points:
+        if t > stored[-1][0]:
+            break
+        for (t0, v0), (t1, v1) in zip(stored, stored[1:]):
+            if t0 <= t <= t1:
+                estimate = v0 + (v1 - v0) * (t - t0) / (t1 - t0) if t1 > t0 else v0
+                worst = max(worst, abs(estimate - v))
+                break
+    return worst
+
+
+def test_filters_reconstruct_within_tolerance():
+    """Both filters drop most points and interpolate back within tolerance."""
+    print("Testing compression filters...")
+
+    points = slow_signal(300)
+    for name, bound, max_ratio in [('swinging_door', 0.2, 0.1), ('deadband', 0.4, 0.5)]:
+        mode_filter = compression.FILTERS[name](0.2, max_interval=1000)
+        stored = []
+        for point in points:
+            stored.extend(mode_filter.offer(point))
+        error = max_error(points, stored)
+        print(f"  {name}: stored {len(stored)}/{len(points)}, max error {error:.3f}")
+        assert len(stored) < len(points) * max_ratio, f"{name} stored too many readings"
+        assert error <= bound + 1e-9, f"{name} error {error} exceeds {bound}"
+
+    print("✓ Filters reconstruct the signal within tolerance")
+
+
+def test_max_interval_forces_storage():
+    """A flat signal is still stored every max_interval seconds."""
+    print("Testing max interval...")
+
+    mode_filter = compression.SwingingDoorFilter(1.0, max_interval=10)
+    stored = []
+    for i in range(35):
+        stored.extend(mode_filter.offer((float(i), 5.0)))
+    assert [p[0] for p in stored] == [0.0, 9.0, 10.0, 19.0, 20.0, 29.0, 30.0]
+
+    print("✓ Flat signals are stored every max_interval")
+
+
+def test_ingest_and_interpolate():
+    """Compressed ingest is queryable as an interpolated series."""
+    print("Testing compressed ingest and interpolation...")
+
+    client = app.test_client()
+    response = client.post('/api/modes/3/compression',
+                           json={'method': 'swinging_door', 'tolerance': 0.2, 'max_interval': 600})
+    assert response.status_code == 200
+    assert response.get_json()['method'] == 'swinging_door'
+
+    points = slow_signal(300)
+    ingest_readings([(3, t, v) for t, v in points])
+    settings = client.get('/api/modes/3/compression').get_json()
+    assert settings['offered'] == 300 and settings['stored'] < 60
+
+    data = client.get('/api/interpolated?mode_id=3&step=1').get_json()
+    assert data['stored_points'] == settings['stored']
+    original = dict((database.format_timestamp(t), v) for t, v in points)
+    for timestamp, value in zip(data['timestamps'], data['values']):
+        assert abs(value - original[timestamp]) <= 0.2 + 1e-6, f"Bad value at {timestamp}"
+
+    window = client.get('/api/interpolated?mode_id=3&step=30'
+                        '&start_time=2023-11-14 22:13:00&end_time=2023-11-14 22:15:00').get_json()
+    assert len(window['values']) == 5
+    assert window['values'][0] is None, "Before the first reading there is nothing to interpolate"
+    assert window['values'][1] is not None
+
+    print(f"✓ Stored {settings['stored']} of 300 readings and interpolated them back")
+
+
+def test_settings_persist_and_validate():
+    """Settings survive a reload; invalid settings are rejected."""
+    print("Testing settings persistence...")
+
+    client = app.test_client()
+    client.post('/api/modes/4/compression', json={'method': 'deadband', 'tolerance': 0.5})
+    compression.configure(4, 'none')
+    database.init_db()
+    assert compression.get_settings(4)['method'] == 'deadband'
+    assert database.add_reading(4, 1.0) is not None
+    assert database.add_reading(4, 1.1) is None, "Readings inside the deadband are held back"
+
+    assert client.post('/api/modes/4/compression', json={'method': 'zip'}).status_code == 400
+    assert client.post('/api/modes/4/compression',
+                       json={'method': 'deadband', 'tolerance': -1}).status_code == 400
+    assert client.post('/api/modes/999/compression', json={'method': 'none'}).status_code == 404
+
+    client.post('/api/modes/4/compression', json={'method': 'none'})
+    assert not compression.is_compressed(4)
+    assert database.add_reading(4, 1.0) is not None
+
+    print("✓ Settings persist and are validated")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Ingest Compression Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_filters_reconstruct_within_tolerance()
+        test_max_interval_forces_storage()
+        test_ingest_and_interpolate()
+        test_settings_persist_and_validate()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Test script for version-based ETags and conditional GET on read endpoints
+"""
+
+import os
+import sys
+import tempfile
+
+import database
+from app import app
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def test_etag_roundtrip():
+    """A repeated request with If-None-Match should get 304."""
+    print("Testing ETag roundtrip...")
+
+    client = app.test_client()
+    for url in ['/api/modes', '/api/readings/1', '/api/records?mode_id=1', '/api/statistics']:
+        first = client.get(url)
+        assert first.status_code == 200, f"{url} returned {first.status_code}"
+        etag = first.headers.get('ETag')
+        assert etag, f"{url} should send an ETag"
+
+        second = client.get(url, headers={'If-None-Match': etag})
+        assert second.status_code == 304, f"{url} should return 304, got {second.status_code}"
+        assert second.data == b'', "304 responses must not carry a body"
+
+    print("✓ Conditional GET returns 304 for unchanged data")
+
+
+def test_new_reading_changes_etag():
+    """Adding a reading invalidates reading ETags for that mode only."""
+    print("Testing reading version invalidation...")
+
+    client = app.test_client()
+    etag_mode_1 = client.get('/api/readings/1').headers['ETag']
+    etag_mode_2 = client.get('/api/readings/2').headers['ETag']
+    etag_modes = client.get('/api/modes').headers['ETag']
+
+    database.add_reading(1, 21.5)
+
+    assert client.get('/api/readings/1', headers={'If-None-Match': etag_mode_1}).status_code == 200
+    assert client.get('/api/readings/2', headers={'If-None-Match': etag_mode_2}).status_code == 304
+    assert client.get('/api/modes', headers={'If-None-Match': etag_modes}).status_code == 304
+
+    print("✓ New readings invalidate only the affected versions")
+
+
+def test_status_change_changes_etag():
+    """Toggling a mode or changing voltage invalidates the modes ETag."""
+    print("Testing status version invalidation...")
+
+    client = app.test_client()
+    etag = client.get('/api/modes').headers['ETag']
+    database.update_mode_status(1, True)
+    response = client.get('/api/modes', headers={'If-None-Match': etag})
+    assert response.status_code == 200, "Status change should invalidate /api/modes"
+
+    etag = response.headers['ETag']
+    database.set_mode_voltage(1, 6.5)
+    assert client.get('/api/modes', headers={'If-None-Match': etag}).status_code == 200
+
+    print("✓ Status changes invalidate the modes version")
+
+
+def test_query_string_is_part_of_etag():
+    """Different filters must not share an ETag."""
+    print("Testing query-specific ETags...")
+
+    client = app.test_client()
+    a = client.get('/api/records?limit=5').headers['ETag']
+    b = client.get('/api/records?limit=10').headers['ETag']
+    assert a != b, "Different queries should have different ETags"
+
+    print("✓ ETags are query specific")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Conditional GET Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_etag_roundtrip()
+        test_new_reading_changes_etag()
+        test_status_change_changes_etag()
+        test_query_string_is_part_of_etag()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
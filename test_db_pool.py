@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Test script for offloading database calls to a native thread pool
+"""
+
+import eventlet
+
+eventlet.monkey_patch()
+
+import os
+import sys
+import tempfile
+import time
+
+import database
+import db_pool
+from hub_monitor import HubLagMonitor
+
+SLOW_QUERY = '''
+    WITH RECURSIVE counter(n) AS (
+        SELECT 1 UNION ALL SELECT n + 1 FROM counter WHERE n < 1000000
+    )
+    SELECT COUNT(*) FROM counter
+'''
+
+
+@database.blocking
+def slow_query():
+    """A CPU-bound query that does not yield to the hub."""
+    with database.get_db_connection() as conn:
+        return conn.execute(SLOW_QUERY).fetchone()[0]
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def teardown_module(module=None):
+    """Restore direct database calls for other tests."""
+    db_pool.disable()
+
+
+def measure_lag(fn):
+    """Run fn while a hub lag monitor is sampling; return the max lag."""
+    monitor = HubLagMonitor(interval=0.01, warn_threshold=10)
+    monitor.start()
+    eventlet.sleep(0.05)
+    fn()
+    eventlet.sleep(0.05)
+    monitor.stop()
+    return monitor.max_lag
+
+
+def test_pool_keeps_hub_responsive():
+    """A slow query on the pool should not block the hub."""
+    print("Testing hub responsiveness...")
+
+    db_pool.disable()
+    started = time.monotonic()
+    blocked_lag = measure_lag(slow_query)
+    query_time = time.monotonic() - started
+
+    db_pool.enable(threads=2, max_pending=8)
+    pooled_lag = measure_lag(slow_query)
+
+    print(f"  direct: {blocked_lag * 1000:.0f}ms lag, pooled: {pooled_lag * 1000:.0f}ms lag "
+          f"(query {query_time * 1000:.0f}ms)")
+    assert pooled_lag < blocked_lag / 2, "Pooled queries should not stall the hub"
+
+    print("✓ Hub stays responsive while queries run on the pool")
+
+
+def test_pool_runs_database_functions():
+    """Regular database functions work through the pool."""
+    print("Testing database functions through the pool...")
+
+    db_pool.enable(threads=2, max_pending=8)
+    reading_id = database.add_reading(1, 42.0)
+    assert database.get_current_reading(1)['id'] == reading_id
+    assert database.get_statistics(mode_id=1)['count'] >= 1
+    assert db_pool.get_pool_stats()['completed'] > 0
+
+    print("✓ Database functions run through the pool")
+
+
+def test_query_budget_propagates():
+    """The caller's query budget applies on the worker thread."""
+    print("Testing budget propagation...")
+
+    db_pool.enable(threads=2, max_pending=8)
+    try:
+        with database.query_budget(0.01):
+            slow_query()
+        assert False, "Should have raised QueryTimeoutError"
+    except database.QueryTimeoutError:
+        pass
+
+    print("✓ Query budget propagates to the pool")
+
+
+def test_bounded_queue_rejects_overflow():
+    """Calls beyond max_pending fail fast once the queue timeout expires."""
+    print("Testing bounded queue...")
+
+    db_pool.enable(threads=1, max_pending=1, queue_timeout=0.01)
+    errors = []
+
+    def worker():
+        try:
+            slow_query()
+        except db_pool.DatabaseBusyError as e:
+            errors.append(e)
+
+    threads = [eventlet.spawn(worker) for _ in range(3)]
+    for thread in threads:
+        thread.wait()
+
+    assert len(errors) == 2, f"Expected 2 rejected calls, got {len(errors)}"
+
+    print("✓ Bounded queue rejects overflow")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Database Thread Pool Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_pool_keeps_hub_responsive()
+        test_pool_runs_database_functions()
+        test_query_budget_propagates()
+        test_bounded_queue_rejects_overflow()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Test script for the bounded per-client emit queues and slow-client policies
+"""
+
+import os
+import sys
+import tempfile
+
+import eventlet
+
+import database
+from app import app, socketio, outbound
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def teardown_module(module=None):
+    """Restore the configured queue depth."""
+    outbound.max_depth = app.config['EMIT_QUEUE_DEPTH']
+
+
+def connect(policy=None):
+    """Connect a test client subscribed to mode 1 and return it with its sid."""
+    client = socketio.test_client(app)
+    sid = client.get_received()[0]['args'][0]['client_id']
+    data = {'mode_id': 1}
+    if policy:
+        data['policy'] = policy
+    client.emit('subscribe_mode', data)
+    client.get_received()
+    return client, sid
+
+
+def values(client):
+    """Values of the data_update events a client has received."""
+    return [msg['args'][0]['value'] for msg in client.get_received() if msg['name'] == 'data_update']
+
+
+def stall(*sids):
+    """Make the given clients look stuck behind a full transport queue."""
+    outbound.backlog = lambda client: 100 if client.sid in sids else 0
+
+
+def emit_readings(count):
+    """Broadcast `count` readings of mode 1 through the outbound queues."""
+    for i in range(count):
+        outbound.emit('data_update', {'mode_id': 1, 'value': float(i)}, room='mode_1')
+
+
+def test_slow_client_is_bounded():
+    """A stalled client queues at most max_depth events and drops the oldest."""
+    print("Testing drop_oldest...")
+
+    outbound.max_depth = 5
+    fast, _ = connect()
+    slow, slow_sid = connect()
+    stall(slow_sid)
+    try:
+        emit_readings(10)
+        assert values(fast) == [float(i) for i in range(10)], "Healthy clients are not held back"
+        assert values(slow) == []
+
+        stats = outbound.get_stats()
+        assert stats['queued'] == 5 and stats['dropped'] >= 5
+        slowest = stats['slowest'][0]
+        assert slowest['sid'] == slow_sid and slowest['depth'] == 5 and slowest['dropped'] == 5
+        assert slowest['lag_seconds'] >= 0
+
+        stall()
+        eventlet.sleep(0.2)
+        assert values(slow) == [5.0, 6.0, 7.0, 8.0, 9.0], "The newest events are delivered in order"
+        assert outbound.get_stats()['queued'] == 0
+    finally:
+        del outbound.backlog
+        fast.disconnect()
+        slow.disconnect()
+
+    print("✓ Slow clients are bounded and catch up")
+
+
+def test_latest_policy():
+    """Under 'latest' only the newest event per kind and mode waits."""
+    print("Testing latest...")
+
+    client, sid = connect('latest')
+    stall(sid)
+    try:
+        emit_readings(10)
+        outbound.emit('voltage_changed', {'mode_id': 1, 'voltage': 3.0})
+        assert outbound.clients[sid].policies[1] == 'latest'
+        assert len(outbound.clients[sid].events) == 2
+
+        stall()
+        eventlet.sleep(0.2)
+        received = client.get_received()
+        assert [msg['name'] for msg in received] == ['data_update', 'voltage_changed']
+        assert received[0]['args'][0]['value'] == 9.0
+    finally:
+        del outbound.backlog
+        client.disconnect()
+
+    print("✓ Latest value only is kept")
+
+
+def test_disconnect_policy():
+    """Under 'disconnect' a client overflowing its queue is dropped."""
+    print("Testing disconnect...")
+
+    client, sid = connect('disconnect')
+    disconnected = outbound.disconnected
+    stall(sid)
+    try:
+        emit_readings(6)
+        assert outbound.disconnected == disconnected + 1
+        assert sid not in outbound.clients
+        assert not client.is_connected()
+    finally:
+        del outbound.backlog
+
+    bad = socketio.test_client(app)
+    bad.get_received()
+    bad.emit('subscribe_mode', {'mode_id': 1, 'policy': 'sometimes'})
+    assert bad.get_received()[0]['name'] == 'error'
+    bad.disconnect()
+
+    stats = app.test_client().get('/api/diagnostics/event-loop').get_json()['emit_queues']
+    assert stats['enabled'] and stats['disconnected'] >= 1
+
+    print("✓ Overflowing clients are disconnected")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Emit Queue Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_slow_client_is_bounded()
+        test_latest_policy()
+        test_disconnect_policy()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
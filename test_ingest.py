@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Test script for bulk ingest via POST /api/ingest
+"""
+
+import json
+import os
+import struct
+import sys
+import tempfile
+
+import database
+import ingest
+from app import app
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def test_ndjson_ingest():
+    """NDJSON batches are stored in order and readable through the API."""
+    print("Testing NDJSON ingest...")
+
+    lines = [json.dumps([1, 1700000000 + i, 20.0 + i]) for i in range(100)]
+    lines.append(json.dumps({'mode_id': 2, 'timestamp': '2023-11-14T22:13:20Z', 'value': 55.5}))
+    client = app.test_client()
+    response = client.post('/api/ingest', data='\n'.join(lines),
+                           content_type='application/x-ndjson')
+    assert response.status_code == 201, response.get_json()
+    data = response.get_json()
+    assert data['ingested'] == 101
+    assert data['last_id'] - data['first_id'] == 100
+
+    readings = database.get_recent_readings(1, limit=200)
+    assert len(readings) == 100
+    assert {r['timestamp'] for r in readings} >= {'2023-11-14 22:13:20', '2023-11-14 22:14:59'}
+    assert database.get_current_reading(2)['value'] == 55.5
+
+    print("✓ NDJSON batches are stored")
+
+
+def test_binary_ingest():
+    """Packed binary records are decoded and stored."""
+    print("Testing binary ingest...")
+
+    payload = b''.join(struct.pack('<Idd', 3, 1700000100.25, float(i)) for i in range(10))
+    client = app.test_client()
+    response = client.post('/api/ingest', data=payload, content_type='application/octet-stream')
+    assert response.status_code == 201, response.get_json()
+    assert response.get_json()['ingested'] == 10
+
+    latest = database.get_current_reading(3)
+    assert latest['timestamp'] == '2023-11-14 22:15:00.250'
+
+    truncated = client.post('/api/ingest', data=payload[:-1], content_type='application/octet-stream')
+    assert truncated.status_code == 400
+
+    print("✓ Binary records are stored")
+
+
+def test_invalid_batch_is_rejected():
+    """One bad row rejects the whole batch without writing anything."""
+    print("Testing batch validation...")
+
+    before = database.get_data_version()
+    body = '\n'.join([json.dumps([1, None, 1.0]), json.dumps([999, None, 1.0])])
+    client = app.test_client()
+    response = client.post('/api/ingest', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400
+    assert response.get_json()['rows'][0]['row'] == 1
+    assert database.get_data_version() == before
+
+    huge_value = '[1, null, 1' + '0' * 400 + ']'
+    body = '\n'.join([json.dumps([1, 1e20, 1.0]), huge_value, json.dumps([1, None, 2.0])])
+    response = client.post('/api/ingest', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 400, "Out-of-range timestamps and values are row errors"
+    assert [row['row'] for row in response.get_json()['rows']] == [0, 1]
+    assert 'between 1970 and 9999' in response.get_json()['rows'][0]['error']
+    assert response.get_json()['rows'][1]['error'] == 'value must be a finite number'
+    assert database.get_data_version() == before
+
+    response = client.post('/api/ingest', data='x', content_type='text/csv')
+    assert response.status_code == 415
+
+    print("✓ Invalid batches are rejected")
+
+
+def test_listeners_receive_batches():
+    """Ingest listeners see each stored batch once."""
+    print("Testing ingest fan-out...")
+
+    received = []
+    ingest.add_listener(received.append)
+    try:
+        stored = ingest.ingest_readings([(1, None, 1.0), (2, None, 2.0)])
+    finally:
+        ingest.listeners.remove(received.append)
+
+    assert received == [stored]
+    assert [row[1] for row in stored] == [1, 2]
+
+    print("✓ Listeners receive stored batches")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Bulk Ingest Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_ndjson_ingest()
+        test_binary_ingest()
+        test_invalid_batch_is_rejected()
+        test_listeners_receive_batches()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
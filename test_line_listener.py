@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for the line-protocol TCP/UDP ingest listener
+"""
+
+import eventlet
+
+# Patch before asyncio and the executor threads are set up, as app.py does
+eventlet.monkey_patch()
+
+import asyncio
+import os
+import sys
+import tempfile
+
+import database
+import ingest
+from bench_line_ingest import generate_lines, send_tcp, send_udp
+from line_listener import LineIngestServer
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+async def wait_for(predicate, timeout=5.0):
+    """Poll until predicate() is true or the timeout expires."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "Timed out waiting for listener"
+        await asyncio.sleep(0.02)
+
+
+def test_parse_line():
+    """Lines parse into stored-format tuples; malformed lines raise ValueError."""
+    print("Testing line parsing...")
+
+    async def run():
+        return LineIngestServer()
+
+    server = asyncio.run(run())
+    assert server.parse_line(b'2,1700000000.5,21.25') == (2, '2023-11-14 22:13:20.500', 21.25)
+    assert server.parse_line(b'1,,3\r')[0] == 1
+    for line in [b'1,2', b'x,1,2', b'1,1,nan', b'1,1,2,3', b'1,inf,5', b'1,1e20,5', b'1,-1,5']:
+        try:
+            server.parse_line(line)
+            assert False, f"Should reject {line!r}"
+        except ValueError:
+            pass
+
+    print("✓ Lines are parsed and validated")
+
+
+def test_tcp_and_udp_ingest():
+    """Generated traffic is stored through the ingest path and counted."""
+    print("Testing TCP and UDP ingest...")
+
+    published = []
+    ingest.add_listener(published.append)
+
+    async def run():
+        server = LineIngestServer(batch_size=200, flush_interval=0.05)
+        await server.start('127.0.0.1', tcp_port=0, udp_port=0)
+        try:
+            await send_tcp('127.0.0.1', server.tcp_port,
+                           generate_lines(1000, [1, 2], bad_every=100))
+            await wait_for(lambda: server.counters["stored"] == 990)
+
+            await send_udp('127.0.0.1', server.udp_port, generate_lines(100, [3]))
+            await send_tcp('127.0.0.1', server.tcp_port, iter([b'999,,1.0\n', b'4,,2.0']))
+            await wait_for(lambda: server.counters['stored'] >= 1091)
+        finally:
+            await server.stop()
+        return server.get_stats()
+
+    try:
+        stats = asyncio.run(run())
+    finally:
+        ingest.listeners.remove(published.append)
+
+    assert stats['parse_errors'] == 10
+    assert stats['unknown_mode'] == 1
+    assert stats['pending'] == 0
+    assert sum(len(batch) for batch in published) == stats['stored']
+    assert len(database.get_recent_readings(1, limit=1000)) == 500
+    assert database.get_current_reading(4)['value'] == 2.0
+    # UDP may lose datagrams even on localhost, so only require most of them
+    assert len(database.get_recent_readings(3, limit=1000)) >= 90
+
+    print(f"✓ Listener stored {stats['stored']} readings in {stats['batches']} batches")
+
+
+def test_backlog_is_bounded():
+    """Readings beyond max_pending are dropped and counted; bad lines only skip themselves."""
+    print("Testing bounded backlog...")
+
+    async def run():
+        server = LineIngestServer(max_pending=10)
+        server.mode_ids = {1}
+        server.feed(b''.join(generate_lines(25, [1])))
+        return server
+
+    server = asyncio.run(run())
+    assert len(server.pending) == 10
+    assert server.counters['dropped'] == 15
+
+    async def run_mixed():
+        server = LineIngestServer()
+        server.mode_ids = {1}
+        server.feed(b'1,1700000000,1\n1,inf,5\n1,1e20,5\n1,,2\n1,1700000001,3\n')
+        return server
+
+    server = asyncio.run(run_mixed())
+    assert [reading[2] for reading in server.pending] == [1.0, 2.0, 3.0], "Bad lines skip only themselves"
+    assert server.counters['parse_errors'] == 2 and server.counters['parsed'] == 3
+
+    print("✓ Backlog overflow is dropped")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Line-Protocol Listener Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_parse_line()
+        test_tcp_and_udp_ingest()
+        test_backlog_is_bounded()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
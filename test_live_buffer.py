@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Test script for the live reading buffer and subscribe history backfill
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import database
+import live_buffer
+from app import app, socketio
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    live_buffer.clear()
+
+
+def test_buffer_records_writes():
+    """Every write path feeds the buffer and history is cut by age."""
+    print("Testing live buffer...")
+
+    now = time.time()
+    ingest_readings([(1, now - 600, 1.0), (1, now - 20, 2.0), (1, now - 10, 3.0)])
+    reading_id = database.add_reading(1, 4.0)
+
+    history = live_buffer.history(1, 60)
+    assert history['values'] == [2.0, 3.0, 4.0]
+    assert history['ids'][-1] == reading_id
+    assert history['count'] == 3
+    assert live_buffer.history(1, 10 ** 6)['count'] == 3, "History is capped at HISTORY_SECONDS"
+    assert live_buffer.history(2, 60)['count'] == 0
+
+    for i in range(live_buffer.HISTORY_MAX_READINGS + 10):
+        live_buffer.record([(i, 3, database.format_timestamp(now), float(i))])
+    assert len(live_buffer.buffers[3]) == live_buffer.HISTORY_MAX_READINGS
+
+    print("✓ Buffer holds recent readings per mode")
+
+
+def test_subscribe_with_history():
+    """subscription_confirmed carries history only when asked for."""
+    print("Testing subscribe backfill...")
+
+    client = socketio.test_client(app)
+    client.get_received()
+
+    client.emit('subscribe_mode', {'mode_id': 1, 'history_seconds': 60})
+    confirmed = [msg for msg in client.get_received() if msg['name'] == 'subscription_confirmed']
+    payload = confirmed[0]['args'][0]
+    assert payload['mode_id'] == 1 and payload['room'] == 'mode_1'
+    assert payload['history']['values'] == [2.0, 3.0, 4.0]
+
+    client.emit('subscribe_mode', {'mode_id': 2})
+    confirmed = [msg for msg in client.get_received() if msg['name'] == 'subscription_confirmed']
+    assert 'history' not in confirmed[0]['args'][0]
+
+    client.emit('subscribe_mode', {'mode_id': 2, 'history_seconds': 'all'})
+    confirmed = [msg for msg in client.get_received() if msg['name'] == 'subscription_confirmed']
+    assert 'history' not in confirmed[0]['args'][0]
+    client.disconnect()
+
+    print("✓ History is sent with the subscription confirmation")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Live Buffer Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_buffer_records_writes()
+        test_subscribe_with_history()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
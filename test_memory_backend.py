@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory storage backend
+"""
+
+import random
+import sys
+
+import database
+from app import app
+from ingest import ingest_readings
+from memory_backend import MemoryBackend
+
+START_MS = 1699920000000  # 2023-11-14 00:00:00 UTC
+
+original_path = database.DATABASE_PATH
+
+
+def setup_module(module=None):
+    """Run the database layer entirely in memory."""
+    database.use_memory_database('test_memory_backend')
+    database.init_db()
+    database.use_readings_backend('memory')
+
+
+def teardown_module(module=None):
+    """Return to the on-disk database and readings table."""
+    database.use_readings_backend('sqlite')
+    database.memory_anchor.close()
+    database.memory_anchor = None
+    database.DATABASE_PATH = original_path
+    database.data_versions['readings'] = None
+
+
+def test_series_range_queries():
+    """Series stay time-ordered and range queries use the sorted arrays."""
+    print("Testing array-backed series...")
+
+    backend = MemoryBackend()
+    rng = random.Random(5)
+    times = [START_MS + i * 1000 for i in range(500)]
+    shuffled = times[:]
+    rng.shuffle(shuffled)
+    backend.append([(1, epoch_ms, float(epoch_ms - START_MS) / 1000) for epoch_ms in shuffled])
+
+    series = backend.series[1]
+    assert list(series.times) == times
+    assert list(series.values) == [float(i) for i in range(500)]
+
+    window = list(backend.scan(1, START_MS + 100000, START_MS + 109000))
+    assert [r[3] for r in window] == [float(i) for i in range(100, 110)]
+    assert [r[3] for r in backend.recent(1, 3)] == [499.0, 498.0, 497.0]
+    assert backend.max_ids() == {1: 500}
+
+    fast = backend.statistics(start_ms=START_MS + 250000)
+    generic = super(MemoryBackend, backend).statistics(start_ms=START_MS + 250000)
+    assert fast == generic and fast[1][0] == 250
+    assert backend.statistics(min_value=490)[1][0] == 10
+
+    backend.append([(2, epoch_ms, 1.0) for epoch_ms in times[::7]])
+    for kwargs in ({}, {'mode_id': 1}, {'min_value': 100, 'max_value': 300, 'offset': 40},
+                   {'start_ms': START_MS + 200000, 'limit': 30, 'offset': 90}):
+        page = backend.page(**kwargs)
+        assert page == super(MemoryBackend, backend).page(**kwargs), kwargs
+    assert [r[3] for r in backend.page(1, limit=2, offset=1)] == [498.0, 497.0]
+
+    print("✓ Series are sorted and range queries are exact")
+
+
+def test_database_in_memory():
+    """Modes, status, readings, filtering and statistics work without app.db."""
+    print("Testing database functions in memory...")
+
+    assert database.DATABASE_PATH.startswith('file:')
+    modes = database.get_all_modes()
+    assert len(modes) == 4
+
+    database.update_mode_status(2, True)
+    assert database.get_mode_by_id(2)['is_active'] == 1
+    database.set_mode_voltage(2, 7.5)
+    assert database.get_mode_voltage(2) == 7.5
+
+    rows = [(mode_id, (START_MS + i * 60000) / 1000, float(i % 20))
+            for i in range(240) for mode_id in (1, 2)]
+    assert len(ingest_readings(rows)) == 480
+    reading_id = database.add_reading(2, 99.0)
+    assert database.get_current_reading(2)['id'] == reading_id
+
+    records = database.get_filtered_records(mode_id=1, start_time='2023-11-14 01:00:00',
+                                            end_time='2023-11-14 01:59:59', limit=1000)
+    assert len(records) == 60
+    hourly = database.get_filtered_records(mode_id=1, aggregation='60min', limit=100)
+    assert sum(row['count'] for row in hourly) == 240
+
+    stats = database.get_statistics(mode_id=1)
+    assert stats['count'] == 240 and stats['maximum'] == 19.0
+
+    with database.get_db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM readings').fetchone()[0] == 0
+
+    try:
+        database.refresh_snapshot()
+        assert False, "Snapshots need an on-disk database"
+    except ValueError:
+        pass
+
+    body = app.test_client().get('/api/statistics?mode_id=2').get_json()
+    assert body['statistics']['count'] == 241
+
+    print("✓ Database functions run fully in memory")
+
+
+def test_records_read_one_page():
+    """Raw record pages load only the newest rows from the backend."""
+    print("Testing paginated reads...")
+
+    loaded = []
+    load_temp_readings = database.load_temp_readings
+
+    def counting_load(cursor, table, records):
+        loaded.append(len(records))
+        load_temp_readings(cursor, table, records)
+
+    database.load_temp_readings = counting_load
+    try:
+        records = database.get_filtered_records(mode_id=1, min_value=5, limit=10, offset=5)
+        assert loaded == [15], loaded
+        columnar = database.get_filtered_records_columnar(mode_id=1, min_value=5,
+                                                          limit=10, offset=5)
+        assert columnar['columns']['id'] == [row['id'] for row in records]
+
+        everything = database.get_filtered_records(mode_id=1, min_value=5, limit=1000)
+        assert records == everything[5:15]
+        assert loaded[-1] == len(everything), "Without a page limit the range is loaded"
+
+        hourly = database.get_filtered_records(mode_id=1, aggregation='60min', limit=1)
+        assert loaded[-1] == 240 and hourly, "Aggregated pages read the whole range"
+    finally:
+        database.load_temp_readings = load_temp_readings
+
+    print("✓ Record pages are cut by the backend")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("In-Memory Backend Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_series_range_queries()
+        test_database_in_memory()
+        test_records_read_one_page()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
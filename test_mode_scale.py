@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Test script for a mode registry with tens of thousands of modes
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import database
+from app import app, socketio
+
+MODE_COUNT = 10000
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def test_bulk_registration():
+    """Many modes register in one call; names already taken are skipped."""
+    print("Testing bulk mode registration...")
+
+    modes = [(f'Sensor {i:05d}', f'Synthetic sensor {i}', '📟') for i in range(MODE_COUNT)]
+    start = time.time()
+    mode_ids = database.register_modes(modes)
+    elapsed = time.time() - start
+    assert len(mode_ids) == MODE_COUNT
+    assert mode_ids == list(range(5, MODE_COUNT + 5)), "Ids follow the seeded modes"
+    assert elapsed < 5, f"Registration took {elapsed:.2f}s"
+
+    extra_ids = database.register_modes(modes[:10] + [('Extra', '', '')])
+    assert len(extra_ids) == 1, "Taken names are skipped"
+    registry = database.get_mode_registry()
+    assert len(registry) == MODE_COUNT + 5
+    assert registry[extra_ids[0]]['name'] == 'Extra'
+    assert registry[extra_ids[0]]['is_active'] == 0, "New modes start inactive"
+
+    client = app.test_client()
+    response = client.post('/api/modes', json={'modes': [
+        {'name': 'Radiation', 'description': 'Monitor radiation', 'icon': '☢️'},
+        {'name': 'Extra'},
+    ]})
+    assert response.status_code == 201
+    assert response.get_json()['created'] == 1 and response.get_json()['skipped'] == 1
+    for body in [{'modes': []}, {'modes': [{'name': ' '}]}, {'modes': [{'name': 'A'}, {'name': 'A'}]}]:
+        assert client.post('/api/modes', json=body).status_code == 400, body
+
+    print(f"✓ {MODE_COUNT} modes registered in {elapsed:.2f}s")
+
+
+def test_paginated_listing():
+    """Pages follow each other by id and filter by name prefix and state."""
+    print("Testing paginated mode listings...")
+
+    seen = []
+    after = 0
+    while after is not None:
+        page = database.get_modes_page(after_id=after, limit=1000)
+        seen.extend(mode['id'] for mode in page['modes'])
+        after = page['next_after']
+    assert seen == sorted(database.get_mode_registry()), "Every mode listed once, in order"
+
+    page = database.get_modes_page(prefix='sensor 0999')
+    assert [mode['name'] for mode in page['modes']] == [f'Sensor 0999{i}' for i in range(10)]
+    assert page['total'] == 10 and page['next_after'] is None
+    assert database.get_modes_page(prefix='100%')['total'] == 0, "LIKE wildcards are literal"
+
+    client = app.test_client()
+    response = client.get('/api/modes?limit=5&after=2')
+    body = response.get_json()
+    assert [mode['id'] for mode in body['modes']] == [3, 4, 5, 6, 7]
+    assert body['next_after'] == 7 and body['total'] == MODE_COUNT + 6
+    etag = response.headers['ETag']
+    assert client.get('/api/modes?limit=5&after=2', headers={'If-None-Match': etag}).status_code == 304
+    assert client.get('/api/modes?active=true').get_json()['total'] == 0
+    assert client.get('/api/modes?limit=x').status_code == 400
+    assert client.get('/api/modes?active=maybe').status_code == 400
+    assert len(client.get('/api/modes').get_json()) == MODE_COUNT + 6, "No parameters lists all"
+
+    html = client.get('/').get_data(as_text=True)
+    assert html.count('class="mode-selection-card') == app.config['MODES_PAGE_SIZE'] + 1, \
+        "Only the first page is rendered (plus the card template)"
+    assert 'Sensor 09999' not in html
+
+    print("✓ Mode listings are paged and filtered")
+
+
+def test_toggle_at_scale():
+    """Toggles report only the modes they changed and keep the registry warm."""
+    print("Testing mode toggles with many modes...")
+
+    client = app.test_client()
+    watcher = socketio.test_client(app)
+    watcher.get_received()
+
+    database.get_mode_registry()
+    response = client.post('/api/modes/500/toggle', json={'enforce_single_active': True})
+    assert response.get_json()['modes'] == [{'mode_id': 500, 'is_active': True, 'voltage': 5.0}]
+    start = time.time()
+    response = client.post('/api/modes/9000/toggle', json={'enforce_single_active': True})
+    elapsed = time.time() - start
+    assert response.get_json()['modes'] == [
+        {'mode_id': 500, 'is_active': False, 'voltage': 5.0},
+        {'mode_id': 9000, 'is_active': True, 'voltage': 5.0},
+    ]
+    events = [msg for msg in watcher.get_received() if msg['name'] == 'mode_status_changed']
+    assert len(events) == 2 and 'all_modes' not in events[-1]['args'][0]
+    assert [event['args'][0]['active_total'] for event in events] == [1, 1]
+    watcher.disconnect()
+
+    version = (database.data_versions['epoch'], database.data_versions['status'])
+    assert database.mode_registry['version'] == version, "Registry patched, not invalidated"
+    registry = database.get_mode_registry()
+    assert registry[9000]['is_active'] == 1 and registry[500]['is_active'] == 0
+    assert [mode['id'] for mode in database.get_active_modes()] == [9000]
+    assert elapsed < 0.5, f"Toggle took {elapsed:.3f}s"
+
+    print(f"✓ Toggle with {MODE_COUNT} modes took {elapsed * 1000:.1f}ms")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Mode Registry Scale Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_bulk_registration()
+        test_paginated_listing()
+        test_toggle_at_scale()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Test script for query time budgets on analytics queries
+"""
+
+import os
+import sys
+import tempfile
+
+import database
+from app import app
+
+SLOW_QUERY = '''
+    WITH RECURSIVE counter(n) AS (
+        SELECT 1 UNION ALL SELECT n + 1 FROM counter WHERE n < 50000000
+    )
+    SELECT COUNT(*) FROM counter
+'''
+
+
+def setup_module(module=None):
+    """Create a temporary database with enough readings to scan."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    with database.get_db_connection() as conn:
+        conn.executemany(
+            'INSERT INTO readings (mode_id, value) VALUES (?, ?)',
+            [(1 + i % 4, float(i % 100)) for i in range(50000)]
+        )
+
+
+def test_budget_interrupts_slow_query():
+    """A query running past its budget raises QueryTimeoutError."""
+    print("Testing budget interruption...")
+
+    try:
+        with database.query_budget(0.05):
+            with database.get_db_connection() as conn:
+                conn.execute(SLOW_QUERY).fetchone()
+        assert False, "Should have raised QueryTimeoutError"
+    except database.QueryTimeoutError as e:
+        assert e.budget == 0.05
+
+    print("✓ Slow query interrupted")
+
+
+def test_no_budget_outside_context():
+    """Queries outside a budget block are not limited."""
+    print("Testing unbudgeted queries...")
+
+    with database.query_budget(0.05):
+        pass
+    assert getattr(database.query_context, 'budget', None) is None
+    assert database.get_statistics(mode_id=1)['count'] > 0
+
+    print("✓ Budget is scoped to its block")
+
+
+def test_endpoint_returns_structured_timeout():
+    """Analytics endpoints answer 503 with a structured error on timeout."""
+    print("Testing endpoint timeout response...")
+
+    client = app.test_client()
+    original = app.config['QUERY_BUDGET_INTERACTIVE']
+    app.config['QUERY_BUDGET_INTERACTIVE'] = 0.0
+    try:
+        response = client.get('/api/statistics?min_value=1')
+        assert response.status_code == 503, f"Expected 503, got {response.status_code}"
+        data = response.get_json()
+        assert data['code'] == 'query_timeout'
+        assert data['budget_seconds'] == 0.0
+
+        response = client.get('/api/statistics?min_value=1&export=1')
+        assert response.status_code == 200, "Export budget should allow the query"
+    finally:
+        app.config['QUERY_BUDGET_INTERACTIVE'] = original
+
+    print("✓ Endpoint returns structured timeout error")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Query Time Budget Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_budget_interrupts_slow_query()
+        test_no_budget_outside_context()
+        test_endpoint_returns_structured_timeout()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight coalescing of identical analytics queries
+"""
+
+import sys
+import threading
+import time
+
+from database import (
+    SingleFlight, coalesce, get_filtered_records, get_statistics, query_budget, query_context,
+    query_flight
+)
+
+
+def test_concurrent_calls_share_one_execution():
+    """Concurrent identical calls should run the function once."""
+    print("Testing concurrent identical calls...")
+
+    flight = SingleFlight()
+    executions = []
+    results = []
+
+    def slow_query():
+        executions.append(1)
+        time.sleep(0.2)
+        return ['row']
+
+    def worker():
+        results.append(flight.do('stats', slow_query))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(executions) == 1, f"Expected 1 execution, got {len(executions)}"
+    assert len(results) == 8, "Every caller should receive a result"
+    assert all(result is results[0] for result in results), "Callers should share the result"
+    assert not flight.calls, "In-flight table should be empty afterwards"
+
+    print("✓ Concurrent identical calls share one execution")
+
+
+def test_distinct_keys_run_separately():
+    """Calls with different keys must not be coalesced."""
+    print("Testing distinct keys...")
+
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+
+    print("✓ Distinct keys run separately")
+
+
+def test_errors_propagate_to_waiters():
+    """An exception in the leader should reach every waiting caller."""
+    print("Testing error propagation...")
+
+    flight = SingleFlight()
+    errors = []
+
+    def failing_query():
+        time.sleep(0.1)
+        raise ValueError("boom")
+
+    def worker():
+        try:
+            flight.do('fail', failing_query)
+        except ValueError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == ['boom'] * 4, f"Unexpected errors: {errors}"
+    assert flight.do('fail', lambda: 'ok') == 'ok', "Key should be reusable after failure"
+
+    print("✓ Errors propagate to waiters")
+
+
+def test_budgets_are_not_shared():
+    """Callers with different query budgets do not join each other's call."""
+    print("Testing coalescing with query budgets...")
+
+    @coalesce
+    def budgeted_query():
+        budget = getattr(query_context, 'budget', None)
+        if budget == 2:
+            # An export arriving while this interactive call is in flight
+            assert all(key[1] == 2 for key in query_flight.calls), "Keys should carry the budget"
+            with query_budget(30):
+                return budget, budgeted_query()
+        return budget
+
+    with query_budget(2):
+        assert budgeted_query() == (2, 30), "The export should run with its own budget"
+    assert not query_flight.calls
+
+    print("✓ Only calls with the same budget are coalesced")
+
+
+def test_analytics_queries_are_coalesced():
+    """get_filtered_records and get_statistics go through the coalescer."""
+    print("Testing analytics query wrappers...")
+
+    assert hasattr(get_filtered_records, '__wrapped__'), "get_filtered_records should be coalesced"
+    assert hasattr(get_statistics, '__wrapped__'), "get_statistics should be coalesced"
+
+    print("✓ Analytics queries are coalesced")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Query Coalescing Tests")
+    print("=" * 50)
+
+    try:
+        test_concurrent_calls_share_one_execution()
+        test_distinct_keys_run_separately()
+        test_errors_propagate_to_waiters()
+        test_budgets_are_not_shared()
+        test_analytics_queries_are_coalesced()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
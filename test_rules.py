@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Test script for the incremental alert rule engine
+"""
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+import database
+import live_buffer
+import rules
+from app import app, socketio, publish_alerts
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    live_buffer.clear()
+
+
+def check_all(rule, samples):
+    """Feed (t, value) samples to a rule; returns the indexes that fired."""
+    return [index for index, (t, value) in enumerate(samples) if rule.check(t, value)]
+
+
+def test_rule_kinds():
+    """Thresholds fire on leaving the band, rates on jumps, z-scores on outliers."""
+    print("Testing rule kinds...")
+
+    threshold = rules.create_rule('threshold', {'minimum': 0, 'maximum': 10})
+    values = [5, 11, 12, 5, -1, 3]
+    assert check_all(threshold, enumerate(values)) == [1, 4], "Fires once per excursion"
+
+    rate = rules.create_rule('rate', {'max_delta': 5, 'max_rate': 2})
+    samples = [(0, 0), (1, 1), (2, 8), (10, 9), (10.5, 11), (11, 11)]
+    assert check_all(rate, samples) == [2, 4]
+
+    rng = random.Random(3)
+    zscore = rules.create_rule('zscore', {'window': 50, 'threshold': 3})
+    values = [rng.gauss(20, 1) for _ in range(500)]
+    values[300] = 40
+    fired = check_all(zscore, enumerate(values))
+    assert 300 in fired and len(fired) < 10
+
+    assert len(zscore.values) == 50
+    assert abs(zscore.mean - statistics.fmean(values[450:])) < 1e-9, "Running mean tracks the window"
+    assert abs(zscore.m2 / 50 - statistics.pvariance(values[450:])) < 1e-9
+
+    # A large offset cancels a naive sum of squares to noise
+    offset = rules.create_rule('zscore', {'window': 100, 'threshold': 6})
+    values = [1e9 + rng.gauss(0, 1) for _ in range(20000)]
+    assert check_all(offset, enumerate(values + [1e9 + 20])) == [20000]
+    assert abs(offset.m2 / 100 - statistics.pvariance(values[-99:] + [1e9 + 20])) < 1e-3
+
+    for kind, params, message in [
+        ('median', {}, 'kind must be one of'),
+        ('threshold', {}, 'minimum and/or a maximum'),
+        ('threshold', {'minimum': 5, 'maximum': 1}, 'must not exceed'),
+        ('rate', {'max_delta': 'x'}, 'must be a number'),
+        ('zscore', {'window': 1}, 'at least 2'),
+    ]:
+        try:
+            rules.create_rule(kind, params)
+        except ValueError as e:
+            assert message in str(e), str(e)
+        else:
+            raise AssertionError(f"{kind} {params} should be rejected")
+
+    print("✓ Rule kinds behave as specified")
+
+
+def test_alerts_on_ingest():
+    """Rules run on stored readings; alerts are stored, pushed and survive a restart."""
+    print("Testing alerts on the ingest path...")
+
+    client = app.test_client()
+    response = client.post('/api/modes/1/rules', json={'kind': 'threshold', 'maximum': 50})
+    assert response.status_code == 201
+    rule = response.get_json()
+    assert rule['mode_id'] == 1 and rule['params'] == {'minimum': None, 'maximum': 50}
+    assert client.post('/api/modes/1/rules', json={'kind': 'rate'}).status_code == 400
+    assert client.post('/api/modes/99/rules', json={'kind': 'rate'}).status_code == 404
+    client.post('/api/modes/2/rules', json={'kind': 'rate', 'max_delta': 10})
+
+    watcher = socketio.test_client(app)
+    watcher.get_received()
+
+    now = time.time()
+    ingest_readings([(1, now - 3, 10.0), (1, now - 2, 60.0), (2, now - 2, 1.0), (2, now - 1, 50.0)])
+    database.add_reading(1, 70.0)
+    stored = publish_alerts()
+    assert [(alert['mode_id'], alert['kind']) for alert in stored] == [(1, 'threshold'), (2, 'rate')]
+    assert stored[0]['value'] == 60.0 and 'outside' in stored[0]['message']
+    assert publish_alerts() == [], "Alerts are published once"
+
+    pushed = [msg['args'][0] for msg in watcher.get_received() if msg['name'] == 'alert']
+    assert [alert['id'] for alert in pushed] == [alert['id'] for alert in stored]
+
+    server = sys.modules['app']
+    add_alerts = server.add_alerts
+
+    def failing_add_alerts(alerts):
+        raise database.sqlite3.OperationalError("database is locked")
+
+    database.add_reading(2, 90.0)
+    server.add_alerts = failing_add_alerts
+    try:
+        publish_alerts()
+        raise AssertionError("The failed write should propagate")
+    except database.sqlite3.OperationalError:
+        pass
+    finally:
+        server.add_alerts = add_alerts
+    assert rules.get_stats()['pending'] == 1, "Alerts of a failed write are put back"
+    retried = publish_alerts()
+    assert [(alert['mode_id'], alert['value']) for alert in retried] == [(2, 90.0)]
+    watcher.get_received()
+    stored += retried
+
+    alerts = client.get('/api/alerts?mode_id=1').get_json()
+    assert len(alerts) == 1 and alerts[0]['rule_id'] == rule['id']
+    assert len(client.get('/api/alerts').get_json()) == 3
+    assert [alert['id'] for alert in reversed(client.get('/api/alerts').get_json())] == \
+        [alert['id'] for alert in stored], "Returned ids match the stored rows"
+    assert client.get('/api/rules').get_json()[0]['fired'] == 1
+
+    database.init_db()
+    assert [r['id'] for r in client.get('/api/rules').get_json()] == [rule['id'], rule['id'] + 1], \
+        "Rules are reloaded from the database"
+
+    assert client.delete(f"/api/rules/{rule['id']}").status_code == 200
+    assert client.delete(f"/api/rules/{rule['id']}").status_code == 404
+    assert client.get('/api/modes/1/rules').get_json() == []
+    assert len(client.get('/api/alerts').get_json()) == 3, "Alerts outlive their rule"
+
+    status = client.get('/api/diagnostics/event-loop').get_json()
+    assert status['alert_rules']['rules'] == 1
+    watcher.disconnect()
+
+    print("✓ Alerts are evaluated, stored and pushed")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Alert Rule Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_rule_kinds()
+        test_alerts_on_ingest()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
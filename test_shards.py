@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Test script for the sharded SQLite readings engine
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from eventlet.patcher import original
+
+import database
+from app import app
+from ingest import ingest_readings
+from shards import ShardedSqliteBackend, fan_out
+
+threading = original('threading')
+
+START_MS = 1699920000000  # 2023-11-14 00:00:00 UTC
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database using two shards."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    database.use_readings_backend('sharded_sqlite', shards=2)
+
+
+def teardown_module(module=None):
+    """Switch back to the readings table and remove the shard files."""
+    database.use_readings_backend('sqlite')
+    shutil.rmtree(database.DATABASE_PATH + '.shards', ignore_errors=True)
+
+
+def test_shard_layout_and_merge():
+    """Modes land in their own shard files and cross-shard reads merge by time."""
+    print("Testing shard layout and merged reads...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        backend = ShardedSqliteBackend(directory)
+        backend.reserve_ids(10)
+        backend.append([(mode_id, START_MS + i * 1000 + mode_id, float(i))
+                        for i in range(100) for mode_id in (1, 2, 3)])
+        assert {'shard_1.db', 'shard_2.db', 'shard_3.db'} <= set(os.listdir(directory))
+
+        latest = backend.latest([1, 2, 3], 5)
+        assert [(r[1], r[3]) for r in latest] == [(3, 99.0), (2, 99.0), (1, 99.0), (3, 98.0), (2, 98.0)]
+        assert backend.max_ids() == {1: 308, 2: 309, 3: 310}
+
+        stats = backend.statistics(start_ms=START_MS + 50000)
+        assert stats[2][0] == 50 and stats[2][2] == 50.0 and stats[2][3] == 99.0
+        for kwargs in ({'limit': 7, 'offset': 3}, {'mode_id': 2, 'min_value': 10, 'max_value': 20},
+                       {'start_ms': START_MS + 40000, 'end_ms': START_MS + 60000}):
+            assert backend.page(**kwargs) == super(ShardedSqliteBackend, backend).page(**kwargs), kwargs
+        backend.close()
+
+        reopened = ShardedSqliteBackend(directory)
+        assert reopened.append([(1, START_MS, 0.0)])[0][0] == 311
+        assert len(reopened.scan()) == 301
+        reopened.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print("✓ Shards are per mode and merged reads are ordered")
+
+
+def test_parallel_writers():
+    """Concurrent writers to different shards keep ids unique."""
+    print("Testing concurrent writers...")
+
+    directory = tempfile.mkdtemp()
+    try:
+        backend = ShardedSqliteBackend(directory, shards=4)
+
+        def write(mode_id):
+            for i in range(20):
+                backend.append([(mode_id, START_MS + i * 100 + j, float(j)) for j in range(50)])
+
+        threads = [threading.Thread(target=write, args=(mode_id,)) for mode_id in range(1, 9)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        ids = [record[0] for record in backend.scan()]
+        assert len(ids) == 8 * 20 * 50 and len(set(ids)) == len(ids)
+        assert len(os.listdir(directory)) >= 4
+        assert fan_out(lambda n: n * 2, [1, 2, 3]) == [2, 4, 6]
+        backend.close()
+    finally:
+        shutil.rmtree(directory)
+
+    print("✓ Concurrent writers produce unique ids")
+
+
+def test_database_on_shards():
+    """Reading functions and analytics endpoints work on sharded storage."""
+    print("Testing database layer on shards...")
+
+    rows = []
+    for i in range(300):
+        for mode_id in (1, 2, 3):
+            rows.append((mode_id, (START_MS + i * 60000 + mode_id) / 1000, float(i % 30)))
+    assert len(ingest_readings(rows)) == 900
+
+    all_readings = database.get_all_readings(limit=4)
+    assert [r['mode_id'] for r in all_readings] == [3, 2, 1, 3]
+    assert all_readings[0]['mode_name']
+    assert database.get_current_reading(2)['value'] == 29.0
+
+    stats = database.get_statistics()
+    assert [s['count'] for s in stats] == [300, 300, 300]
+    assert stats[0]['first_reading'] == '2023-11-14 00:00:00.001'
+    single = database.get_statistics(mode_id=2, min_value=10)
+    assert single['count'] == 200 and single['minimum'] == 10.0
+
+    client = app.test_client()
+    records = client.get('/api/records?mode_id=3&limit=1000').get_json()
+    assert records['count'] == 300
+    body = client.get('/api/statistics?mode_id=1').get_json()
+    assert body['statistics']['count'] == 300
+
+    print("✓ Records and statistics fan out over shards")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Sharded Storage Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_shard_layout_and_merge()
+        test_parallel_writers()
+        test_database_on_shards()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
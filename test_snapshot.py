@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Test script for the analytics snapshot database
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import eventlet
+
+import database
+from app import app
+from ingest import ingest_readings
+
+START = 1699920000.0  # 2023-11-14 00:00:00 UTC
+
+
+def ingest_minutes(first, count):
+    """Store one reading per minute for modes 1 and 2."""
+    ingest_readings([(mode_id, START + i * 60, float(i % 40))
+                     for i in range(first, first + count) for mode_id in (1, 2)])
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database with a snapshot."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    ingest_minutes(0, 100)
+    database.refresh_snapshot()
+    app.config['ANALYTICS_SNAPSHOT_INTERVAL'] = 60
+
+
+def teardown_module(module=None):
+    """Route analytics back to the live database and remove the snapshot."""
+    app.config['ANALYTICS_SNAPSHOT_INTERVAL'] = 0
+    database.snapshot_state.update(created=None, versions=None)
+    if os.path.exists(database.snapshot_path()):
+        os.remove(database.snapshot_path())
+
+
+def test_analytics_read_snapshot():
+    """Analytics endpoints serve the snapshot while dashboards see live data."""
+    print("Testing snapshot routing...")
+
+    client = app.test_client()
+    ingest_minutes(100, 20)
+
+    response = client.get('/api/records?mode_id=1&limit=1000')
+    assert response.get_json()['count'] == 100, "Records should come from the snapshot"
+    assert response.headers['X-Snapshot-Created']
+    assert float(response.headers['X-Snapshot-Age']) >= 0
+
+    stats = client.get('/api/statistics?mode_id=2').get_json()['statistics']
+    assert stats['count'] == 100
+
+    live = client.get('/api/readings/1?limit=1000').get_json()
+    assert len(live) == 120, "Dashboard readings should be live"
+
+    status = client.get('/api/diagnostics/event-loop').get_json()['analytics_snapshot']
+    assert status['enabled'] and status['refreshes'] >= 1
+
+    print("✓ Analytics read the snapshot, dashboards read live data")
+
+
+def test_refresh_and_etags():
+    """ETags follow the snapshot and change when it is refreshed."""
+    print("Testing snapshot refresh...")
+
+    client = app.test_client()
+    first = client.get('/api/records?mode_id=1&limit=1000')
+    ingest_minutes(120, 5)
+    cached = client.get('/api/records?mode_id=1&limit=1000',
+                        headers={'If-None-Match': first.headers['ETag']})
+    assert cached.status_code == 304, "Snapshot unchanged, so the ETag still matches"
+
+    database.refresh_snapshot()
+    fresh = client.get('/api/records?mode_id=1&limit=1000',
+                       headers={'If-None-Match': first.headers['ETag']})
+    assert fresh.status_code == 200
+    assert fresh.get_json()['count'] == 125
+
+    print("✓ Refresh publishes new data and new ETags")
+
+
+def test_snapshot_reads_skip_writer_lock():
+    """Snapshot queries do not wait for the live database lock."""
+    print("Testing snapshot isolation...")
+
+    release = eventlet.event.Event()
+    holding = eventlet.event.Event()
+
+    def hold_lock():
+        with database.db_lock:
+            holding.send()
+            release.wait()
+
+    holder = eventlet.spawn(hold_lock)
+    holding.wait()
+    try:
+        with eventlet.Timeout(2):
+            records = database.get_filtered_records(mode_id=2, limit=1000, snapshot=True)
+        assert len(records) == 125
+    finally:
+        release.send()
+        holder.wait()
+
+    print("✓ Snapshot reads run while the writer lock is held")
+
+
+def test_refresh_lets_writers_in():
+    """A refresh releases the writer lock between copy steps."""
+    print("Testing stepwise snapshot refresh...")
+
+    refreshing = True
+    turns = []
+
+    def writer():
+        while refreshing:
+            with database.db_lock:
+                turns.append(time.monotonic())
+            if len(turns) == 1:
+                database.add_reading(1, 7.5)
+            eventlet.sleep(0)
+
+    step_pages = database.SNAPSHOT_STEP_PAGES
+    database.SNAPSHOT_STEP_PAGES = 1
+    try:
+        thread = eventlet.spawn(writer)
+        eventlet.sleep(0)
+        database.refresh_snapshot()
+    finally:
+        refreshing = False
+        database.SNAPSHOT_STEP_PAGES = step_pages
+    thread.wait()
+    assert len(turns) > 2, "The writer should get the lock between copy steps"
+
+    with database.get_db_connection(snapshot=True) as conn:
+        copied = dict(conn.execute('SELECT mode_id, MAX(id) FROM readings GROUP BY mode_id').fetchall())
+    assert copied == {mode_id: version for mode_id, version in database.snapshot_state['versions'].items()
+                      if mode_id in copied}, "Snapshot versions match the copied readings"
+    assert copied[1] == database.get_latest_reading_id(), "The write made mid-copy is in the snapshot"
+
+    print(f"✓ Writers took the lock {len(turns)} times during a refresh")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Analytics Snapshot Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_analytics_read_snapshot()
+        test_refresh_and_etags()
+        test_snapshot_reads_skip_writer_lock()
+        test_refresh_lets_writers_in()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+    finally:
+        teardown_module()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Test script for sequence-numbered readings and resumable subscriptions
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import database
+import live_buffer
+from app import app, socketio
+from data_simulator import DataSimulator
+from ingest import ingest_readings
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    live_buffer.clear()
+
+
+def confirmation(client, data):
+    """Subscribe and return the subscription_confirmed payload."""
+    client.get_received()
+    client.emit('subscribe_mode', data)
+    confirmed = [msg for msg in client.get_received() if msg['name'] == 'subscription_confirmed']
+    return confirmed[0]['args'][0]
+
+
+def test_sequence_numbers():
+    """Readings get contiguous per-mode sequence numbers on every write path."""
+    print("Testing sequence numbering...")
+
+    now = time.time()
+    ingest_readings([(1, now - 3, 1.0), (2, now - 2, 2.0), (1, now - 1, 3.0)])
+    reading_id = database.add_reading(1, 4.0)
+
+    assert live_buffer.last_sequence(1) == 3
+    assert live_buffer.last_sequence(2) == 1
+    assert live_buffer.sequence(1, reading_id) == 3
+    assert live_buffer.history(1, 60)['seqs'] == [1, 2, 3]
+
+    simulator = DataSimulator(socketio)
+    mode = database.get_mode_by_id(1)
+    assert simulator.build_reading_data(mode, reading_id, 4.0, 5.0)['seq'] == 3
+
+    print("✓ Sequence numbers are contiguous per mode")
+
+
+def test_replay_from_log():
+    """The log replays after a sequence number until it has been evicted."""
+    print("Testing log replay...")
+
+    replay = live_buffer.replay(1, 1)
+    assert replay['seqs'] == [2, 3] and replay['values'] == [3.0, 4.0]
+    assert live_buffer.replay(1, 3)['count'] == 0
+
+    now = time.time()
+    rows = [(4, now, float(i)) for i in range(live_buffer.HISTORY_MAX_READINGS + 5)]
+    ingest_readings(rows)
+    assert live_buffer.replay(4, 0) is None, "Evicted readings cannot be replayed from the log"
+    assert live_buffer.replay(4, 5)['count'] == live_buffer.HISTORY_MAX_READINGS
+
+    print("✓ Log replays missed readings")
+
+
+def test_resubscribe():
+    """Resubscribing replays from the log, the database, or reports a gap."""
+    print("Testing resubscribe...")
+
+    client = socketio.test_client(app)
+    payload = confirmation(client, {'mode_id': 1})
+    assert payload['stream'] == live_buffer.epoch and payload['seq'] == 3
+    assert 'replay' not in payload
+
+    first_id = live_buffer.history(1, 60)['ids'][0]
+    database.add_reading(1, 5.0)
+
+    payload = confirmation(client, {'mode_id': 1, 'since': 1, 'stream': live_buffer.epoch})
+    replay = payload['replay']
+    assert replay['source'] == 'log' and replay['complete']
+    assert replay['seqs'] == [2, 3, 4] and replay['values'] == [3.0, 4.0, 5.0]
+
+    payload = confirmation(client, {'mode_id': 1, 'since': 1, 'since_id': first_id,
+                                    'stream': 'restarted'})
+    replay = payload['replay']
+    assert replay['source'] == 'database' and replay['complete']
+    assert replay['values'] == [3.0, 4.0, 5.0]
+    assert replay['seqs'] == [2, 3, 4], "Readings still logged keep their sequence numbers"
+
+    app.config['REPLAY_MAX_READINGS'] = 2
+    try:
+        payload = confirmation(client, {'mode_id': 1, 'since': 0, 'since_id': 0,
+                                        'stream': 'restarted'})
+        assert not payload['replay']['complete']
+        assert payload['replay']['values'] == [4.0, 5.0]
+    finally:
+        app.config['REPLAY_MAX_READINGS'] = 5000
+
+    payload = confirmation(client, {'mode_id': 1, 'since': 1, 'stream': 'restarted'})
+    assert payload['replay']['source'] is None and not payload['replay']['complete']
+    client.disconnect()
+
+    print("✓ Resubscribe replays without gaps")
+
+
+def test_batch_sequence_numbers():
+    """readings_batch events carry the sequence numbers of their readings."""
+    print("Testing batch sequence numbers...")
+
+    client = socketio.test_client(app)
+    confirmation(client, {'mode_id': 2})
+    client.get_received()
+
+    now = time.time()
+    body = f'[2, {now - 1}, 6.0]\n[2, {now}, 7.0]\n'
+    response = app.test_client().post('/api/ingest', data=body,
+                                      content_type='application/x-ndjson')
+    assert response.status_code == 201
+
+    batches = [msg['args'][0] for msg in client.get_received() if msg['name'] == 'readings_batch']
+    assert batches and batches[0]['seqs'] == [2, 3]
+    client.disconnect()
+
+    print("✓ Batches carry sequence numbers")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Stream Resume Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_sequence_numbers()
+        test_replay_from_log()
+        test_resubscribe()
+        test_batch_sequence_numbers()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-mode subscriptions and the subscription index
+"""
+
+import os
+import sys
+import tempfile
+
+import database
+import live_buffer
+from app import app, socketio, client_subscriptions, outbound
+from subscriptions import SubscriptionIndex, room_mode_id
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+
+
+def received(client, name):
+    """Payloads of the events called `name` a client has received."""
+    return [msg['args'][0] for msg in client.get_received() if msg['name'] == name]
+
+
+def test_subscription_index():
+    """The index keeps client -> modes and mode -> clients in step."""
+    print("Testing subscription index...")
+
+    index = SubscriptionIndex()
+    index.connect('a')
+    index.add('a', 1)
+    index.add('a', 2)
+    index.add('b', 2)
+    assert index.subscribers(2) == {'a', 'b'} and index.modes('a') == {1, 2}
+
+    index.discard('a', 2)
+    assert index.subscribers(2) == {'b'}
+    assert index.disconnect('b') == {2}
+    assert 2 not in index.by_mode and 'b' not in index
+    assert room_mode_id('mode_12') == 12 and room_mode_id('lobby') is None
+
+    print("✓ Reverse index follows subscriptions")
+
+
+def test_mode_registry_cache():
+    """The registry is served from memory until mode status changes."""
+    print("Testing mode registry...")
+
+    registry = database.get_mode_registry()
+    assert sorted(registry) == [1, 2, 3, 4]
+    assert database.get_mode_registry() is registry, "Unchanged status should not reload"
+
+    database.update_mode_status(3, True)
+    registry = database.get_mode_registry()
+    assert registry[3]['is_active'] == 1
+    database.update_mode_status(3, False)
+
+    print("✓ Registry reloads only after status changes")
+
+
+def test_multi_mode_subscribe():
+    """Lists, '*' and patterns subscribe in one event, validated in one pass."""
+    print("Testing multi-mode subscribe...")
+
+    client = socketio.test_client(app)
+    sid = client.get_received()[0]['args'][0]['client_id']
+
+    client.emit('subscribe_mode', {'mode_ids': [3, 1], 'policy': 'latest'})
+    version = database.mode_registry['version']
+    confirmed = received(client, 'subscriptions_confirmed')[0]
+    assert confirmed['mode_ids'] == [1, 3]
+    assert [payload['room'] for payload in confirmed['subscriptions']] == ['mode_1', 'mode_3']
+    assert client_subscriptions.modes(sid) == {1, 3}
+    assert sid in client_subscriptions.subscribers(3)
+    assert outbound.clients[sid].policies == {1: 'latest', 3: 'latest'}
+
+    outbound.emit('data_update', {'mode_id': 3, 'value': 1.0}, room='mode_3')
+    outbound.emit('data_update', {'mode_id': 2, 'value': 2.0}, room='mode_2')
+    assert [data['mode_id'] for data in received(client, 'data_update')] == [3]
+
+    client.emit('subscribe_mode', {'mode_ids': [1, 7, 9]})
+    assert received(client, 'error')[0]['error'] == 'Modes not found: 7, 9'
+    assert client_subscriptions.modes(sid) == {1, 3}, "Nothing is subscribed on error"
+
+    client.emit('subscribe_mode', {'pattern': 'TEMP*'})
+    names = [payload['mode_name'] for payload in received(client, 'subscriptions_confirmed')[0]['subscriptions']]
+    assert names == ['Temperature']
+
+    client.emit('subscribe_mode', {'mode_ids': '*', 'since': {'1': 0}, 'stream': live_buffer.epoch})
+    subscriptions = received(client, 'subscriptions_confirmed')[0]['subscriptions']
+    assert len(subscriptions) == 4
+    assert 'replay' in subscriptions[0] and 'replay' not in subscriptions[1]
+    assert client_subscriptions.modes(sid) == {1, 2, 3, 4}
+    assert database.mode_registry['version'] == version, "Subscribing needs no mode queries"
+
+    client.emit('subscribe_mode', {'mode_id': 2})
+    assert received(client, 'subscription_confirmed')[0]['mode_id'] == 2
+
+    client.emit('unsubscribe_mode', {'mode_ids': [1, 2]})
+    assert received(client, 'unsubscription_confirmed')[0] == {'mode_ids': [1, 2]}
+    assert client_subscriptions.modes(sid) == {3, 4}
+    assert sid not in client_subscriptions.subscribers(1)
+
+    client.disconnect()
+    assert sid not in client_subscriptions and sid not in client_subscriptions.subscribers(3)
+
+    print("✓ Multi-mode subscriptions work in one round-trip")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Subscription Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_subscription_index()
+        test_mode_registry_cache()
+        test_multi_mode_subscribe()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
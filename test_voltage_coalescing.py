@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Test script for server-side coalescing of voltage writes
+"""
+
+import os
+import sys
+import tempfile
+
+import app as app_module
+import database
+from app import app, socketio, simulator, voltage_writes, flush_voltages
+
+
+def setup_module(module=None):
+    """Point the database layer at a fresh temporary database."""
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    database.DATABASE_PATH = path
+    database.data_versions['readings'] = None
+    database.init_db()
+    voltage_writes.clear()
+
+
+def test_latest_voltage_wins():
+    """Requests within a window become one write and one broadcast per mode."""
+    print("Testing voltage coalescing...")
+
+    client = app.test_client()
+    watcher = socketio.test_client(app)
+    watcher.get_received()
+    requests = voltage_writes.get_stats()['requests']
+
+    for voltage in (6.0, 7.0, 8.5):
+        response = client.post('/api/voltage/set', json={'mode_id': 1, 'voltage': voltage})
+        assert response.status_code == 200
+        assert response.get_json()['voltage'] == voltage
+    client.post('/api/voltage/set', json={'mode_id': '2', 'voltage': 3})
+
+    mode = database.get_mode_by_id(1)
+    assert mode['voltage'] == 5.0, "Nothing is written before the flush"
+    assert simulator.current_voltage(mode) == 8.5, "The simulator sees the new voltage at once"
+
+    assert sorted(flush_voltages()) == [1, 2]
+    assert database.get_mode_voltage(1) == 8.5 and database.get_mode_voltage(2) == 3.0
+    changes = [msg['args'][0] for msg in watcher.get_received() if msg['name'] == 'voltage_changed']
+    assert changes == [{'mode_id': 1, 'voltage': 8.5}, {'mode_id': 2, 'voltage': 3.0}]
+    assert flush_voltages() == [], "Flushed voltages are written once"
+
+    stats = voltage_writes.get_stats()
+    assert stats['requests'] == requests + 4 and stats['coalesced'] >= 2
+    status = client.get('/api/diagnostics/event-loop').get_json()
+    assert status['voltage_writes']['pending'] == 0
+    watcher.disconnect()
+
+    print("✓ Latest voltage per mode is written and broadcast once")
+
+
+def test_failed_flush_is_retried():
+    """Voltages whose write fails are stored by a later flush, unless superseded."""
+    print("Testing failed voltage flushes...")
+
+    voltage_writes.set(1, 2.0)
+    voltage_writes.set(3, 4.0)
+
+    def busy(voltages):
+        # A newer request arrives while the failing write is in progress
+        voltage_writes.set(1, 9.0)
+        raise database.QueryTimeoutError(2)
+
+    original = app_module.set_mode_voltages
+    app_module.set_mode_voltages = busy
+    try:
+        flush_voltages()
+        assert False, "The failure should propagate to the flusher"
+    except database.QueryTimeoutError:
+        pass
+    finally:
+        app_module.set_mode_voltages = original
+
+    assert voltage_writes.get_stats()['pending'] == 2 and voltage_writes.get_stats()['failed'] == 1
+    assert sorted(flush_voltages()) == [1, 3]
+    assert database.get_mode_voltage(1) == 9.0, "The newer request wins over the retried one"
+    assert database.get_mode_voltage(3) == 4.0, "The failed voltage is stored by the retry"
+    assert voltage_writes.get_stats()['pending'] == 0
+
+    print("✓ Failed flushes are retried")
+
+
+def test_invalid_requests():
+    """Bad voltages and unknown modes are rejected before anything is queued."""
+    print("Testing invalid voltage requests...")
+
+    client = app.test_client()
+    assert client.post('/api/voltage/set', json={'mode_id': 1, 'voltage': 15}).status_code == 400
+    assert client.post('/api/voltage/set', json={'mode_id': 1, 'voltage': 'high'}).status_code == 400
+    assert client.post('/api/voltage/set', json={'mode_id': 99, 'voltage': 5}).status_code == 404
+    assert client.post('/api/voltage/set', json={'mode_id': 1}).status_code == 400
+    assert voltage_writes.get_stats()['pending'] == 0
+
+    print("✓ Invalid requests are rejected")
+
+
+def main():
+    """Run all tests"""
+    print("=" * 50)
+    print("Voltage Coalescing Tests")
+    print("=" * 50)
+
+    try:
+        setup_module()
+        test_latest_voltage_wins()
+        test_failed_flush_is_retried()
+        test_invalid_requests()
+
+        print("\n" + "=" * 50)
+        print("All tests passed! ✓")
+        print("=" * 50)
+        return 0
+
+    except AssertionError as e:
+        print(f"\n✗ Test failed: {e}")
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())